@@ -26,7 +26,9 @@ ALLOWED_HOSTS = [host.strip() for host in ALLOWED_HOSTS_STRING.split(',')]
 
 
 MIDDLEWARE = [
-    'django_tenants.middleware.main.TenantMainMiddleware',
+    'warehouse_management.middleware.RequestMetricsMiddleware',
+    'tenants.middleware.CachedTenantMainMiddleware',
+    'warehouse_management.middleware.ActionLogBufferMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,6 +51,7 @@ SHARED_APPS = (
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
+    'django.contrib.postgres',
     'warehouse_management',
 )
 
@@ -66,6 +69,11 @@ INSTALLED_APPS = list(SHARED_APPS) + [app for app in TENANT_APPS if app not in S
 TENANT_MODEL = "tenants.Tenant"
 TENANT_DOMAIN_MODEL = "tenants.Domain"
 
+# Schema migrado que provision_tenants clona para dar de alta tenants nuevos
+# (ver tenants.provisioning). No es un tenant: migrate_schemas no lo migra, lo
+# pone al día el propio comando antes de clonar.
+TENANT_TEMPLATE_SCHEMA = os.getenv('TENANT_TEMPLATE_SCHEMA', 'tenant_template')
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -144,11 +152,92 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'tenants.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
-}
\ No newline at end of file
+}
+
+# Caché de membresías usada por IsMemberOfCurrentTenant (ver tenants.cache).
+# Sin BACKEND se usa una LRU local a cada proceso: las señales sólo la invalidan
+# en el proceso que escribe, así que con varios workers conviene apuntar BACKEND
+# a un alias compartido de CACHES para que una revocación se aplique al instante.
+TENANT_MEMBERSHIP_CACHE = {
+    'TTL': int(os.getenv('TENANT_MEMBERSHIP_CACHE_TTL', '60')),
+    'MAX_SIZE': int(os.getenv('TENANT_MEMBERSHIP_CACHE_MAX_SIZE', '10000')),
+    'BACKEND': os.getenv('TENANT_MEMBERSHIP_CACHE_BACKEND') or None,
+}
+
+# Caché dominio -> tenant de CachedTenantMainMiddleware; mismas claves y
+# mismas consideraciones sobre BACKEND que TENANT_MEMBERSHIP_CACHE.
+TENANT_DOMAIN_CACHE = {
+    'TTL': int(os.getenv('TENANT_DOMAIN_CACHE_TTL', '300')),
+    'MAX_SIZE': int(os.getenv('TENANT_DOMAIN_CACHE_MAX_SIZE', '1000')),
+    'BACKEND': os.getenv('TENANT_DOMAIN_CACHE_BACKEND') or None,
+}
+
+# Tokens ya validados (CachedTokenAuthentication) y tenants disponibles por
+# usuario que devuelve el login; ver TENANT_MEMBERSHIP_CACHE sobre BACKEND.
+# Sin BACKEND compartido, desactivar un usuario tarda hasta TTL en aplicarse
+# en los demás procesos.
+TOKEN_AUTH_CACHE = {
+    'TTL': int(os.getenv('TOKEN_AUTH_CACHE_TTL', '300')),
+    'MAX_SIZE': int(os.getenv('TOKEN_AUTH_CACHE_MAX_SIZE', '10000')),
+    'BACKEND': os.getenv('TOKEN_AUTH_CACHE_BACKEND') or None,
+}
+USER_TENANTS_CACHE = {
+    'TTL': int(os.getenv('USER_TENANTS_CACHE_TTL', '300')),
+    'MAX_SIZE': int(os.getenv('USER_TENANTS_CACHE_MAX_SIZE', '10000')),
+    'BACKEND': os.getenv('USER_TENANTS_CACHE_BACKEND') or None,
+}
+
+# Pallets y lotes buscados por nombre (ver warehouse_management.lookup). TTL
+# corto: es la cota de lo que tarda en verse una escritura que no invalida la
+# caché (otro proceso sin BACKEND compartido, queryset.update() directo).
+NAME_LOOKUP_CACHE = {
+    'TTL': int(os.getenv('NAME_LOOKUP_CACHE_TTL', '30')),
+    'MAX_SIZE': int(os.getenv('NAME_LOOKUP_CACHE_MAX_SIZE', '10000')),
+    'BACKEND': os.getenv('NAME_LOOKUP_CACHE_BACKEND') or None,
+}
+
+# Periodos cerrados de las series de throughput (ver
+# warehouse_management.analytics). Un periodo se da por cerrado CLOSE_DELAY
+# segundos después de terminar y desde entonces se sirve de la caché; las
+# escrituras que lo cambian la invalidan, así que el TTL sólo acota memoria.
+THROUGHPUT_CACHE = {
+    'TTL': int(os.getenv('THROUGHPUT_CACHE_TTL', str(30 * 24 * 3600))),
+    'MAX_SIZE': int(os.getenv('THROUGHPUT_CACHE_MAX_SIZE', '50000')),
+    'BACKEND': os.getenv('THROUGHPUT_CACHE_BACKEND') or None,
+    'CLOSE_DELAY': int(os.getenv('THROUGHPUT_CLOSE_DELAY', '0')),
+}
+
+# Métricas por petición (ver warehouse_management.metrics): cabecera
+# Server-Timing e histogramas por schema y vista en /metrics/. Con muchos
+# tenants, TENANT_LABEL=False evita una serie por schema. /metrics/ sólo
+# responde en el dominio del schema público y con 'Authorization: Bearer
+# <TOKEN>'; sin METRICS_TOKEN, devuelve 404.
+REQUEST_METRICS = {
+    'ENABLED': os.getenv('REQUEST_METRICS_ENABLED', 'True').lower() in ('true', '1', 't'),
+    'SERVER_TIMING': os.getenv('REQUEST_METRICS_SERVER_TIMING', 'True').lower() in ('true', '1', 't'),
+    'TENANT_LABEL': os.getenv('REQUEST_METRICS_TENANT_LABEL', 'True').lower() in ('true', '1', 't'),
+    'TOKEN': os.getenv('METRICS_TOKEN') or None,
+}
+
+# Escritura de ActionLog (ver warehouse_management.audit): 'sync', 'buffered' o 'worker'.
+ACTION_LOG_BUFFER = {
+    'MODE': os.getenv('ACTION_LOG_MODE', 'buffered'),
+    'MAX_SIZE': int(os.getenv('ACTION_LOG_BUFFER_MAX_SIZE', '500')),
+    'MAX_AGE': float(os.getenv('ACTION_LOG_BUFFER_MAX_AGE', '5')),
+}
+
+# Archivado de ActionLog (ver warehouse_management.archive y el comando
+# archive_action_logs): las entradas con más de HOT_DAYS días pasan a
+# ActionLogArchive en tandas de CHUNK_SIZE. El mismo comando compacta los
+# cambios de versión pendientes (warehouse_management.versioning).
+ACTION_LOG_RETENTION = {
+    'HOT_DAYS': int(os.getenv('ACTION_LOG_HOT_DAYS', '180')),
+    'CHUNK_SIZE': int(os.getenv('ACTION_LOG_ARCHIVE_CHUNK_SIZE', '5000')),
+}
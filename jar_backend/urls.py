@@ -3,10 +3,12 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.authtoken.views import obtain_auth_token
 from tenants.views import CustomAuthTokenView
+from warehouse_management.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
     path('api/v1/get-token/', CustomAuthTokenView.as_view(), name='api_token_auth'),
     path('api/v1/warehouse/', include('warehouse_management.urls')),
+    path('metrics/', metrics_view, name='metrics'),
 ]
\ No newline at end of file
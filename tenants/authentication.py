@@ -0,0 +1,30 @@
+# tenants/authentication.py
+import copy
+
+from django.db import connection
+from rest_framework.authentication import TokenAuthentication
+
+from .cache import get_token_cache
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication que guarda en caché (por schema y clave) el token ya
+    validado junto a su usuario, y ahorra así la consulta token + usuario de
+    cada petición. Los tokens inválidos o de usuarios inactivos no se guardan.
+    Las señales de Token y de User invalidan las entradas afectadas (borrado
+    del token; desactivación, contraseña o permisos del usuario: ver
+    signals.AUTH_FIELDS).
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        cache_key = (connection.schema_name, key)
+        token = cache.get(cache_key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, token)
+        # Copias: la petición puede modificar su usuario sin tocar la entrada cacheada.
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return token.user, token
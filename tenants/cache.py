@@ -0,0 +1,264 @@
+# tenants/cache.py
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+
+_MISSING = object()
+
+
+class LocalTTLCache:
+    """
+    Caché LRU en memoria del proceso, acotada en tamaño y con caducidad.
+    Segura entre hilos; pensada para valores pequeños y muy consultados.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SharedCache:
+    """
+    Adaptador sobre un backend de ``CACHES`` con la misma interfaz que
+    LocalTTLCache, para compartir entradas entre procesos y servidores.
+    """
+
+    def __init__(self, alias, ttl, prefix):
+        self.alias = alias
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def _key(self, key):
+        parts = key if isinstance(key, tuple) else (key,)
+        return f"{self.prefix}:{':'.join(str(part) for part in parts)}"
+
+    def get(self, key, default=None):
+        return self.backend.get(self._key(key), default)
+
+    def set(self, key, value):
+        self.backend.set(self._key(key), value, self.ttl)
+
+    def delete(self, key):
+        self.backend.delete(self._key(key))
+
+    def clear(self):
+        # Sólo se usa en tests; el backend puede estar compartido con otros usos.
+        self.backend.clear()
+
+
+def build_cache(setting_name, prefix, defaults):
+    """
+    Construye la caché descrita por ``settings.<setting_name>``: un diccionario
+    con ``TTL`` (segundos), ``MAX_SIZE`` y ``BACKEND`` (alias de ``CACHES``).
+    Sin ``BACKEND`` se usa una LRU local al proceso.
+    """
+    config = {**defaults, **getattr(settings, setting_name, {})}
+    if config.get('BACKEND'):
+        return SharedCache(config['BACKEND'], config['TTL'], prefix)
+    return LocalTTLCache(config['TTL'], config['MAX_SIZE'])
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(setting_name, prefix, defaults):
+    """Caché de ``settings.<setting_name>`` (ver build_cache), creada una sola vez por proceso."""
+    cache = _caches.get(setting_name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(setting_name)
+            if cache is None:
+                cache = _caches[setting_name] = build_cache(setting_name, prefix, defaults)
+    return cache
+
+
+# --- Generaciones por schema -----------------------------------------------
+
+def schema_generation(cache, schema_name):
+    """
+    Generación actual de ``schema_name`` en ``cache``. Las claves de las
+    entradas la incluyen, así que cambiarla (invalidate_schema) descarta
+    todas las del schema sin recorrerlas.
+    """
+    key = (schema_name, 'generation')
+    generation = cache.get(key)
+    if generation is None:
+        # Aleatoria y no un contador: si la entrada se pierde (LRU, TTL), la
+        # nueva no puede coincidir con la de entradas anteriores.
+        generation = uuid.uuid4().hex
+        cache.set(key, generation)
+    return generation
+
+
+def on_write(invalidate):
+    """
+    Ejecuta ``invalidate`` ahora (para las lecturas de esta misma
+    transacción) y tras el commit, por si otra petición ha guardado la
+    versión anterior mientras tanto.
+    """
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+def invalidate_schema(cache):
+    """Descarta todas las entradas del schema actual en ``cache`` (ver schema_generation)."""
+    schema_name = connection.schema_name
+    on_write(lambda: cache.delete((schema_name, 'generation')))
+
+
+# --- Membresías de tenant ---------------------------------------------------
+
+def get_membership_cache():
+    return get_cache('TENANT_MEMBERSHIP_CACHE', 'tenants:membership', {'TTL': 60, 'MAX_SIZE': 10000, 'BACKEND': None})
+
+
+def is_tenant_member(user, tenant):
+    """
+    Indica si ``user`` pertenece a ``tenant``. El resultado (positivo o
+    negativo) se guarda por (usuario, tenant) y se invalida con las señales
+    de TenantMembership.
+    """
+    from .models import TenantMembership
+
+    cache = get_membership_cache()
+    key = (user.pk, tenant.pk)
+    is_member = cache.get(key)
+    if is_member is None:
+        is_member = TenantMembership.objects.filter(user_id=user.pk, tenant_id=tenant.pk).exists()
+        cache.set(key, is_member)
+    return is_member
+
+
+def invalidate_membership(user_id, tenant_id):
+    # También tras el commit: una petición concurrente puede haber vuelto a
+    # guardar la membresía antigua antes de que se confirmara el cambio.
+    on_write(lambda: get_membership_cache().delete((user_id, tenant_id)))
+
+
+# --- Resolución de dominio a tenant -----------------------------------------
+
+def get_domain_cache():
+    return get_cache('TENANT_DOMAIN_CACHE', 'tenants:domain', {'TTL': 300, 'MAX_SIZE': 1000, 'BACKEND': None})
+
+
+def get_tenant_for_hostname(hostname):
+    """
+    Tenant del dominio ``hostname``, consultando la base de datos sólo si no
+    está en caché. Lanza Domain.DoesNotExist si no existe (los fallos no se
+    guardan, así que un dominio recién creado se ve al momento). Devuelve una
+    copia: el middleware le asigna ``domain_url`` y no debe tocar la cacheada.
+    """
+    from .models import Domain
+
+    cache = get_domain_cache()
+    tenant = cache.get(hostname)
+    if tenant is None:
+        tenant = Domain.objects.select_related('tenant').get(domain=hostname).tenant
+        cache.set(hostname, tenant)
+    return copy.copy(tenant)
+
+
+def invalidate_hostnames(*hostnames):
+    def invalidate():
+        cache = get_domain_cache()
+        for hostname in hostnames:
+            cache.delete(hostname)
+
+    # Ver invalidate_membership.
+    on_write(invalidate)
+
+
+# --- Tokens de autenticación ------------------------------------------------
+
+def get_token_cache():
+    return get_cache('TOKEN_AUTH_CACHE', 'tenants:token', {'TTL': 300, 'MAX_SIZE': 10000, 'BACKEND': None})
+
+
+def invalidate_tokens(schema_name, *keys):
+    def invalidate():
+        cache = get_token_cache()
+        for key in keys:
+            cache.delete((schema_name, key))
+
+    # Ver invalidate_membership.
+    on_write(invalidate)
+
+
+# --- Tenants disponibles por usuario ----------------------------------------
+
+def get_user_tenants_cache():
+    return get_cache('USER_TENANTS_CACHE', 'tenants:user_tenants', {'TTL': 300, 'MAX_SIZE': 10000, 'BACKEND': None})
+
+
+def get_available_tenants(user):
+    """
+    Tenants de ``user`` ya serializados (TenantSimpleSerializer), tal como
+    los devuelve el login. Se guardan por usuario y se invalidan con las
+    señales de TenantMembership, Tenant y Domain.
+    """
+    from .models import TenantMembership
+    from .serializers import TenantSimpleSerializer
+
+    cache = get_user_tenants_cache()
+    tenants = cache.get(user.pk)
+    if tenants is None:
+        memberships = TenantMembership.objects.filter(user_id=user.pk).select_related(
+            'tenant'
+        ).prefetch_related(
+            'tenant__domains'
+        )
+        tenants = TenantSimpleSerializer([membership.tenant for membership in memberships], many=True).data
+        # Como lista de dicts normales: ReturnList guarda el serializer, que no debe vivir en la caché.
+        tenants = [dict(tenant, all_domains=[dict(domain) for domain in tenant['all_domains']]) for tenant in tenants]
+        cache.set(user.pk, tenants)
+    return tenants
+
+
+def invalidate_user_tenants(*user_ids):
+    def invalidate():
+        cache = get_user_tenants_cache()
+        for user_id in user_ids:
+            cache.delete(user_id)
+
+    # Ver invalidate_membership.
+    on_write(invalidate)
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django_tenants.middleware.main import TenantMainMiddleware
+from django_tenants.utils import get_public_schema_name, get_tenant_domain_model
+
+from tenants.cache import get_domain_cache
+from tenants.middleware import CachedTenantMainMiddleware
+
+
+class Command(BaseCommand):
+    help = "Compara consultas y tiempo por petición de TenantMainMiddleware y CachedTenantMainMiddleware."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', help="Dominio a resolver. Por defecto, el principal del primer tenant.")
+        parser.add_argument('-n', '--requests', type=int, default=1000, help="Peticiones por middleware.")
+
+    def handle(self, *args, **options):
+        hostname = options['host'] or self.default_hostname()
+        factory = RequestFactory(HTTP_HOST=hostname)
+        requests = options['requests']
+
+        get_domain_cache().delete(hostname)
+        results = [
+            self.run(middleware_class, factory, requests)
+            for middleware_class in (TenantMainMiddleware, CachedTenantMainMiddleware)
+        ]
+        connection.set_schema_to_public()
+
+        self.stdout.write(f"Dominio: {hostname}  peticiones: {requests}")
+        for name, queries, elapsed in results:
+            self.stdout.write(
+                f"{name}: {queries / requests:.3f} consultas/petición, {elapsed / requests * 1e6:.1f} µs/petición"
+            )
+        (_, base_queries, base_elapsed), (_, cached_queries, cached_elapsed) = results
+        self.stdout.write(self.style.SUCCESS(
+            f"Ahorro: {base_queries - cached_queries} consultas, {(base_elapsed - cached_elapsed) * 1000:.1f} ms en total."
+        ))
+
+    def default_hostname(self):
+        domain = get_tenant_domain_model().objects.exclude(
+            tenant__schema_name=get_public_schema_name()
+        ).filter(is_primary=True).order_by('tenant_id').first()
+        if domain is None:
+            raise CommandError("No hay tenants con dominio; indica uno con --host.")
+        return domain.domain
+
+    def run(self, middleware_class, factory, requests):
+        middleware = middleware_class(lambda request: HttpResponse())
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(requests):
+                try:
+                    response = middleware(factory.get('/'))
+                except Http404 as exc:
+                    raise CommandError(str(exc))
+                if response.status_code != 200:
+                    raise CommandError(f"{middleware_class.__name__} respondió {response.status_code}.")
+            elapsed = time.perf_counter() - started
+        return middleware_class.__name__, len(queries), elapsed
@@ -0,0 +1,45 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tenants.provisioning import get_template_schema, load_tenant_specs, provision_tenants
+
+
+class Command(BaseCommand):
+    help = "Da de alta en paralelo los tenants y dominios de un fichero JSON clonando un schema plantilla ya migrado."
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="Fichero JSON: [{\"schema_name\", \"name\", \"domains\": [...]}].")
+        parser.add_argument('--template', help=f"Schema plantilla. Por defecto, TENANT_TEMPLATE_SCHEMA ({get_template_schema()}).")
+        parser.add_argument('-c', '--concurrency', type=int, default=min(4, os.cpu_count() or 1),
+                            help="Procesos en paralelo (una conexión a la base de datos cada uno).")
+        parser.add_argument('--json', action='store_true', help="Salida en JSON.")
+
+    def handle(self, *args, **options):
+        try:
+            specs = load_tenant_specs(options['file'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"No se puede leer '{options['file']}': {exc}")
+        if not specs:
+            raise CommandError("El fichero no contiene tenants.")
+
+        report = provision_tenants(specs, options['template'], concurrency=options['concurrency'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.write_summary(report)
+        if report['failed']:
+            raise CommandError(f"{report['failed']} tenants con errores.")
+
+    def write_summary(self, report):
+        action = 'creada' if report['template_created'] else 'actualizada'
+        self.stdout.write(f"Plantilla '{report['template_schema']}' {action} en {report['template_ms']} ms.")
+        for tenant in report['tenants']:
+            if 'error' in tenant:
+                self.stdout.write(self.style.ERROR(f"{tenant['schema_name']}  ERROR: {tenant['error']}"))
+            else:
+                self.stdout.write(f"{tenant['schema_name']}  {', '.join(tenant['domains'])}  {tenant['elapsed_ms']} ms")
+        created = len(report['tenants']) - report['failed']
+        self.stdout.write(self.style.SUCCESS(f"{created} tenants creados en {report['elapsed_ms']} ms."))
@@ -0,0 +1,16 @@
+# tenants/middleware.py
+from django_tenants.middleware.main import TenantMainMiddleware
+
+from .cache import get_tenant_for_hostname
+
+
+class CachedTenantMainMiddleware(TenantMainMiddleware):
+    """
+    TenantMainMiddleware con la resolución dominio -> tenant en caché
+    (tenants.cache.get_tenant_for_hostname): ahorra la consulta a
+    Domain + Tenant de cada petición. Las señales de Domain y Tenant
+    invalidan las entradas afectadas.
+    """
+
+    def get_tenant(self, domain_model, hostname):
+        return get_tenant_for_hostname(hostname)
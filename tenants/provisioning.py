@@ -0,0 +1,135 @@
+# tenants/provisioning.py
+"""
+Alta masiva de tenants a partir de un schema plantilla.
+
+En lugar de ejecutar todas las migraciones en cada schema nuevo, se mantiene
+un schema plantilla migrado (``TENANT_TEMPLATE_SCHEMA``, que no es un tenant
+ni tiene dominio) y cada tenant se crea clonándolo con la función
+``clone_schema`` de django-tenants: tablas, índices, triggers y las filas de
+django_migrations/contenttypes, de modo que el schema nuevo queda al día sin
+migrar. Los tenants se dan de alta en paralelo, uno por worker.
+"""
+import json
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django_tenants.clone import CloneSchema
+from django_tenants.utils import get_tenant_domain_model, get_tenant_model, schema_exists
+
+from .workers import run_in_processes
+
+DEFAULT_TEMPLATE_SCHEMA = 'tenant_template'
+
+# Misma llamada que CloneSchema.clone_schema, pero sin su transaction.commit():
+# así el clonado y el alta del tenant y sus dominios son atómicos.
+CLONE_SCHEMA_SQL = "SELECT clone_schema(%s, %s, %s)"
+
+
+def get_template_schema():
+    return getattr(settings, 'TENANT_TEMPLATE_SCHEMA', DEFAULT_TEMPLATE_SCHEMA)
+
+
+def load_tenant_specs(path):
+    """
+    Lee un fichero JSON con una lista de tenants::
+
+        [{"schema_name": "beta", "name": "Cliente Beta", "domains": ["beta.localhost"]}]
+
+    El primer dominio de cada tenant es el principal.
+    """
+    from django_tenants.postgresql_backend.base import is_valid_schema_name
+
+    with open(path, encoding='utf-8') as handle:
+        specs = json.load(handle)
+    if not isinstance(specs, list):
+        raise ValueError("El fichero debe contener una lista de tenants.")
+
+    for index, spec in enumerate(specs):
+        if not isinstance(spec, dict) or not spec.get('schema_name') or not spec.get('name'):
+            raise ValueError(f"Tenant {index}: 'schema_name' y 'name' son obligatorios.")
+        if not is_valid_schema_name(spec['schema_name']):
+            raise ValueError(f"Tenant {index}: nombre de schema no válido '{spec['schema_name']}'.")
+        domains = spec.get('domains')
+        if not isinstance(domains, list) or not domains:
+            raise ValueError(f"Tenant {index}: 'domains' debe ser una lista no vacía.")
+    return specs
+
+
+def prepare_template_schema(template_schema):
+    """
+    Crea el schema plantilla si no existe y le aplica las migraciones
+    pendientes (si ya está al día, migrate_schemas no hace nada). Instala
+    también la función clone_schema en public. Devuelve True si lo ha creado.
+    """
+    connection.set_schema_to_public()
+    created = not schema_exists(template_schema)
+    if created:
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA "{template_schema}"')
+    call_command('migrate_schemas', schema_name=template_schema, interactive=False, verbosity=0)
+    connection.set_schema_to_public()
+    CloneSchema()._create_clone_schema_function()
+    return created
+
+
+def provision_tenant(spec, template_schema):
+    """
+    Clona ``template_schema`` en ``spec['schema_name']`` y crea el Tenant y
+    sus dominios, todo en una transacción: si algo falla no queda un schema
+    huérfano ni un tenant sin schema.
+    """
+    Tenant = get_tenant_model()
+    Domain = get_tenant_domain_model()
+
+    started = time.perf_counter()
+    connection.set_schema_to_public()
+    with transaction.atomic():
+        if schema_exists(spec['schema_name']):
+            raise ValueError(f"El schema '{spec['schema_name']}' ya existe.")
+        with connection.cursor() as cursor:
+            cursor.execute(CLONE_SCHEMA_SQL, [template_schema, spec['schema_name'], 'DATA'])
+
+        tenant = Tenant(schema_name=spec['schema_name'], name=spec['name'])
+        tenant.auto_create_schema = False
+        tenant.save()
+        for position, domain in enumerate(spec['domains']):
+            Domain.objects.create(domain=domain, tenant=tenant, is_primary=position == 0)
+    return {
+        'schema_name': spec['schema_name'],
+        'name': spec['name'],
+        'domains': list(spec['domains']),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _safe_provision_tenant(spec, template_schema):
+    try:
+        return provision_tenant(spec, template_schema)
+    except Exception as exc:
+        return {'schema_name': spec['schema_name'], 'error': f"{type(exc).__name__}: {exc}"}
+
+
+def provision_tenants(specs, template_schema=None, concurrency=4):
+    """
+    Prepara la plantilla y da de alta ``specs`` con hasta ``concurrency``
+    procesos en paralelo (con 1 se hace en el propio proceso). Un tenant que
+    falla aparece con ``error`` y no afecta a los demás.
+    """
+    template_schema = template_schema or get_template_schema()
+    started = time.perf_counter()
+    template_created = prepare_template_schema(template_schema)
+    template_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    tenants = run_in_processes(_safe_provision_tenant, [(spec, template_schema) for spec in specs], concurrency)
+
+    tenants.sort(key=lambda tenant: tenant['schema_name'])
+    return {
+        'template_schema': template_schema,
+        'template_created': template_created,
+        'template_ms': template_ms,
+        'tenants': tenants,
+        'failed': sum(1 for tenant in tenants if 'error' in tenant),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
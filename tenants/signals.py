@@ -0,0 +1,73 @@
+# tenants/signals.py
+from django.conf import settings
+from django.db import connection
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .cache import invalidate_hostnames, invalidate_membership, invalidate_tokens, invalidate_user_tenants
+from .models import Domain, Tenant, TenantMembership
+
+
+def _tenant_member_ids(tenant_id):
+    return TenantMembership.objects.filter(tenant_id=tenant_id).values_list('user_id', flat=True)
+
+
+@receiver(post_save, sender=TenantMembership)
+@receiver(post_delete, sender=TenantMembership)
+def invalidate_membership_cache(sender, instance, **kwargs):
+    invalidate_membership(instance.user_id, instance.tenant_id)
+    invalidate_user_tenants(instance.user_id)
+
+
+@receiver(pre_save, sender=Domain)
+def invalidate_renamed_domain(sender, instance, **kwargs):
+    # Si se cambia el nombre del dominio, el antiguo deja de resolver al tenant.
+    if instance.pk:
+        old_domain = Domain.objects.filter(pk=instance.pk).values_list('domain', flat=True).first()
+        if old_domain and old_domain != instance.domain:
+            invalidate_hostnames(old_domain)
+
+
+@receiver(post_save, sender=Domain)
+@receiver(post_delete, sender=Domain)
+def invalidate_domain_cache(sender, instance, **kwargs):
+    invalidate_hostnames(instance.domain)
+    invalidate_user_tenants(*_tenant_member_ids(instance.tenant_id))
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_tenant_domains(sender, instance, **kwargs):
+    invalidate_hostnames(*Domain.objects.filter(tenant_id=instance.pk).values_list('domain', flat=True))
+    invalidate_user_tenants(*_tenant_member_ids(instance.pk))
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token_cache(sender, instance, **kwargs):
+    invalidate_tokens(connection.schema_name, instance.key)
+
+
+# Campos del usuario cacheado con su token que deciden si se autentica y
+# con qué permisos (ver CachedTokenAuthentication).
+AUTH_FIELDS = ('is_active', 'password', 'is_staff', 'is_superuser')
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def load_user_auth_fields(sender, instance, update_fields=None, **kwargs):
+    # Los guardados que no tocan AUTH_FIELDS (update_last_login en cada
+    # login, por ejemplo) no consultan nada.
+    instance._stored_auth_fields = None
+    if instance.pk is None or (update_fields is not None and not set(AUTH_FIELDS) & set(update_fields)):
+        return
+    instance._stored_auth_fields = sender.objects.filter(pk=instance.pk).values_list(*AUTH_FIELDS).first()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, created=False, **kwargs):
+    # Desactivar un usuario, cambiarle la contraseña o sus permisos invalida sus tokens del schema actual.
+    stored = getattr(instance, '_stored_auth_fields', None)
+    if created or stored is None or stored == tuple(getattr(instance, field) for field in AUTH_FIELDS):
+        return
+    invalidate_tokens(connection.schema_name, *Token.objects.filter(user_id=instance.pk).values_list('key', flat=True))
@@ -1,3 +1,242 @@
-from django.test import TestCase
+import json
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User, update_last_login
+from django_tenants.test.cases import TenantTestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from django_tenants.utils import schema_context, schema_exists
+
+from .authentication import CachedTokenAuthentication
+from .cache import (
+    LocalTTLCache, get_available_tenants, get_domain_cache, get_membership_cache, get_token_cache, get_user_tenants_cache,
+    is_tenant_member,
+)
+from .middleware import CachedTenantMainMiddleware
+from .models import Domain, Tenant, TenantMembership
+
+
+class LocalTTLCacheTests(SimpleTestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LocalTTLCache(ttl=60, max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_entries_expire(self):
+        cache = LocalTTLCache(ttl=10, max_size=10)
+        with mock.patch('tenants.cache.time.monotonic', return_value=100):
+            cache.set('a', False)
+        with mock.patch('tenants.cache.time.monotonic', return_value=105):
+            self.assertIs(cache.get('a'), False)
+        with mock.patch('tenants.cache.time.monotonic', return_value=111):
+            self.assertIsNone(cache.get('a'))
+
+
+class MembershipCacheTests(TenantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        get_membership_cache().clear()
+        self.addCleanup(get_membership_cache().clear)
+        connection.set_schema_to_public()
+        self.user = User.objects.create_user(username='escaner', password='secret')
+        self.membership = TenantMembership.objects.create(user=self.user, tenant=self.tenant)
+
+    def test_revoked_membership_is_dropped_again_on_commit(self):
+        self.assertTrue(is_tenant_member(self.user, self.tenant))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.membership.delete()
+            self.assertFalse(is_tenant_member(self.user, self.tenant))
+            # Otra petición, que aún no ve el borrado, vuelve a guardar la membresía.
+            get_membership_cache().set((self.user.pk, self.tenant.pk), True)
+        self.assertFalse(is_tenant_member(self.user, self.tenant))
+
+
+class CachedTenantMainMiddlewareTests(TenantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        get_domain_cache().clear()
+        self.addCleanup(get_domain_cache().clear)
+        self.middleware = CachedTenantMainMiddleware(lambda request: HttpResponse())
+
+    def resolve(self, hostname):
+        request = RequestFactory(HTTP_HOST=hostname).get('/')
+        with CaptureQueriesContext(connection) as queries:
+            self.middleware(request)
+        # Sin contar el SET search_path que django-tenants emite al abrir cursor.
+        return request, sum('tenants_domain' in query['sql'] for query in queries.captured_queries)
+
+    def test_resolves_tenant_from_cache(self):
+        request, first_queries = self.resolve(self.domain.domain)
+        self.assertEqual(request.tenant.schema_name, self.tenant.schema_name)
+        self.assertEqual(first_queries, 1)
+
+        request, queries = self.resolve(self.domain.domain)
+        self.assertEqual(request.tenant.pk, self.tenant.pk)
+        self.assertEqual(request.tenant.domain_url, self.domain.domain)
+        self.assertEqual(queries, 0)
+
+    def test_domain_changes_invalidate_cache(self):
+        # Copias: self.tenant y self.domain son de la clase y los comparten todos los tests.
+        hostname = self.domain.domain
+        self.resolve(hostname)
+        connection.set_schema_to_public()
+        tenant = Tenant.objects.get(pk=self.tenant.pk)
+        tenant.name = 'Renombrado'
+        tenant.save()
+        request, queries = self.resolve(hostname)
+        self.assertEqual(queries, 1)
+        self.assertEqual(request.tenant.name, 'Renombrado')
+
+        connection.set_schema_to_public()
+        domain = Domain.objects.get(pk=self.domain.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            domain.domain = 'renamed.test.com'
+            domain.save()
+            # Otra petición, que aún no ve el cambio, vuelve a guardar el nombre antiguo.
+            get_domain_cache().set(hostname, tenant)
+        with self.assertRaises(Http404):
+            self.resolve(hostname)
+
+
+class CachedTokenAuthenticationTests(TenantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        get_token_cache().clear()
+        self.addCleanup(get_token_cache().clear)
+        self.user = User.objects.create_user(username='escaner', password='secret')
+        self.token = Token.objects.create(user=self.user)
+        self.authentication = CachedTokenAuthentication()
+
+    def test_second_request_skips_database(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.token.key))
+
+    def test_deactivating_user_invalidates(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)
+
+    def test_deleting_token_invalidates(self):
+        key = self.token.key
+        self.authentication.authenticate_credentials(key)
+        with self.captureOnCommitCallbacks(execute=True):
+            Token.objects.get(key=key).delete()
+            # Otra petición, que aún no ve el borrado, vuelve a guardar el token.
+            get_token_cache().set((connection.schema_name, key), self.token)
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(key)
+
+    def test_saves_that_do_not_affect_authentication_keep_tokens(self):
+        self.authentication.authenticate_credentials(self.token.key)
+        with CaptureQueriesContext(connection) as queries:
+            update_last_login(None, self.user)
+            self.user.first_name = 'Ana'
+            self.user.save()
+        self.assertFalse(any('authtoken_token' in query['sql'] for query in queries.captured_queries))
+        with self.assertNumQueries(0):
+            self.authentication.authenticate_credentials(self.token.key)
+
+        self.user.set_password('otra')
+        self.user.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(sum('authtoken_token' in query['sql'] for query in queries.captured_queries), 1)
+
+
+class AvailableTenantsCacheTests(TenantTestCase):
+
+    def setUp(self):
+        super().setUp()
+        get_user_tenants_cache().clear()
+        self.addCleanup(get_user_tenants_cache().clear)
+        connection.set_schema_to_public()
+        self.user = User.objects.create_user(username='escaner', password='secret')
+        TenantMembership.objects.create(user=self.user, tenant=self.tenant)
+
+    def test_cached_until_domains_or_memberships_change(self):
+        tenants = get_available_tenants(self.user)
+        self.assertEqual([tenant['schema_name'] for tenant in tenants], [self.tenant.schema_name])
+        with self.assertNumQueries(0):
+            get_available_tenants(self.user)
+
+        Domain.objects.create(domain='extra.test.com', tenant_id=self.tenant.pk, is_primary=False)
+        domains = {domain['domain'] for domain in get_available_tenants(self.user)[0]['all_domains']}
+        self.assertIn('extra.test.com', domains)
+
+        stale = get_available_tenants(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            TenantMembership.objects.filter(user=self.user).get().delete()
+            # Otra petición, que aún no ve el borrado, vuelve a guardar la lista antigua.
+            get_user_tenants_cache().set(self.user.pk, stale)
+        self.assertEqual(get_available_tenants(self.user), [])
+
+
+class ProvisionTenantsTests(TransactionTestCase):
+    """Clona una plantilla real: DDL y procesos 'spawn' necesitan datos confirmados."""
+    template = 'test_tenant_template'
+    schemas = ('prov_beta', 'prov_gamma')
+
+    def tearDown(self):
+        connection.set_schema_to_public()
+        with connection.cursor() as cursor:
+            for schema in (self.template,) + self.schemas:
+                cursor.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+
+    def provision(self, specs, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as handle:
+            json.dump(specs, handle)
+            handle.flush()
+            call_command('provision_tenants', handle.name, '--template', self.template, *args, stdout=mock.Mock())
+
+    def test_clones_template_in_parallel(self):
+        from warehouse_management.models import Lot, Pallet, PalletLot, Product, Warehouse, WarehouseLotStock
+
+        self.provision([
+            {'schema_name': 'prov_beta', 'name': 'Beta', 'domains': ['beta.test', 'www.beta.test']},
+            {'schema_name': 'prov_gamma', 'name': 'Gamma', 'domains': ['gamma.test']},
+        ], '-c', '2')
+
+        self.assertTrue(schema_exists(self.template))
+        self.assertEqual(
+            set(Domain.objects.filter(is_primary=True).values_list('domain', flat=True)) & {'beta.test', 'www.beta.test', 'gamma.test'},
+            {'beta.test', 'gamma.test'}
+        )
+        with schema_context('prov_beta'):
+            # El clon trae las tablas, el registro de migraciones y los triggers de stock.
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT count(*) FROM django_migrations WHERE app = 'warehouse_management'")
+                self.assertGreater(cursor.fetchone()[0], 0)
+            warehouse = Warehouse.objects.create(name='W')
+            lot = Lot.objects.create(name='L', product=Product.objects.create(name='P'))
+            PalletLot.objects.create(pallet=Pallet.objects.create(name='P1', warehouse=warehouse), lot=lot)
+            self.assertEqual(WarehouseLotStock.objects.get(warehouse=warehouse, lot=lot).ok_count, 1)
+
+    def test_failed_tenant_leaves_no_schema(self):
+        Tenant(schema_name='public', name='Public').save()
+        Domain.objects.create(domain='taken.test', tenant=Tenant.objects.get(schema_name='public'))
+
+        with self.assertRaises(CommandError):
+            self.provision([{'schema_name': 'prov_beta', 'name': 'Beta', 'domains': ['taken.test']}], '-c', '1')
+
+        self.assertFalse(schema_exists('prov_beta'))
+        self.assertFalse(Tenant.objects.filter(schema_name='prov_beta').exists())
@@ -0,0 +1,43 @@
+# tenants/workers.py
+"""
+Pool de procesos para trabajos por tenant (informe consolidado, alta masiva
+de tenants): un worker por proceso, cada uno con su propia conexión a la
+base de datos.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+from django.db import connection
+
+
+def _init_worker(settings_module, database_name):
+    # Procesos 'spawn': no heredan conexiones abiertas del padre.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+    from django.db import connections
+    connections['default'].settings_dict['NAME'] = database_name
+
+
+def run_in_processes(function, calls, concurrency):
+    """
+    Resultados de ``function(*args)`` para cada ``args`` de ``calls``, con
+    hasta ``concurrency`` procesos en paralelo (con 1, o con una sola
+    llamada, en el propio proceso), en el orden en que terminan.
+    ``function`` debe ser de nivel de módulo para poder enviarse al worker.
+    """
+    calls = list(calls)
+    if concurrency <= 1 or len(calls) <= 1:
+        return [function(*args) for args in calls]
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=min(concurrency, len(calls)),
+        mp_context=get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(os.environ['DJANGO_SETTINGS_MODULE'], connection.settings_dict['NAME']),
+    ) as pool:
+        futures = [pool.submit(function, *args) for args in calls]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return results
@@ -1,6 +1,8 @@
 # En gestion_almacen/admin.py
 from django.contrib import admin
-from .models import Product, Lot, Warehouse, Pallet, PalletLot, ActionLog
+from django.contrib.admin.views.main import ChangeList
+from .audit import resolve_affected_objects
+from .models import Product, Lot, Warehouse, Pallet, PalletLot, ActionLog, ActionLogArchive
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -29,19 +31,39 @@ class PalletAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     inlines = [PalletLotInline]
 
+class ActionLogChangeList(ChangeList):
+    def get_results(self, request):
+        super().get_results(request)
+        # Un in_bulk por content type para toda la página, no una consulta por fila.
+        self.result_list = resolve_affected_objects(self.result_list)
+
 @admin.register(ActionLog)
 class ActionLogAdmin(admin.ModelAdmin):
     list_display = ('user', 'action_type', 'content_object_display', 'timestamp')
     list_filter = ('action_type', 'user', 'content_type')
-    readonly_fields = ('user', 'action_type', 'content_type', 'object_id', 'timestamp', 'description')
+    list_select_related = ('user', 'content_type')
+    readonly_fields = ('user', 'action_type', 'content_type', 'object_id', 'object_repr', 'timestamp', 'description')
+
+    def get_changelist(self, request, **kwargs):
+        return ActionLogChangeList
 
     def content_object_display(self, obj):
-        if obj.content_type and obj.object_id:
-            ModelClass = obj.content_type.model_class()
-            if ModelClass:
-                try:
-                    return ModelClass.objects.get(pk=obj.object_id)
-                except ModelClass.DoesNotExist:
-                    return f"Objeto eliminado (ID: {obj.object_id})"
+        if obj.content_type_id and obj.object_id:
+            if not hasattr(obj, 'resolved_object_str'):
+                resolve_affected_objects([obj])
+            if obj.resolved_object_str is not None:
+                return obj.resolved_object_str
+            if obj.object_repr:
+                return f"{obj.object_repr} (eliminado)"
+            return f"Objeto eliminado (ID: {obj.object_id})"
         return "-"
-    content_object_display.short_description = 'Objeto Afectado'
\ No newline at end of file
+    content_object_display.short_description = 'Objeto Afectado'
+
+@admin.register(ActionLogArchive)
+class ActionLogArchiveAdmin(ActionLogAdmin):
+    # Sólo consulta: las entradas llegan aquí con archive_action_logs.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
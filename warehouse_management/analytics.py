@@ -0,0 +1,222 @@
+# warehouse_management/analytics.py
+"""
+Series de entradas, salidas y defectos de pallets por día o semana,
+agrupadas por almacén, producto o lote y agregadas en la base de datos
+(date_trunc sobre ``in_date`` / ``out_date``).
+
+Cada periodo ya cerrado se guarda en la caché THROUGHPUT_CACHE y no vuelve
+a calcularse: en cada petición sólo se consulta desde el primer periodo que
+falta en caché, normalmente sólo el periodo en curso. Una escritura que
+cambia datos de un periodo cerrado (fechas atrasadas, defectos, lotes de un
+pallet antiguo) descarta la caché del schema (ver touches_closed_period y
+signals.py).
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from tenants.cache import get_cache, invalidate_schema, schema_generation
+from .models import Lot, Pallet, PalletLot, Product, Warehouse
+
+PERIODS = ('day', 'week')
+GROUPS = ('warehouse', 'product', 'lot')
+MAX_BUCKETS = 400
+
+THROUGHPUT_CACHE_DEFAULTS = {'TTL': 30 * 24 * 3600, 'MAX_SIZE': 50000, 'BACKEND': None, 'CLOSE_DELAY': 0}
+
+GROUP_MODELS = {'warehouse': Warehouse, 'product': Product, 'lot': Lot}
+
+
+def get_throughput_config():
+    return {**THROUGHPUT_CACHE_DEFAULTS, **getattr(settings, 'THROUGHPUT_CACHE', {})}
+
+
+def get_throughput_cache():
+    return get_cache('THROUGHPUT_CACHE', 'warehouse:throughput', THROUGHPUT_CACHE_DEFAULTS)
+
+
+# --- Periodos -----------------------------------------------------------------
+#
+# Los periodos se identifican por la fecha local (TIME_ZONE) de su inicio;
+# las semanas empiezan en lunes, como date_trunc('week').
+
+def period_start(value, period):
+    """Fecha de inicio del periodo que contiene ``value`` (date o datetime aware)."""
+    day = timezone.localtime(value).date() if isinstance(value, datetime) else value
+    if period == 'week':
+        day -= timedelta(days=day.weekday())
+    return day
+
+
+def next_period(day, period):
+    return day + timedelta(days=7 if period == 'week' else 1)
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def period_buckets(since, until, period):
+    """Inicios de los periodos que cortan ``[since, until)`` (fechas)."""
+    buckets = []
+    day = period_start(since, period)
+    while day < until:
+        buckets.append(day)
+        day = next_period(day, period)
+    return buckets
+
+
+def is_closed(day, period, now=None):
+    """Si el periodo que empieza en ``day`` ya terminó (más CLOSE_DELAY segundos)."""
+    delay = timedelta(seconds=get_throughput_config()['CLOSE_DELAY'])
+    return local_midnight(next_period(day, period)) + delay <= (now or timezone.now())
+
+
+def touches_closed_period(*values):
+    """Si alguna de las fechas (datetime; se ignoran los None) cae en un día ya cerrado."""
+    return any(value is not None and is_closed(period_start(value, 'day'), 'day') for value in values)
+
+
+def pallet_change_touches_closed_period(old, new):
+    """
+    Si guardar un pallet que tenía los valores ``old`` con los valores
+    ``new`` (dicts con ``in_date``, ``out_date``, ``defective`` y
+    ``warehouse_id``; ``old`` vacío si es nuevo) cambia un día cerrado: una
+    fecha que se mueve desde o hacia uno, o un defecto (cuenta en la
+    entrada) o un traslado (cuenta en ambas) de un pallet con fechas en uno.
+    Igual que services._transition_pallets para los cambios por lotes.
+    """
+    if not old:
+        return touches_closed_period(new.get('in_date'), new.get('out_date'))
+    dates = []
+    for field in ('in_date', 'out_date'):
+        if old.get(field) != new.get(field):
+            dates += [old.get(field), new.get(field)]
+    if old.get('defective') != new.get('defective'):
+        dates.append(new.get('in_date'))
+    if old.get('warehouse_id') != new.get('warehouse_id'):
+        dates += [new.get('in_date'), new.get('out_date')]
+    return touches_closed_period(*dates)
+
+
+# --- Consultas ----------------------------------------------------------------
+
+def _counts(direction, period, group_by, since, until, warehouse=None, product=None, lot=None):
+    """
+    ``{(periodo, grupo): (pallets, defectuosos)}`` de las entradas
+    (``direction='in'``) o salidas (``'out'``) en ``[since, until)``.
+    Agrupar por producto o lote va por PalletLot y cuenta pallets distintos.
+    """
+    if group_by in ('product', 'lot'):
+        queryset, prefix = PalletLot.objects.all(), 'pallet__'
+        group_field = 'lot__product_id' if group_by == 'product' else 'lot_id'
+        counted = 'pallet_id'
+    else:
+        queryset, prefix = Pallet.objects.all(), ''
+        group_field = 'warehouse_id' if group_by == 'warehouse' else None
+        counted = 'id'
+
+    date_field = f"{prefix}{'in_date' if direction == 'in' else 'out_date'}"
+    queryset = queryset.filter(**{f'{date_field}__gte': local_midnight(since), f'{date_field}__lt': local_midnight(until)})
+    if warehouse is not None:
+        queryset = queryset.filter(**{f'{prefix}warehouse_id': warehouse})
+    if prefix:
+        if product is not None:
+            queryset = queryset.filter(lot__product_id=product)
+        if lot is not None:
+            queryset = queryset.filter(lot_id=lot)
+    else:
+        if product is not None:
+            queryset = queryset.filter(pk__in=PalletLot.objects.filter(lot__product_id=product).values('pallet_id'))
+        if lot is not None:
+            queryset = queryset.filter(pk__in=PalletLot.objects.filter(lot_id=lot).values('pallet_id'))
+
+    rows = queryset.annotate(bucket=Trunc(date_field, period)).values(
+        'bucket', *([group_field] if group_field else [])
+    ).annotate(
+        total=Count(counted, distinct=bool(prefix)),
+        defective=Count(counted, distinct=bool(prefix), filter=Q(**{f'{prefix}defective': True})),
+    ).order_by()
+    return {
+        (period_start(row['bucket'], period), row[group_field] if group_field else None): (row['total'], row['defective'])
+        for row in rows
+    }
+
+
+def _compute_buckets(period, group_by, since, until, filters):
+    """``{periodo: {grupo: (entradas, salidas, entradas defectuosas)}}`` de ``[since, until)``."""
+    inbound = _counts('in', period, group_by, since, until, **filters)
+    outbound = _counts('out', period, group_by, since, until, **filters)
+    buckets = {day: {} for day in period_buckets(since, until, period)}
+    for (day, group), (total, defective) in inbound.items():
+        buckets[day][group] = (total, 0, defective)
+    for (day, group), (total, _) in outbound.items():
+        pallets_in, _, defective = buckets[day].get(group, (0, 0, 0))
+        buckets[day][group] = (pallets_in, total, defective)
+    return buckets
+
+
+def invalidate_throughput_cache():
+    """Descarta los periodos cerrados guardados del schema actual (ahora y tras el commit)."""
+    invalidate_schema(get_throughput_cache())
+
+
+def throughput(period, since, until, group_by=None, warehouse=None, product=None, lot=None):
+    """
+    Serie de ``period`` ('day' o 'week') en ``[since, until)`` (fechas
+    locales; se amplía al inicio del primer periodo), por ``group_by``
+    ('warehouse', 'product', 'lot' o None para el total) y con filtros
+    opcionales por id. Formato compacto: la lista de periodos y, por
+    grupo, una lista de valores alineada con ella.
+    """
+    filters = {'warehouse': warehouse, 'product': product, 'lot': lot}
+    days = period_buckets(since, until, period)
+    if not days:
+        raise ValueError("El rango no contiene ningún periodo.")
+    schema_name = connection.schema_name
+    cache = get_throughput_cache()
+    generation = schema_generation(cache, schema_name)
+
+    def key(day):
+        return (schema_name, generation, period, group_by, warehouse, product, lot, day.isoformat())
+
+    buckets, first_missing = {}, None
+    for day in days:
+        cached = cache.get(key(day)) if is_closed(day, period) else None
+        if cached is None:
+            first_missing = day
+            break
+        buckets[day] = cached
+    if first_missing is not None:
+        computed = _compute_buckets(period, group_by, first_missing, next_period(days[-1], period), filters)
+        for day, groups in computed.items():
+            buckets[day] = groups
+            if is_closed(day, period):
+                cache.set(key(day), groups)
+
+    groups = sorted({group for groups in buckets.values() for group in groups}, key=lambda group: (group is None, group))
+    names = {}
+    if group_by:
+        names = dict(GROUP_MODELS[group_by].objects.filter(pk__in=groups).values_list('pk', 'name'))
+    series = []
+    for group in groups:
+        values = [buckets[day].get(group, (0, 0, 0)) for day in days]
+        series.append({
+            'id': group,
+            'name': names.get(group),
+            'pallets_in': [value[0] for value in values],
+            'pallets_out': [value[1] for value in values],
+            'defective_in': [value[2] for value in values],
+            'defect_rate': [round(value[2] / value[0], 4) if value[0] else None for value in values],
+        })
+    return {
+        'period': period,
+        'group_by': group_by,
+        'periods': [day.isoformat() for day in days],
+        'closed': sum(1 for day in days if is_closed(day, period)),
+        'series': series,
+    }
@@ -0,0 +1,115 @@
+# warehouse_management/archive.py
+"""
+Archivado de ActionLog: las entradas más antiguas que
+``ACTION_LOG_RETENTION['HOT_DAYS']`` pasan, por tandas, de la tabla caliente
+a ActionLogArchive (comando archive_action_logs), para que la tabla que leen
+ActionLogViewSet y el admin y sus índices sigan siendo pequeños.
+
+Cada tanda es una sola sentencia (DELETE ... RETURNING dentro de un INSERT),
+así que es atómica sin abrir una transacción larga, conserva los ids y no
+bloquea más filas que las que mueve. Las lecturas que necesitan el archivo
+consultan la vista ActionLogHistory (ver archive_horizon y
+filters.ActionLogFilterBackend).
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import ActionLog, ActionLogArchive
+
+ACTION_LOG_RETENTION_DEFAULTS = {'HOT_DAYS': 180, 'CHUNK_SIZE': 5000}
+
+ARCHIVED_COLUMNS = ('id', 'user_id', 'action_type', 'timestamp', 'content_type_id', 'object_id', 'object_repr', 'description')
+
+
+def get_retention_config():
+    return {**ACTION_LOG_RETENTION_DEFAULTS, **getattr(settings, 'ACTION_LOG_RETENTION', {})}
+
+
+def archive_cutoff(days=None, now=None):
+    """Fecha a partir de la cual las entradas se quedan en la tabla caliente."""
+    if days is None:
+        days = get_retention_config()['HOT_DAYS']
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def pending_by_month(cutoff):
+    """``[(mes, entradas)]`` que archivaría un corte en ``cutoff``, del más antiguo al más reciente."""
+    rows = (
+        ActionLog.objects.filter(timestamp__lt=cutoff)
+        .annotate(month=TruncMonth('timestamp')).order_by('month')
+        .values_list('month').annotate(count=Count('id'))
+    )
+    return list(rows)
+
+
+def _move_chunk_sql():
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in ARCHIVED_COLUMNS)
+    hot, archive = quote(ActionLog._meta.db_table), quote(ActionLogArchive._meta.db_table)
+    # SKIP LOCKED: una entrada bloqueada por otra transacción se archiva en la
+    # siguiente pasada en lugar de hacer esperar a la tanda entera. Sin ON
+    # CONFLICT: si un id ya está archivado, la sentencia falla y no borra nada.
+    return f"""
+        WITH moved AS (
+            DELETE FROM {hot} WHERE id IN (
+                SELECT id FROM {hot} WHERE timestamp < %s
+                ORDER BY timestamp, id LIMIT %s FOR UPDATE SKIP LOCKED
+            )
+            RETURNING {columns}
+        ), inserted AS (
+            INSERT INTO {archive} ({columns}) SELECT {columns} FROM moved
+        )
+        SELECT (SELECT count(*) FROM moved), (SELECT max(timestamp) FROM moved)
+    """
+
+
+def archive_action_logs(cutoff, chunk_size=None, pause=0, progress=None):
+    """
+    Mueve a ActionLogArchive las entradas anteriores a ``cutoff`` en tandas
+    de ``chunk_size``, de la más antigua a la más reciente, con ``pause``
+    segundos entre tandas para no saturar la base de datos. Devuelve el
+    número de entradas movidas. ``progress(movidas, hasta)`` tras cada tanda.
+    Si alguna entrada ya está en el archivo, la tanda se deshace entera y
+    se lanza IntegrityError: las tandas anteriores quedan archivadas.
+    """
+    chunk_size = chunk_size or get_retention_config()['CHUNK_SIZE']
+    sql = _move_chunk_sql()
+    moved = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [cutoff, chunk_size])
+            count, last_timestamp = cursor.fetchone()
+        if not count:
+            return moved
+        moved += count
+        if progress:
+            progress(moved, last_timestamp)
+        if count < chunk_size:
+            return moved
+        if pause:
+            time.sleep(pause)
+
+
+def archive_horizon():
+    """Timestamp de la entrada archivada más reciente, o None si el archivo está vacío."""
+    return ActionLogArchive.objects.aggregate(horizon=Max('timestamp'))['horizon']
+
+
+def range_needs_archive(after=None, before=None):
+    """
+    Si el rango ``[after, before)`` puede tener entradas archivadas. Sin
+    ``after`` sólo las tiene si se pide un ``before`` (un rango abierto hacia
+    el pasado); sin ningún límite se lee únicamente la tabla caliente.
+    """
+    if after is None and before is None:
+        return False
+    horizon = archive_horizon()
+    if horizon is None:
+        return False
+    return after is None or after <= horizon
@@ -0,0 +1,241 @@
+# warehouse_management/async_views.py
+"""
+Lecturas async (vistas async de Django, sin DRF) de las rutas que sondean
+los paneles: stock de un almacén, pallets por lote y cola del ActionLog.
+Devuelven el mismo JSON que sus equivalentes de DRF, con la misma
+paginación por número de página.
+
+Bajo ASGI, Django ejecuta todo el código síncrono de una petición
+(middlewares como la de django-tenants, que fija el schema, y cada
+consulta del ORM async) en un hilo propio de esa petición con su propia
+conexión; el schema fijado para una corrutina no lo ve otra. Ese hilo sólo
+se ocupa durante cada consulta: la autenticación, la serialización y la
+espera entre pasos corren en el bucle de eventos. Bajo WSGI las vistas
+siguen funcionando (Django las ejecuta con async_to_sync).
+"""
+import functools
+import math
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from tenants.authentication import CachedTokenAuthentication
+from tenants.cache import is_tenant_member
+from .audit import resolve_affected_objects
+from .metrics import timing_serialization
+from .models import ActionLog, Lot, Pallet, PalletLot, Product, Warehouse, WarehouseLotStock
+from .permissions import IsMemberOfCurrentTenant
+from .serializers import ActionLogSerializer, ActionLogTailSerializer, SimplePalletForGroupingSerializer, value_converter
+from .versioning import aconditional_get
+
+# Tablas de las que dependen stock y pallets por lote (ETag; ver versioning.py).
+WAREHOUSE_READ_MODELS = (Warehouse, Lot, Product, Pallet, PalletLot)
+
+
+def _error(exception):
+    response = JsonResponse({'detail': str(exception.detail)}, status=exception.status_code)
+    if isinstance(exception, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+def _use_tenant(tenant):
+    # TenantMainMiddleware ya lo fijó en este hilo; sólo cambia si la vista
+    # se llama fuera de su cadena de middlewares.
+    if connection.schema_name != tenant.schema_name:
+        connection.set_tenant(tenant)
+
+
+def _authenticate_token(request):
+    header = request.headers.get('Authorization', '').split()
+    if not header or header[0].lower() != 'token':
+        return None
+    if len(header) != 2:
+        raise exceptions.AuthenticationFailed("Cabecera de token no válida.")
+    user, _ = CachedTokenAuthentication().authenticate_credentials(header[1])
+    return user
+
+
+async def authenticate(request):
+    """
+    Usuario de la petición (token, como CachedTokenAuthentication, o
+    sesión) si es miembro del tenant; lanza la APIException de DRF que
+    correspondería (401 o 403).
+    """
+    tenant = getattr(request, 'tenant', None)
+    if tenant is None:
+        raise exceptions.PermissionDenied(IsMemberOfCurrentTenant.message)
+    await sync_to_async(_use_tenant)(tenant)
+    user = await sync_to_async(_authenticate_token)(request)
+    if user is None and hasattr(request, 'auser'):
+        user = await request.auser()
+    if user is None or not user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    if not await sync_to_async(is_tenant_member)(user, tenant):
+        raise exceptions.PermissionDenied(IsMemberOfCurrentTenant.message)
+    return user
+
+
+def tenant_read_view(view):
+    """GET autenticado y limitado a los miembros del tenant; los errores de DRF se devuelven como JSON."""
+    @require_GET
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            request.user = await authenticate(request)
+            return await view(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return _error(exc)
+    return wrapper
+
+
+async def _get_warehouse(pk):
+    if not await Warehouse.objects.filter(pk=pk).aexists():
+        raise exceptions.NotFound()
+
+
+async def paginate(request, queryset):
+    """
+    Filas de la página pedida de ``queryset`` y función que envuelve sus
+    resultados en la respuesta, como PageNumberPagination con PAGE_SIZE.
+    """
+    page_size = api_settings.PAGE_SIZE
+    count = await queryset.acount()
+    pages = max(math.ceil(count / page_size), 1)
+    param = PageNumberPagination.page_query_param
+    number = request.GET.get(param, 1)
+    if number in PageNumberPagination.last_page_strings:
+        number = pages
+    try:
+        number = int(number)
+    except (TypeError, ValueError):
+        number = 0
+    if not 1 <= number <= pages:
+        raise exceptions.NotFound(PageNumberPagination.invalid_page_message.format(
+            page_number=request.GET.get(param), message="Página fuera de rango."
+        ))
+    offset = (number - 1) * page_size
+    rows = [row async for row in queryset[offset:offset + page_size]]
+
+    def respond(results):
+        url = request.build_absolute_uri()
+        if number == 1:
+            previous = None
+        elif number == 2:
+            previous = remove_query_param(url, param)
+        else:
+            previous = replace_query_param(url, param, number - 1)
+        return JsonResponse({
+            'count': count,
+            'next': replace_query_param(url, param, number + 1) if number < pages else None,
+            'previous': previous,
+            'results': results,
+        })
+    return rows, respond
+
+
+def conditional(models):
+    """ETag de ``models``, y 304 si el cliente ya tiene la versión (ver versioning.py)."""
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            return await aconditional_get(request, models, view, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@tenant_read_view
+@conditional(WAREHOUSE_READ_MODELS)
+async def warehouse_stock(request, pk):
+    """Como WarehouseViewSet.stock (sin ``as_of``): WarehouseLotStock del almacén por nombre de lote."""
+    await _get_warehouse(pk)
+    queryset = WarehouseLotStock.objects.filter(warehouse_id=pk).exclude(
+        ok_count=0, defective_count=0, out_count=0
+    ).order_by('lot__name').values_list(
+        'lot_id', 'lot__name', 'lot__product_id', 'lot__product__name', 'ok_count', 'defective_count', 'out_count'
+    )
+    rows, respond = await paginate(request, queryset)
+    fields = ('lot', 'lot_name', 'product', 'product_name', 'ok_count', 'defective_count', 'out_count')
+    return respond([dict(zip(fields, row)) for row in rows])
+
+
+@tenant_read_view
+@conditional(WAREHOUSE_READ_MODELS)
+async def pallets_by_lot(request, pk):
+    """
+    Como WarehouseViewSet.pallets_grouped_by_lot. Los conteos salen de
+    WarehouseLotStock (O(lotes)) en lugar de agregarse sobre los pallets,
+    y los pallets activos no defectuosos, de una sola consulta por PalletLot.
+    """
+    await _get_warehouse(pk)
+    lots, respond = await paginate(request, WarehouseLotStock.objects.filter(
+        warehouse_id=pk, ok_count__gt=0
+    ).order_by('lot__name').values_list(
+        'lot_id', 'lot__name', 'lot__product_id', 'lot__product__name', 'ok_count', 'defective_count'
+    ))
+    pallets = PalletLot.objects.filter(
+        lot_id__in=[lot[0] for lot in lots], pallet__warehouse_id=pk, pallet__is_out=False, pallet__defective=False
+    ).order_by('pallet__create_date', 'pallet_id').values_list(
+        'lot_id', 'pallet_id', 'pallet__name', 'pallet__in_date', 'pallet__is_out', 'pallet__defective'
+    )
+    pallet_fields = SimplePalletForGroupingSerializer().fields
+    pallet_names = ('id', 'name', 'in_date', 'is_out', 'defective')
+    converters = [value_converter(pallet_fields[name]) for name in pallet_names]
+
+    by_lot = {}
+    for lot_id, name, product, product_name, ok_count, defective_count in lots:
+        by_lot[lot_id] = {
+            'id': lot_id, 'name': name, 'product': product, 'product_name': product_name,
+            'pallets_active': [], 'count_pallets_ok': ok_count, 'count_pallets_defective': defective_count,
+        }
+    rows = [row async for row in pallets]
+    with timing_serialization():
+        for lot_id, *values in rows:
+            lot = by_lot.get(lot_id)
+            if lot is not None:
+                lot['pallets_active'].append({
+                    name: convert(value) for name, convert, value in zip(pallet_names, converters, values)
+                })
+    return respond(list(by_lot.values()))
+
+
+@tenant_read_view
+async def action_log_tail(request):
+    """
+    Entradas del ActionLog con id mayor que ``after``, de la más antigua a
+    la más reciente y como mucho ``limit``; sin ``after``, las ``limit``
+    más recientes. ``last_id`` es el ``after`` de la siguiente consulta y
+    ``has_more`` indica que quedan más entradas. Los ids se asignan al
+    insertar, así que una entrada confirmada después de otra con id mayor
+    ya leída no aparece: para auditoría completa, ActionLogViewSet.
+    """
+    params = ActionLogTailSerializer(data=request.GET)
+    if not params.is_valid():
+        return JsonResponse(params.errors, status=400)
+    after, limit = params.validated_data['after'], params.validated_data['limit']
+
+    queryset = ActionLog.objects.select_related('user', 'content_type')
+    if after is None:
+        logs = [log async for log in queryset.order_by('-id')[:limit]][::-1]
+        has_more = False
+    else:
+        logs = [log async for log in queryset.filter(pk__gt=after).order_by('id')[:limit + 1]]
+        has_more = len(logs) > limit
+        logs = logs[:limit]
+    await sync_to_async(resolve_affected_objects)(logs)
+    # Un solo serializer para todas (construir sus campos es lo caro); como
+    # raíz, ya suma su tiempo de serialización. Los objetos afectados ya
+    # están resueltos, así que no consulta desde el bucle de eventos.
+    serializer = ActionLogSerializer()
+    results = [serializer.to_representation(log) for log in logs]
+    return JsonResponse({
+        'results': results,
+        'last_id': logs[-1].pk if logs else after,
+        'has_more': has_more,
+    })
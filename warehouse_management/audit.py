@@ -0,0 +1,198 @@
+# warehouse_management/audit.py
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django_tenants.utils import schema_context
+
+from .models import ActionLog, Lot, PalletLot
+
+logger = logging.getLogger(__name__)
+
+# Relaciones que usa el __str__ de cada modelo; se cargan junto al objeto
+# para que resolver una página de logs no dispare una consulta por fila.
+REPR_SELECT_RELATED = {
+    Lot: ('product',),
+    PalletLot: ('pallet', 'lot'),
+}
+
+
+def resolve_affected_objects(logs):
+    """
+    Resuelve en bloque los objetos afectados de una colección de ActionLog.
+
+    Agrupa los logs por content type y recupera cada grupo con un único
+    ``in_bulk``. Cada log queda con el atributo ``resolved_object_str``: el
+    ``str()`` actual del objeto, o ``None`` si ya no existe. Las entradas
+    DELETE no se buscan: para ellas basta con ``object_repr``.
+    """
+    logs = list(logs)
+    pending = defaultdict(set)
+    for log in logs:
+        if log.content_type_id and log.object_id and log.action_type != 'DELETE':
+            pending[log.content_type_id].add(log.object_id)
+
+    resolved = {}
+    for content_type_id, object_ids in pending.items():
+        ModelClass = ContentType.objects.get_for_id(content_type_id).model_class()
+        if ModelClass is None:
+            continue
+        queryset = ModelClass._default_manager.all()
+        related = REPR_SELECT_RELATED.get(ModelClass)
+        if related:
+            queryset = queryset.select_related(*related)
+        for pk, instance in queryset.in_bulk(object_ids).items():
+            resolved[(content_type_id, pk)] = str(instance)
+
+    for log in logs:
+        log.resolved_object_str = resolved.get((log.content_type_id, log.object_id))
+    return logs
+
+
+def make_action_log(user, action_type, instance, description=""):
+    """ActionLog sin guardar para ``instance``; útil para ``bulk_create``."""
+    return ActionLog(
+        user=user,
+        action_type=action_type,
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+        object_repr=str(instance)[:255],
+        description=description
+    )
+
+
+# --- Escritura de ActionLog -------------------------------------------------
+#
+# Todas las entradas de auditoría pasan por record_entries(). Según
+# settings.ACTION_LOG_BUFFER['MODE']:
+#
+# * 'sync': se insertan en el acto, dentro de la transacción en curso.
+# * 'buffered' (por defecto): se acumulan, sólo si su transacción confirma, en
+#   un buffer por hilo y se insertan con un único bulk_create al salir del
+#   bloque buffered_action_logs() más externo (la middleware envuelve cada
+#   petición), o antes si el buffer alcanza MAX_SIZE.
+# * 'worker': como 'buffered', pero el buffer sobrevive entre peticiones y se
+#   vacía al alcanzar MAX_SIZE entradas o MAX_AGE segundos, y al terminar el
+#   proceso. Menos escrituras, a cambio de perder entradas si el proceso muere.
+
+ACTION_LOG_BUFFER_DEFAULTS = {'MODE': 'buffered', 'MAX_SIZE': 500, 'MAX_AGE': 5.0}
+
+
+def get_buffer_config():
+    return {**ACTION_LOG_BUFFER_DEFAULTS, **getattr(settings, 'ACTION_LOG_BUFFER', {})}
+
+
+class ActionLogBuffer:
+    """Entradas pendientes de un hilo, agrupadas por schema de tenant."""
+
+    def __init__(self):
+        self.entries = defaultdict(list)
+        self.size = 0
+        self.oldest = None
+        self.depth = 0
+
+    def add(self, schema_name, entries):
+        if self.oldest is None:
+            self.oldest = time.monotonic()
+        self.entries[schema_name].extend(entries)
+        self.size += len(entries)
+
+    def is_due(self, config):
+        return self.size >= config['MAX_SIZE'] or (
+            self.oldest is not None and time.monotonic() - self.oldest >= config['MAX_AGE']
+        )
+
+    def flush(self):
+        pending, self.entries = self.entries, defaultdict(list)
+        self.size, self.oldest = 0, None
+        for schema_name, entries in pending.items():
+            try:
+                _write_entries(schema_name, entries)
+            except Exception:
+                # La operación auditada ya se confirmó: no la convertimos en un error.
+                logger.exception("No se pudieron guardar %d entradas de ActionLog (schema %s).", len(entries), schema_name)
+
+
+def _write_entries(schema_name, entries):
+    if schema_name == connection.schema_name:
+        ActionLog.objects.bulk_create(entries, batch_size=1000)
+    else:
+        with schema_context(schema_name):
+            ActionLog.objects.bulk_create(entries, batch_size=1000)
+
+
+_local = threading.local()
+_all_buffers = []
+_all_buffers_lock = threading.Lock()
+
+
+def _get_buffer():
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        buffer = _local.buffer = ActionLogBuffer()
+        with _all_buffers_lock:
+            _all_buffers.append(buffer)
+    return buffer
+
+
+def _enqueue(schema_name, entries):
+    config = get_buffer_config()
+    buffer = _get_buffer()
+    buffer.add(schema_name, entries)
+    if buffer.is_due(config) or (buffer.depth == 0 and config['MODE'] != 'worker'):
+        buffer.flush()
+
+
+def record_entries(entries):
+    """Registra ActionLog sin guardar (ver make_action_log) según el modo configurado."""
+    entries = list(entries)
+    if not entries:
+        return
+    if get_buffer_config()['MODE'] == 'sync':
+        ActionLog.objects.bulk_create(entries, batch_size=1000)
+        return
+    schema_name = connection.schema_name
+    # Fuera de un bloque atómico on_commit se ejecuta de inmediato; dentro, las
+    # entradas se descartan si la transacción se deshace.
+    transaction.on_commit(lambda: _enqueue(schema_name, entries))
+
+
+def record_action(user, action_type, instance, description=""):
+    record_entries([make_action_log(user, action_type, instance, description)])
+
+
+def flush_action_logs():
+    """Escribe ya las entradas pendientes del hilo actual."""
+    _get_buffer().flush()
+
+
+@contextmanager
+def buffered_action_logs():
+    """
+    Acumula las entradas registradas dentro del bloque y las escribe al salir
+    del bloque más externo con un solo bulk_create por schema.
+    """
+    buffer = _get_buffer()
+    buffer.depth += 1
+    try:
+        yield
+    finally:
+        buffer.depth -= 1
+        if buffer.depth == 0:
+            config = get_buffer_config()
+            if config['MODE'] != 'worker' or buffer.is_due(config):
+                buffer.flush()
+
+
+@atexit.register
+def _flush_all_buffers():
+    with _all_buffers_lock:
+        buffers = list(_all_buffers)
+    for buffer in buffers:
+        buffer.flush()
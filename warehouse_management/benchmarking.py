@@ -0,0 +1,268 @@
+# warehouse_management/benchmarking.py
+"""
+Banco de pruebas de los endpoints de la API (comando benchmark_endpoints).
+
+Cada acción de los viewsets se ejecuta con el cliente de pruebas de Django
+contra el dominio del tenant, con toda la pila de middlewares y
+autenticación por token. Por acción se miden la latencia (p50/p95/p99), las
+consultas a la base de datos, el pico de memoria de Python y el tamaño de
+la respuesta. Las escrituras se ejecutan dentro de una transacción que se
+deshace al terminar, así que el schema queda igual y cada repetición parte
+del mismo estado. Como esa transacción nunca confirma, sus ActionLog se
+escriben en modo 'sync', dentro de la petición: con buffer (on_commit) no
+llegarían a insertarse y la medida saldría por debajo de la real.
+
+La memoria se mide en una pasada aparte con tracemalloc, que ralentiza
+mucho la ejecución y no debe contaminar las latencias.
+"""
+import json
+import platform
+import time
+import tracemalloc
+from contextlib import nullcontext
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import urlencode
+
+import django
+from django.db import connection, transaction
+from django.test import Client, override_settings
+
+from .audit import get_buffer_config
+from .models import ActionLog, Lot, Pallet, PalletLot, Product, Warehouse, WarehouseLotStock
+
+API_PREFIX = '/api/v1/warehouse'
+
+
+class QueryCounter:
+    """execute_wrapper que cuenta consultas (CaptureQueriesContext se satura con el N+1 del serializer)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, fraction):
+    """Percentil ``fraction`` (0..1) de ``values`` ordenados, interpolando entre vecinos."""
+    if not values:
+        return None
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def case(name, method, path, body=None, setup=None, max_repeat=None):
+    """
+    Una acción a medir. ``path`` puede llevar query string. ``setup``, si se
+    da, se llama dentro de la transacción de cada repetición (fuera de la
+    medida) y devuelve la ruta; sirve para borrar un objeto recién creado.
+    ``max_repeat`` limita las repeticiones de las acciones muy costosas.
+    Todo lo que no es GET se considera escritura y se deshace.
+    """
+    return {
+        'name': name, 'method': method, 'path': path, 'body': body,
+        'write': method != 'GET', 'setup': setup, 'max_repeat': max_repeat,
+    }
+
+
+def prefix_of(name):
+    """Prefijo para las búsquedas: el nombre sin sus dos últimos caracteres."""
+    return name[:max(1, len(name) - 2)]
+
+
+def dataset_counts():
+    return {
+        'products': Product.objects.count(),
+        'lots': Lot.objects.count(),
+        'warehouses': Warehouse.objects.count(),
+        'pallets': Pallet.objects.count(),
+        'pallet_lots': PalletLot.objects.count(),
+        'action_logs': ActionLog.objects.count(),
+    }
+
+
+def build_cases(page_size=100, batch_size=100):
+    """
+    Las acciones de todos los viewsets, con objetos de ejemplo del schema
+    activo: el almacén con más pallets activos, el último pallet y sus
+    lotes, etc. Los listados se miden con la paginación por defecto (por
+    número de página, con COUNT) y, donde existe, también por cursor con
+    ``page_size`` filas. Lanza ValueError si el schema no tiene datos suficientes.
+    """
+    busiest = WarehouseLotStock.objects.order_by('-ok_count').values('warehouse', 'lot').first()
+    pallet = Pallet.objects.order_by('-pk').first()
+    log = ActionLog.objects.order_by('-pk').first()
+    if busiest is None or pallet is None or log is None:
+        raise ValueError("El schema necesita almacenes, lotes, pallets y ActionLog (ver generate_synthetic_data).")
+    lot = Lot.objects.select_related('product').get(pk=busiest['lot'])
+    product, warehouse_id = lot.product, busiest['warehouse']
+    names = list(Pallet.objects.order_by('-pk').values_list('name', flat=True)[:batch_size])
+    active_ids = list(Pallet.objects.filter(
+        warehouse_id=warehouse_id, is_out=False, defective=False
+    ).order_by('pk').values_list('pk', flat=True)[:batch_size]) or [pallet.pk]
+    cursor = f'pagination=cursor&page_size={page_size}'
+
+    products, lots, warehouses = f'{API_PREFIX}/products', f'{API_PREFIX}/lots', f'{API_PREFIX}/warehouses'
+    pallets, logs = f'{API_PREFIX}/pallets', f'{API_PREFIX}/action-logs'
+    model_paths = {Product: products, Lot: lots, Warehouse: warehouses}
+
+    def new_object(model, **fields):
+        def setup():
+            return f"{model_paths[model]}/{model.objects.create(**fields).pk}/"
+        return setup
+
+    return [
+        case('products.list', 'GET', f'{products}/'),
+        case('products.retrieve', 'GET', f'{products}/{product.pk}/'),
+        case('products.create', 'POST', f'{products}/', {'name': 'BENCH-PRODUCT'}),
+        case('products.update', 'PATCH', f'{products}/{product.pk}/', {'name': 'BENCH-PRODUCT'}),
+        case('products.destroy', 'DELETE', None, setup=new_object(Product, name='BENCH-PRODUCT')),
+
+        case('lots.list', 'GET', f'{lots}/'),
+        case('lots.retrieve', 'GET', f'{lots}/{lot.pk}/'),
+        case('lots.create', 'POST', f'{lots}/', {'name': 'BENCH-LOT', 'product': product.pk}),
+        case('lots.update', 'PATCH', f'{lots}/{lot.pk}/', {'name': 'BENCH-LOT'}),
+        case('lots.destroy', 'DELETE', None, setup=new_object(Lot, name='BENCH-LOT', product=product)),
+        case('lots.by_name', 'GET', f'{lots}/by-name/?{urlencode({"name": lot.name})}'),
+        case('lots.lookup', 'POST', f'{lots}/lookup/', {'names': [lot.name]}),
+        case('lots.search', 'GET', f'{lots}/search/?{urlencode({"q": prefix_of(lot.name)})}'),
+
+        case('warehouses.list', 'GET', f'{warehouses}/'),
+        case('warehouses.retrieve', 'GET', f'{warehouses}/{warehouse_id}/'),
+        case('warehouses.create', 'POST', f'{warehouses}/', {'name': 'BENCH-WAREHOUSE'}),
+        case('warehouses.update', 'PATCH', f'{warehouses}/{warehouse_id}/', {'address': 'Benchmark'}),
+        case('warehouses.destroy', 'DELETE', None, setup=new_object(Warehouse, name='BENCH-WAREHOUSE')),
+        case('warehouses.pallets_by_lot', 'GET', f'{warehouses}/{warehouse_id}/pallets-by-lot/'),
+        case('warehouses.stock', 'GET', f'{warehouses}/{warehouse_id}/stock/'),
+
+        case('pallets.list', 'GET', f'{pallets}/'),
+        case('pallets.list_cursor', 'GET', f'{pallets}/?{cursor}'),
+        case('pallets.list_filtered', 'GET', f'{pallets}/?{cursor}&warehouse={warehouse_id}&lot={lot.pk}&is_out=false'),
+        case('pallets.list_serializer', 'GET', f'{pallets}/?{cursor}&expand=warehouse'),
+        case('pallets.retrieve', 'GET', f'{pallets}/{pallet.pk}/'),
+        case('pallets.create', 'POST', f'{pallets}/', {'name': 'BENCH-PALLET', 'warehouse': warehouse_id, 'lots_ids': [lot.pk]}),
+        case('pallets.update', 'PATCH', f'{pallets}/{pallet.pk}/', {'defective': not pallet.defective}),
+        case('pallets.destroy', 'DELETE', f'{pallets}/{pallet.pk}/'),
+        case('pallets.bulk_create', 'POST', f'{pallets}/bulk/', [
+            {'name': f'BENCH-BULK-{n}', 'warehouse': warehouse_id, 'lots_ids': [lot.pk]} for n in range(batch_size)
+        ]),
+        case('pallets.mark_out', 'POST', f'{pallets}/mark-out/', {'ids': active_ids}),
+        case('pallets.mark_defective', 'POST', f'{pallets}/mark-defective/', {'ids': active_ids}),
+        case('pallets.by_name', 'GET', f'{pallets}/by-name/?{urlencode({"name": pallet.name})}'),
+        case('pallets.lookup', 'POST', f'{pallets}/lookup/', {'names': names}),
+        case('pallets.search', 'GET', f'{pallets}/search/?{urlencode({"q": prefix_of(pallet.name)})}'),
+        case('pallets.export', 'GET', f'{pallets}/export/?warehouse={warehouse_id}&lot={lot.pk}', max_repeat=3),
+
+        case('action_logs.list', 'GET', f'{logs}/'),
+        case('action_logs.list_cursor', 'GET', f'{logs}/?{cursor}'),
+        case('action_logs.retrieve', 'GET', f'{logs}/{log.pk}/'),
+        case('action_logs.export', 'GET', f'{logs}/export/?export_format=ndjson', max_repeat=3),
+    ]
+
+
+class EndpointBenchmark:
+    """Ejecuta ``cases`` contra ``hostname`` autenticándose con ``token``."""
+
+    def __init__(self, hostname, token, repeat=30, warmup=2):
+        self.client = Client(HTTP_HOST=hostname, HTTP_AUTHORIZATION=f'Token {token}')
+        self.repeat = repeat
+        self.warmup = warmup
+
+    def request(self, bench_case, queries=None):
+        """Una ejecución: devuelve (segundos, respuesta, bytes). Las escrituras se deshacen."""
+        if bench_case['write']:
+            with transaction.atomic(), override_settings(ACTION_LOG_BUFFER={**get_buffer_config(), 'MODE': 'sync'}):
+                result = self._request(bench_case, queries)
+                transaction.set_rollback(True)
+            return result
+        return self._request(bench_case, queries)
+
+    def _request(self, bench_case, queries):
+        path = bench_case['setup']() if bench_case['setup'] else bench_case['path']
+        body = {} if bench_case['body'] is None else {
+            'data': json.dumps(bench_case['body']), 'content_type': 'application/json'
+        }
+        with connection.execute_wrapper(queries) if queries else nullcontext():
+            started = time.perf_counter()
+            response = self.client.generic(bench_case['method'], path, **body)
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+            elapsed = time.perf_counter() - started
+        return elapsed, response, len(content)
+
+    def run_case(self, bench_case):
+        repeat = min(self.repeat, bench_case['max_repeat'] or self.repeat)
+        for _ in range(self.warmup):
+            self.request(bench_case)
+
+        timings, query_counts = [], []
+        for _ in range(repeat):
+            queries = QueryCounter()
+            elapsed, response, size = self.request(bench_case, queries)
+            timings.append(elapsed * 1000)
+            query_counts.append(queries.count)
+
+        tracemalloc.start()
+        try:
+            self.request(bench_case)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        timings.sort()
+        return {
+            'name': bench_case['name'],
+            'method': bench_case['method'],
+            'path': bench_case['path'],
+            'status': response.status_code,
+            'samples': repeat,
+            'p50_ms': round(percentile(timings, 0.50), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'mean_ms': round(sum(timings) / len(timings), 2),
+            'max_ms': round(timings[-1], 2),
+            'queries': max(query_counts),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'response_bytes': size,
+        }
+
+    def run(self, cases, progress=None):
+        results = []
+        for bench_case in cases:
+            results.append(self.run_case(bench_case))
+            if progress:
+                progress(results[-1])
+        return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'postgresql': connection.pg_version,
+        'generated_at': datetime.now(dt_timezone.utc).isoformat(),
+    }
+
+
+def compare_reports(baseline, current):
+    """
+    Diferencias por acción entre dos informes: ``[{name, p50/p99 antes y
+    después, ratio, consultas antes y después}]``, sólo las acciones que
+    están en ambos.
+    """
+    before = {result['name']: result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        old = before.get(result['name'])
+        if old is None:
+            continue
+        rows.append({
+            'name': result['name'],
+            'p50_ms': (old['p50_ms'], result['p50_ms']),
+            'p99_ms': (old['p99_ms'], result['p99_ms']),
+            'p50_ratio': round(result['p50_ms'] / old['p50_ms'], 2) if old['p50_ms'] else None,
+            'queries': (old['queries'], result['queries']),
+        })
+    return rows
@@ -0,0 +1,93 @@
+# warehouse_management/exports.py
+"""
+Exportaciones completas en CSV o NDJSON que se generan mientras se envían:
+las filas salen de ``values()`` con un cursor de servidor (``iterator``), de
+modo que la memoria del worker no depende del tamaño de la exportación.
+"""
+import csv
+from datetime import date, datetime
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, OuterRef, Subquery
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import PalletLot
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_CHUNK_SIZE = 2000
+
+PALLET_EXPORT_FIELDS = [
+    'id', 'name', 'warehouse_id', 'warehouse_name', 'lot_names', 'product_names',
+    'create_date', 'in_date', 'out_date', 'is_out', 'defective',
+]
+ACTION_LOG_EXPORT_FIELDS = [
+    'id', 'timestamp', 'action_type', 'username', 'content_type_model',
+    'object_id', 'object_repr', 'description',
+]
+
+
+def _names_of_pallet(path):
+    """Subconsulta correlacionada: nombres (separados por '|') de ``path`` en los lotes del pallet."""
+    return Subquery(
+        PalletLot.objects.filter(pallet=OuterRef('pk')).values('pallet').annotate(
+            names=StringAgg(path, delimiter='|', distinct=True, ordering=path)
+        ).values('names')
+    )
+
+
+def pallet_export_rows(queryset):
+    return queryset.annotate(
+        lot_names=_names_of_pallet('lot__name'),
+        product_names=_names_of_pallet('lot__product__name'),
+    ).values(
+        'id', 'name', 'warehouse_id', 'create_date', 'in_date', 'out_date', 'is_out', 'defective',
+        'lot_names', 'product_names', warehouse_name=F('warehouse__name'),
+    )
+
+
+def action_log_export_rows(queryset):
+    return queryset.values(
+        'id', 'timestamp', 'action_type', 'object_id', 'object_repr', 'description',
+        username=F('user__username'), content_type_model=F('content_type__model'),
+    )
+
+
+class _Echo:
+    """Pseudo-fichero para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return '' if value is None else value
+
+
+def stream_csv(rows, fields):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow([_csv_value(row[field]) for field in fields])
+
+
+def stream_ndjson(rows, fields):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode({field: row[field] for field in fields}) + '\n'
+
+
+def export_response(rows, fields, export_format, basename):
+    """StreamingHttpResponse con ``rows`` (un queryset de values()) en el formato pedido."""
+    rows = rows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    stream = stream_csv(rows, fields) if export_format == 'csv' else stream_ndjson(rows, fields)
+    response = StreamingHttpResponse(stream, content_type=EXPORT_FORMATS[export_format])
+    filename = f"{basename}-{timezone.now():%Y%m%d-%H%M%S}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
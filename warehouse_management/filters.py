@@ -0,0 +1,102 @@
+# warehouse_management/filters.py
+from rest_framework import serializers
+from rest_framework.filters import BaseFilterBackend
+
+from .archive import range_needs_archive
+from .models import ActionLog, ActionLogHistory
+from .services import filter_pallets
+
+
+class PalletFilterSerializer(serializers.Serializer):
+    """Parámetros de filtrado del listado de pallets; todos opcionales."""
+    warehouse = serializers.IntegerField(required=False)
+    lot = serializers.IntegerField(required=False)
+    product = serializers.IntegerField(required=False)
+    is_out = serializers.BooleanField(required=False, allow_null=True, default=None)
+    defective = serializers.BooleanField(required=False, allow_null=True, default=None)
+    in_date_after = serializers.DateTimeField(required=False)
+    in_date_before = serializers.DateTimeField(required=False)
+    out_date_after = serializers.DateTimeField(required=False)
+    out_date_before = serializers.DateTimeField(required=False)
+
+
+class PalletFilterBackend(BaseFilterBackend):
+    """
+    Filtros de PalletViewSet por query string: ``warehouse``, ``lot``,
+    ``product``, ``is_out``, ``defective`` y rangos ``in_date_after`` /
+    ``in_date_before`` y ``out_date_after`` / ``out_date_before`` (``after``
+    inclusivo, ``before`` exclusivo). Un valor no válido responde 400.
+    Todos tienen índice: almacén (FK y pallet_active_by_wh_idx), lote y
+    producto vía palletlot_lot_pallet_idx, fechas (pallet_*_date_idx).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = {name: value for name, value in request.query_params.items() if name in PalletFilterSerializer._declared_fields}
+        if not params:
+            return queryset
+        serializer = PalletFilterSerializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        queryset = filter_pallets(
+            warehouse=data.get('warehouse'), lot=data.get('lot'), product=data.get('product'), pallets=queryset
+        )
+        for flag in ('is_out', 'defective'):
+            if data.get(flag) is not None:
+                queryset = queryset.filter(**{flag: data[flag]})
+        for field in ('in_date', 'out_date'):
+            if f'{field}_after' in data:
+                queryset = queryset.filter(**{f'{field}__gte': data[f'{field}_after']})
+            if f'{field}_before' in data:
+                queryset = queryset.filter(**{f'{field}__lt': data[f'{field}_before']})
+        return queryset
+
+
+class ActionLogFilterSerializer(serializers.Serializer):
+    action_type = serializers.ChoiceField(choices=ActionLog.ACTION_CHOICES, required=False)
+    user = serializers.IntegerField(required=False)
+    content_type = serializers.IntegerField(required=False)
+    object_id = serializers.IntegerField(required=False)
+    timestamp_after = serializers.DateTimeField(required=False)
+    timestamp_before = serializers.DateTimeField(required=False)
+    archive = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+
+class ActionLogFilterBackend(BaseFilterBackend):
+    """
+    Filtros de ActionLogViewSet: ``action_type``, ``user``, ``content_type``
+    y ``object_id`` y el rango ``timestamp_after`` / ``timestamp_before``
+    (``after`` inclusivo, ``before`` exclusivo).
+
+    Las entradas archivadas (ver archive.py) se incluyen solas cuando el
+    rango llega a fechas archivadas o se pide el historial de un objeto
+    (``content_type`` + ``object_id``): entonces se consulta la vista
+    ActionLogHistory en lugar de la tabla caliente. ``archive=true`` las
+    incluye siempre y ``archive=false`` nunca.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = {name: value for name, value in request.query_params.items() if name in ActionLogFilterSerializer._declared_fields}
+        if not params:
+            return queryset
+        serializer = ActionLogFilterSerializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        include_archive = data['archive']
+        if include_archive is None:
+            include_archive = (
+                ('content_type' in data and 'object_id' in data)
+                or range_needs_archive(data.get('timestamp_after'), data.get('timestamp_before'))
+            )
+        if include_archive and queryset.model is not ActionLogHistory:
+            queryset = ActionLogHistory.objects.select_related('user', 'content_type').order_by(*queryset.query.order_by)
+
+        for field in ('action_type', 'user', 'content_type', 'object_id'):
+            if field in data:
+                queryset = queryset.filter(**{field: data[field]})
+        if 'timestamp_after' in data:
+            queryset = queryset.filter(timestamp__gte=data['timestamp_after'])
+        if 'timestamp_before' in data:
+            queryset = queryset.filter(timestamp__lt=data['timestamp_before'])
+        return queryset
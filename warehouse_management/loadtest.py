@@ -0,0 +1,209 @@
+# warehouse_management/loadtest.py
+"""
+Prueba de carga de las lecturas de los paneles (comando load_test_readers).
+
+Simula ``concurrency`` clientes que sondean sin pausa un endpoint y mide,
+por nivel de concurrencia, peticiones por segundo, latencia (p50/p99),
+errores y el pico de hilos del proceso. Todo ocurre en este proceso, sin
+red, con la pila completa de middlewares y autenticación por token, en
+tres modos:
+
+- ``wsgi``: la vista DRF con WSGIHandler en un pool de ``threads`` hilos,
+  como un worker gthread de gunicorn. Las peticiones que no caben esperan
+  turno y esa espera cuenta en la latencia.
+- ``asgi-sync``: la misma vista DRF servida por ASGIHandler.
+- ``asgi-async``: la vista async equivalente (async_views.py) por ASGIHandler.
+
+``capacity`` es el mayor nivel medido cuyo p99 no pasa de ``slo_ms`` sin
+errores. Cada petición abre su propia conexión a PostgreSQL
+(CONN_MAX_AGE=0), así que los niveles deben quedar por debajo de
+max_connections.
+"""
+import asyncio
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db.models import Sum
+
+from .benchmarking import API_PREFIX, percentile
+from .models import ActionLog, WarehouseLotStock
+
+MODES = ('wsgi', 'asgi-sync', 'asgi-async')
+
+
+def reader_cases(page_size=50):
+    """
+    Lecturas de los paneles sobre el almacén con más pallets en stock: por
+    cada una, la ruta de la vista DRF (``sync``) y la de la async. Lanza
+    ValueError si el schema no tiene stock.
+    """
+    warehouse_id = WarehouseLotStock.objects.values('warehouse_id').annotate(
+        pallets=Sum('ok_count')
+    ).filter(pallets__gt=0).order_by('-pallets').values_list('warehouse_id', flat=True).first()
+    if warehouse_id is None:
+        raise ValueError("El schema no tiene stock; genera datos con generate_synthetic_data.")
+    last_id = ActionLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    return [
+        {
+            'name': 'warehouse_stock',
+            'sync': f'{API_PREFIX}/warehouses/{warehouse_id}/stock/',
+            'async': f'{API_PREFIX}/live/warehouses/{warehouse_id}/stock/',
+        },
+        {
+            'name': 'pallets_by_lot',
+            'sync': f'{API_PREFIX}/warehouses/{warehouse_id}/pallets-by-lot/',
+            'async': f'{API_PREFIX}/live/warehouses/{warehouse_id}/pallets-by-lot/',
+        },
+        {
+            'name': 'action_log_tail',
+            'sync': f'{API_PREFIX}/action-logs/?pagination=cursor&page_size={page_size}',
+            'async': f'{API_PREFIX}/live/action-logs/tail/?after={max(last_id - page_size, 0)}&limit={page_size}',
+        },
+    ]
+
+
+class ThreadSampler:
+    """Pico de hilos vivos del proceso, muestreado cada ``interval`` segundos."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # Sin contar el propio muestreador.
+            self.peak = max(self.peak, threading.active_count() - 1)
+
+
+class ReaderLoadTest:
+    """Clientes concurrentes contra los handlers WSGI y ASGI de Django para ``hostname``."""
+
+    def __init__(self, hostname, token, threads=8):
+        self.hostname = hostname
+        self.token = token
+        self.threads = threads
+        self.wsgi = WSGIHandler()
+        self.asgi = ASGIHandler()
+
+    def _split(self, path):
+        path, _, query = path.partition('?')
+        return path, query
+
+    def wsgi_request(self, path):
+        path, query = self._split(path)
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+            'SERVER_NAME': self.hostname, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.hostname, 'HTTP_AUTHORIZATION': f'Token {self.token}', 'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        status = []
+        response = self.wsgi(environ, lambda line, headers, exc_info=None: status.append(int(line.split()[0])))
+        try:
+            size = sum(len(chunk) for chunk in response)
+        finally:
+            response.close()
+        return status[0], size
+
+    async def asgi_request(self, path):
+        path, query = self._split(path)
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+            'root_path': '', 'client': ('127.0.0.1', 0), 'server': (self.hostname, 80),
+            'headers': [(b'host', self.hostname.encode()), (b'authorization', f'Token {self.token}'.encode())],
+        }
+        request_sent = False
+        disconnected = asyncio.Event()
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # Django escucha la desconexión mientras la vista trabaja; el cliente no se va.
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        result = {'status': None, 'size': 0}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                result['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                result['size'] += len(message.get('body', b''))
+
+        await self.asgi(scope, receive, send)
+        return result['status'], result['size']
+
+    async def _level(self, mode, path, concurrency, requests, executor):
+        loop = asyncio.get_running_loop()
+        latencies, errors, sizes = [], 0, []
+        remaining = requests
+
+        async def client():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                if mode == 'wsgi':
+                    status, size = await loop.run_in_executor(executor, self.wsgi_request, path)
+                else:
+                    status, size = await self.asgi_request(path)
+                latencies.append(time.perf_counter() - started)
+                sizes.append(size)
+                if status != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - started, sorted(latencies), errors, sizes
+
+    def run_level(self, mode, path, concurrency, requests):
+        """Un nivel: ``requests`` peticiones repartidas entre ``concurrency`` clientes."""
+        with ThreadPoolExecutor(max_workers=self.threads) as executor, ThreadSampler() as sampler:
+            elapsed, latencies, errors, sizes = asyncio.run(self._level(mode, path, concurrency, requests, executor))
+        return {
+            'concurrency': concurrency,
+            'requests': len(latencies),
+            'errors': errors,
+            'rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'peak_threads': sampler.peak,
+            'response_bytes': max(sizes) if sizes else 0,
+        }
+
+    def run(self, cases, modes, levels, requests_per_client=10, slo_ms=500, progress=None):
+        results = []
+        for bench_case in cases:
+            for mode in modes:
+                path = bench_case['async'] if mode == 'asgi-async' else bench_case['sync']
+                # Calentamiento: cachés de tenant, token y membresía, y la primera conexión.
+                self.run_level(mode, path, 1, 2)
+                rows = []
+                for concurrency in levels:
+                    rows.append(self.run_level(mode, path, concurrency, max(concurrency * requests_per_client, 20)))
+                    if progress:
+                        progress(bench_case['name'], mode, rows[-1])
+                capacity = max(
+                    (row['concurrency'] for row in rows if not row['errors'] and row['p99_ms'] <= slo_ms), default=0
+                )
+                results.append({'name': bench_case['name'], 'mode': mode, 'path': path, 'capacity': capacity, 'levels': rows})
+        return results
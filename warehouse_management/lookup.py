@@ -0,0 +1,177 @@
+# warehouse_management/lookup.py
+"""
+Búsqueda de pallets y lotes por nombre (el código que se escanea).
+
+Cada pallet se devuelve con su almacén y sus lotes en una sola consulta
+(los PalletLot se agregan a un array JSON en un subquery), con la misma
+representación que PalletSerializer; los lotes, como LotSerializer.
+
+Las búsquedas exactas pasan por una caché de nombres calientes
+(``NAME_LOOKUP_CACHE``) por schema. Las escrituras sobre un pallet invalidan
+su nombre (signals.py y services._transition_pallets); las de lotes,
+productos, almacenes o PalletLot cambian la generación del schema, que forma
+parte de la clave, y con ello descartan todas sus entradas. Lo que se
+escriba por otras vías (queryset.update() fuera de services, SQL directo)
+se ve al caducar el TTL.
+"""
+import functools
+
+from django.contrib.postgres.aggregates import JSONBAgg
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import F, JSONField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, JSONObject
+
+from tenants.cache import get_cache, invalidate_schema, on_write, schema_generation
+from .metrics import timing_serialization
+from .models import Lot, Pallet, PalletLot
+from .serializers import LotSerializer, PalletSerializer, value_converter
+
+PALLET_LOT_DETAIL_KEYS = ('id', 'pallet', 'lot', 'lot_name', 'product_name')
+
+_trigram_available = None
+
+
+def get_name_cache():
+    return get_cache('NAME_LOOKUP_CACHE', 'warehouse:names', {'TTL': 30, 'MAX_SIZE': 10000, 'BACKEND': None})
+
+
+def has_trigram_extension():
+    """Indica si pg_trgm está instalada (la migración 0008 la instala si el servidor la tiene)."""
+    global _trigram_available
+    if _trigram_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_available = cursor.fetchone() is not None
+    return _trigram_available
+
+
+# --- Consultas ---------------------------------------------------------------
+
+def pallet_rows(queryset):
+    """values() de ``queryset`` con el almacén y los PalletLot de cada pallet, en una consulta."""
+    details = PalletLot.objects.filter(pallet=OuterRef('pk')).order_by().values('pallet').annotate(
+        details=JSONBAgg(
+            JSONObject(id='id', pallet='pallet_id', lot='lot_id', lot_name='lot__name', product_name='lot__product__name'),
+            ordering='id',
+        )
+    ).values('details')
+    return queryset.values(
+        'id', 'name', 'warehouse', 'create_date', 'in_date', 'out_date', 'is_out', 'defective',
+        warehouse_name=F('warehouse__name'),
+        pallet_lots_details=Coalesce(Subquery(details), Value([], output_field=JSONField())),
+    )
+
+
+def lot_rows(queryset):
+    return queryset.values('id', 'name', 'product', 'create_date', product_name=F('product__name'))
+
+
+def _pallet_lots_details(value):
+    # jsonb no conserva el orden de las claves; se devuelve el de PalletLotSerializer.
+    return [{key: detail[key] for key in PALLET_LOT_DETAIL_KEYS} for detail in value]
+
+
+@functools.cache
+def _converters(kind):
+    serializer = PalletSerializer() if kind == 'pallet' else LotSerializer()
+    converters = {name: value_converter(field) for name, field in serializer.fields.items() if not field.write_only}
+    if kind == 'pallet':
+        converters['pallet_lots_details'] = _pallet_lots_details
+    return converters
+
+
+def represent(kind, row):
+    """Representación de una fila de pallet_rows / lot_rows, igual a la de su serializer."""
+    return {
+        name: None if row[name] is None else convert(row[name])
+        for name, convert in _converters(kind).items()
+    }
+
+
+def _represent_rows(kind, rows):
+    rows = list(rows)
+    with timing_serialization():
+        return [represent(kind, row) for row in rows]
+
+
+def _fetch(kind, names):
+    if kind == 'pallet':
+        rows = pallet_rows(Pallet.objects.filter(name__in=names))
+    else:
+        rows = lot_rows(Lot.objects.filter(name__in=names))
+    return _represent_rows(kind, rows)
+
+
+# --- Caché de nombres ---------------------------------------------------------
+
+def lookup_by_names(kind, names):
+    """
+    ``{nombre: representación}`` de los pallets (``kind='pallet'``) o lotes
+    (``'lot'``) de ``names`` que existen. Los que no están en caché se leen
+    en una sola consulta; los inexistentes no se guardan, así que un nombre
+    recién creado se encuentra al momento.
+    """
+    schema_name = connection.schema_name
+    cache = get_name_cache()
+    generation = schema_generation(cache, schema_name)
+
+    found, missing = {}, []
+    for name in dict.fromkeys(names):
+        item = cache.get((schema_name, generation, kind, name))
+        if item is None:
+            missing.append(name)
+        else:
+            found[name] = item
+    if missing:
+        for item in _fetch(kind, missing):
+            found[item['name']] = item
+            cache.set((schema_name, generation, kind, item['name']), item)
+    return found
+
+
+def invalidate_pallet_names(*names):
+    schema_name = connection.schema_name
+
+    def invalidate():
+        cache = get_name_cache()
+        generation = schema_generation(cache, schema_name)
+        for name in names:
+            cache.delete((schema_name, generation, 'pallet', name))
+
+    on_write(invalidate)
+
+
+def invalidate_all_names():
+    """Descarta todas las entradas del schema actual."""
+    invalidate_schema(get_name_cache())
+
+
+# --- Búsqueda -----------------------------------------------------------------
+
+def search_names(queryset, query, mode):
+    """
+    Filtra y ordena ``queryset`` por nombre según ``mode``:
+
+    - ``prefix``: empieza por ``query`` (distingue mayúsculas); usa el índice
+      ``varchar_pattern_ops`` que Django crea para los CharField únicos.
+    - ``contains``: contiene ``query`` (distingue mayúsculas); con pg_trgm lo
+      sirve el índice GIN de trigramas de la migración 0008.
+    - ``similar``: parecido por trigramas (operador ``%``, sin distinguir
+      mayúsculas), de más a menos parecido. Requiere pg_trgm; usa el mismo
+      índice.
+    """
+    if mode == 'prefix':
+        return queryset.filter(name__startswith=query).order_by('name')
+    if mode == 'contains':
+        return queryset.filter(name__contains=query).order_by('name')
+    return queryset.filter(name__trigram_similar=query).annotate(
+        similarity=TrigramSimilarity('name', query)
+    ).order_by('-similarity', 'name')
+
+
+def search_by_name(kind, queryset, query, mode, limit):
+    """Los ``limit`` primeros resultados de search_names, con su representación completa."""
+    queryset = search_names(queryset, query, mode)
+    rows = pallet_rows(queryset) if kind == 'pallet' else lot_rows(queryset)
+    return _represent_rows(kind, rows[:limit])
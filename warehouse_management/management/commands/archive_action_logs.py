@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from django.utils.dateparse import parse_datetime
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from warehouse_management.archive import archive_action_logs, archive_cutoff, get_retention_config, pending_by_month
+from warehouse_management.versioning import compact_pending_model_versions
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve a ActionLogArchive, por tandas, las entradas de ActionLog más antiguas que "
+        "ACTION_LOG_RETENTION['HOT_DAYS'] días (o --older-than-days / --before), y compacta los cambios de "
+        "versión pendientes (ModelVersionChange) de cada tenant."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('-s', '--schema', dest='schema_name', help="Sólo este schema (por defecto, todos los tenants).")
+        parser.add_argument('--older-than-days', type=int, help="Antigüedad mínima de las entradas a archivar.")
+        parser.add_argument('--before', help="Archiva las anteriores a esta fecha ISO 8601 (en lugar de --older-than-days).")
+        parser.add_argument('--chunk-size', type=int, help="Entradas por tanda (por defecto, ACTION_LOG_RETENTION['CHUNK_SIZE']).")
+        parser.add_argument('--pause', type=float, default=0, help="Segundos de espera entre tandas.")
+        parser.add_argument('--dry-run', action='store_true', help="Sólo informa de lo que se archivaría, por mes.")
+
+    def handle(self, *args, **options):
+        if options['before']:
+            if options['older_than_days'] is not None:
+                raise CommandError("Use --before o --older-than-days, no ambos.")
+            cutoff = parse_datetime(options['before'])
+            if cutoff is None:
+                raise CommandError(f"Fecha no válida: '{options['before']}'.")
+        else:
+            days = options['older_than_days']
+            if days is not None and days < 0:
+                raise CommandError("--older-than-days no puede ser negativo.")
+            cutoff = archive_cutoff(days)
+        chunk_size = options['chunk_size'] or get_retention_config()['CHUNK_SIZE']
+        if chunk_size < 1 or options['pause'] < 0:
+            raise CommandError("--chunk-size debe ser al menos 1 y --pause no puede ser negativo.")
+
+        tenants = get_tenant_model().objects.exclude(schema_name=get_public_schema_name()).order_by('schema_name')
+        if options['schema_name']:
+            tenants = tenants.filter(schema_name=options['schema_name'])
+            if not tenants.exists():
+                raise CommandError(f"No existe el schema '{options['schema_name']}'.")
+
+        total = 0
+        for tenant in tenants:
+            with schema_context(tenant.schema_name):
+                if options['dry_run']:
+                    months = pending_by_month(cutoff)
+                    count = sum(month_count for _, month_count in months)
+                    self.stdout.write(f"[{tenant.schema_name}] {count} entradas anteriores a {cutoff:%Y-%m-%d %H:%M}.")
+                    for month, month_count in months:
+                        self.stdout.write(f"  {month:%Y-%m}: {month_count}")
+                else:
+                    progress = lambda moved, until, schema=tenant.schema_name: self.stdout.write(
+                        f"  [{schema}] {moved} archivadas (hasta {until:%Y-%m-%d %H:%M})"
+                    )
+                    try:
+                        count = archive_action_logs(cutoff, chunk_size=chunk_size, pause=options['pause'], progress=progress)
+                    except IntegrityError as exc:
+                        raise CommandError(
+                            f"[{tenant.schema_name}] Hay entradas que ya están en el archivo; la tanda se ha deshecho "
+                            f"sin borrar nada. {exc}"
+                        )
+                    self.stdout.write(f"[{tenant.schema_name}] {count} entradas archivadas.")
+                    compacted = compact_pending_model_versions()
+                    self.stdout.write(f"[{tenant.schema_name}] {compacted} cambios de versión compactados.")
+            total += count
+
+        verb = 'por archivar' if options['dry_run'] else 'archivadas'
+        self.stdout.write(self.style.SUCCESS(f"Archivado completado: {total} entradas {verb}."))
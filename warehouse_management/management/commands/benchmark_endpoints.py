@@ -0,0 +1,115 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django_tenants.utils import get_public_schema_name, get_tenant_domain_model, schema_context
+from rest_framework.authtoken.models import Token
+
+from tenants.models import TenantMembership
+from warehouse_management.benchmarking import (
+    EndpointBenchmark, build_cases, compare_reports, dataset_counts, environment
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia (p50/p95/p99), consultas y memoria de todas las acciones de la API en el "
+        "schema de un tenant y genera un informe JSON para comparar antes/después."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('-s', '--schema', required=True, help="Schema del tenant (ver generate_synthetic_data).")
+        parser.add_argument('--user', help="Usuario miembro del tenant. Por defecto, el primero; se le crea un token si no tiene.")
+        parser.add_argument('--repeat', type=int, default=30, help="Repeticiones medidas por acción.")
+        parser.add_argument('--warmup', type=int, default=2, help="Repeticiones previas sin medir.")
+        parser.add_argument('--page-size', type=int, default=100, help="Filas por página en los listados por cursor.")
+        parser.add_argument('--only', help="Sólo las acciones que empiecen por alguno de estos prefijos (separados por comas).")
+        parser.add_argument('--skip-writes', action='store_true', help="Sólo lecturas.")
+        parser.add_argument('--output', help="Fichero donde guardar el informe JSON.")
+        parser.add_argument('--compare', help="Informe anterior con el que comparar.")
+        parser.add_argument('--json', action='store_true', help="Escribe el informe JSON en la salida.")
+
+    def handle(self, *args, **options):
+        schema_name = options['schema']
+        if options['repeat'] < 1 or options['warmup'] < 0:
+            raise CommandError("--repeat debe ser al menos 1 y --warmup no puede ser negativo.")
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as handle:
+                baseline = json.load(handle)
+
+        domain = get_tenant_domain_model().objects.filter(
+            tenant__schema_name=schema_name
+        ).exclude(tenant__schema_name=get_public_schema_name()).order_by('-is_primary').first()
+        if domain is None:
+            raise CommandError(f"No hay ningún tenant con dominio en el schema '{schema_name}'.")
+        user_id = self.member_id(domain.tenant, options['user'])
+
+        with schema_context(schema_name):
+            try:
+                cases = build_cases(page_size=options['page_size'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            if options['only']:
+                prefixes = tuple(prefix.strip() for prefix in options['only'].split(',') if prefix.strip())
+                cases = [case for case in cases if case['name'].startswith(prefixes)]
+            if options['skip_writes']:
+                cases = [case for case in cases if not case['write']]
+
+            user = User.objects.filter(pk=user_id).first()
+            if user is None:
+                raise CommandError(f"El usuario {user_id} es miembro del tenant pero no existe en el schema '{schema_name}'.")
+            token, _ = Token.objects.get_or_create(user=user)
+            benchmark = EndpointBenchmark(domain.domain, token.key, repeat=options['repeat'], warmup=options['warmup'])
+            progress = None if options['json'] else self.print_result
+            results = benchmark.run(cases, progress=progress)
+            report = {
+                'schema_name': schema_name,
+                'environment': environment(),
+                'options': {name: options[name] for name in ('repeat', 'warmup', 'page_size')},
+                'dataset': dataset_counts(),
+                'results': results,
+            }
+        connection.set_schema_to_public()
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Informe guardado en {options['output']}."))
+        if baseline is not None and not options['json']:
+            self.print_comparison(compare_reports(baseline, report))
+
+        failed = [result['name'] for result in results if result['status'] >= 400]
+        if failed:
+            raise CommandError(f"Respuestas de error en: {', '.join(failed)}.")
+
+    def member_id(self, tenant, username):
+        # Los usuarios y las membresías viven en public; en el schema del tenant, el mismo id.
+        memberships = TenantMembership.objects.filter(tenant=tenant).order_by('id')
+        if username:
+            memberships = memberships.filter(user__username=username)
+        user_id = memberships.values_list('user_id', flat=True).first()
+        if user_id is None:
+            raise CommandError("No hay ningún usuario miembro del tenant" + (f" llamado '{username}'." if username else "."))
+        return user_id
+
+    def print_result(self, result):
+        style = self.style.ERROR if result['status'] >= 400 else (lambda text: text)
+        self.stdout.write(style(
+            f"{result['name']:<28} {result['status']}  p50 {result['p50_ms']:>9.2f} ms  p99 {result['p99_ms']:>9.2f} ms  "
+            f"{result['queries']:>4} consultas  {result['peak_memory_kb']:>9.1f} KB  {result['response_bytes']:>9} B"
+        ))
+
+    def print_comparison(self, rows):
+        self.stdout.write("\nComparación con el informe anterior (p50 antes -> después):")
+        for row in rows:
+            (p50_before, p50_after), (queries_before, queries_after) = row['p50_ms'], row['queries']
+            ratio = f"x{row['p50_ratio']}" if row['p50_ratio'] is not None else '-'
+            self.stdout.write(
+                f"{row['name']:<28} {p50_before:>9.2f} -> {p50_after:>9.2f} ms ({ratio})  "
+                f"consultas {queries_before} -> {queries_after}"
+            )
@@ -0,0 +1,74 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django_tenants.utils import schema_context, schema_exists
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from warehouse_management.benchmarking import QueryCounter
+from warehouse_management.views import PalletViewSet
+
+
+class Command(BaseCommand):
+    help = "Compara el listado de pallets por el serializer y por el camino rápido de values() (una página, renderizada a JSON)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('-s', '--schema', required=True, help="Schema del tenant con los pallets.")
+        parser.add_argument('--page-size', type=int, default=1000, help="Pallets por página (máximo 1000).")
+        parser.add_argument('--repeat', type=int, default=5, help="Repeticiones por camino; se toma la mediana.")
+        parser.add_argument('--fields', help="Valor de ?fields= (por defecto, todos los campos).")
+        parser.add_argument('--json', action='store_true', help="Salida en JSON.")
+
+    def handle(self, *args, **options):
+        if not schema_exists(options['schema']):
+            raise CommandError(f"No existe el schema '{options['schema']}'.")
+        params = {'pagination': 'cursor', 'page_size': options['page_size']}
+        if options['fields']:
+            params['fields'] = options['fields']
+
+        with schema_context(options['schema']):
+            results = [
+                self.measure('serializer', params, options['repeat'], fast=False),
+                self.measure('values', params, options['repeat'], fast=True),
+            ]
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write(
+                f"{result['path']}: {result['rows']} filas, {result['median_ms']} ms, "
+                f"{result['rows_per_second']} filas/s, {result['queries']} consultas"
+            )
+        serializer, values = results
+        if values['median_ms']:
+            self.stdout.write(self.style.SUCCESS(f"values() es {serializer['median_ms'] / values['median_ms']:.1f}x más rápido."))
+
+    def list_page(self, params, fast):
+        request = Request(RequestFactory(SERVER_NAME='localhost').get('/api/v1/warehouse/pallets/', params))
+        view = PalletViewSet(request=request, format_kwarg=None, args=(), kwargs={}, action='list')
+        if not fast:
+            view.values_fields = None
+        response = view.list(request)
+        return len(response.data['results']), JSONRenderer().render(response.data)
+
+    def measure(self, path, params, repeat, fast):
+        self.list_page(params, fast)  # Calentamiento.
+        timings = []
+        for _ in range(repeat):
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                started = time.perf_counter()
+                rows, _ = self.list_page(params, fast)
+                timings.append(time.perf_counter() - started)
+        median = sorted(timings)[len(timings) // 2]
+        return {
+            'path': path,
+            'rows': rows,
+            'median_ms': round(median * 1000, 2),
+            'rows_per_second': round(rows / median) if median else None,
+            'queries': queries.count,
+        }
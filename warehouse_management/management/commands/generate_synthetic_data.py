@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django_tenants.utils import get_public_schema_name, schema_exists, schema_context
+
+from warehouse_management.synthetic import SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos en el schema de un tenant: productos, lotes, almacenes, "
+        "pallets con sus PalletLot e historial de acciones, todo con inserciones masivas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('-s', '--schema', required=True, help="Schema del tenant.")
+        parser.add_argument('--products', type=int, default=0, help="Productos nuevos.")
+        parser.add_argument('--lots-per-product', type=int, default=0, help="Lotes por cada producto nuevo.")
+        parser.add_argument('--warehouses', type=int, default=0, help="Almacenes nuevos.")
+        parser.add_argument('--pallets', type=int, default=0, help="Pallets nuevos, repartidos entre todos los almacenes y lotes.")
+        parser.add_argument('--max-lots-per-pallet', type=int, default=2, help="Cada pallet lleva entre 1 y este número de lotes.")
+        parser.add_argument('--action-logs', type=int, default=0, help="Entradas de ActionLog sobre pallets existentes.")
+        parser.add_argument('--days', type=int, default=365, help="Las fechas se reparten en los últimos N días.")
+        parser.add_argument('--out-ratio', type=float, default=0.3, help="Fracción de pallets ya salidos.")
+        parser.add_argument('--defective-ratio', type=float, default=0.05, help="Fracción de pallets defectuosos.")
+        parser.add_argument('--prefix', default='SYN', help="Prefijo de los nombres generados.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Filas por inserción (y por transacción).")
+        parser.add_argument('--seed', type=int, help="Semilla, para generar siempre los mismos datos.")
+        parser.add_argument('--json', action='store_true', help="Salida en JSON.")
+
+    def handle(self, *args, **options):
+        schema_name = options['schema']
+        if schema_name == get_public_schema_name() or not schema_exists(schema_name):
+            raise CommandError(f"'{schema_name}' no es el schema de un tenant.")
+        for option in ('products', 'lots_per_product', 'warehouses', 'pallets', 'action_logs', 'days'):
+            if options[option] < 0:
+                raise CommandError(f"--{option.replace('_', '-')} no puede ser negativo.")
+        if options['batch_size'] < 1 or options['max_lots_per_pallet'] < 1:
+            raise CommandError("--batch-size y --max-lots-per-pallet deben ser al menos 1.")
+        for option in ('out_ratio', 'defective_ratio'):
+            if not 0 <= options[option] <= 1:
+                raise CommandError(f"--{option.replace('_', '-')} debe estar entre 0 y 1.")
+
+        progress = None if options['json'] else (lambda message: self.stdout.write(f"  {message}"))
+        generator = SyntheticDataGenerator(
+            prefix=options['prefix'],
+            days=options['days'],
+            out_ratio=options['out_ratio'],
+            defective_ratio=options['defective_ratio'],
+            max_lots_per_pallet=options['max_lots_per_pallet'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            progress=progress,
+        )
+        with schema_context(schema_name):
+            try:
+                created = generator.generate(
+                    products=options['products'],
+                    lots_per_product=options['lots_per_product'],
+                    warehouses=options['warehouses'],
+                    pallets=options['pallets'],
+                    action_logs=options['action_logs'],
+                )
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+        if options['json']:
+            self.stdout.write(json.dumps({'schema_name': schema_name, **created}, indent=2))
+            return
+        elapsed_ms = created.pop('elapsed_ms')
+        summary = ', '.join(f"{count} {name}" for name, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f"[{schema_name}] creados {summary} en {elapsed_ms / 1000:.1f} s."))
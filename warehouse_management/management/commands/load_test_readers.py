@@ -0,0 +1,94 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django_tenants.utils import get_public_schema_name, get_tenant_domain_model, schema_context
+from rest_framework.authtoken.models import Token
+
+from tenants.models import TenantMembership
+from warehouse_management.benchmarking import environment
+from warehouse_management.loadtest import MODES, ReaderLoadTest, reader_cases
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de las lecturas de los paneles (stock, pallets por lote, cola del ActionLog) en "
+        "un proceso: vistas DRF por WSGI y ASGI frente a las vistas async, a varios niveles de concurrencia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('-s', '--schema', required=True, help="Schema del tenant (ver generate_synthetic_data).")
+        parser.add_argument('--user', help="Usuario miembro del tenant. Por defecto, el primero; se le crea un token si no tiene.")
+        parser.add_argument('--concurrency', default='1,8,32,64', help="Niveles de clientes concurrentes, separados por comas.")
+        parser.add_argument('--requests', type=int, default=10, help="Peticiones por cliente en cada nivel.")
+        parser.add_argument('--threads', type=int, default=8, help="Hilos del pool en el modo wsgi (como gunicorn --threads).")
+        parser.add_argument('--modes', default=','.join(MODES), help="Modos a medir, separados por comas.")
+        parser.add_argument('--only', help="Sólo las lecturas que empiecen por alguno de estos prefijos (separados por comas).")
+        parser.add_argument('--slo-ms', type=float, default=500, help="p99 máximo para contar un nivel en 'capacity'.")
+        parser.add_argument('--json', action='store_true', help="Escribe el informe JSON en la salida.")
+
+    def handle(self, *args, **options):
+        schema_name = options['schema']
+        try:
+            levels = sorted({int(level) for level in options['concurrency'].split(',') if level.strip()})
+        except ValueError:
+            raise CommandError("--concurrency debe ser una lista de enteros separados por comas.")
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        if not levels or levels[0] < 1 or options['requests'] < 1 or options['threads'] < 1:
+            raise CommandError("--concurrency, --requests y --threads deben ser al menos 1.")
+        unknown = set(modes) - set(MODES)
+        if unknown or not modes:
+            raise CommandError(f"Modos válidos: {', '.join(MODES)}.")
+
+        domain = get_tenant_domain_model().objects.filter(
+            tenant__schema_name=schema_name
+        ).exclude(tenant__schema_name=get_public_schema_name()).order_by('-is_primary').first()
+        if domain is None:
+            raise CommandError(f"No hay ningún tenant con dominio en el schema '{schema_name}'.")
+        memberships = TenantMembership.objects.filter(tenant=domain.tenant).order_by('id')
+        if options['user']:
+            memberships = memberships.filter(user__username=options['user'])
+        user_id = memberships.values_list('user_id', flat=True).first()
+        if user_id is None:
+            raise CommandError("No hay ningún usuario miembro del tenant.")
+
+        with schema_context(schema_name):
+            try:
+                cases = reader_cases()
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            if options['only']:
+                prefixes = tuple(prefix.strip() for prefix in options['only'].split(',') if prefix.strip())
+                cases = [case for case in cases if case['name'].startswith(prefixes)]
+            user = User.objects.filter(pk=user_id).first()
+            if user is None:
+                raise CommandError(f"El usuario {user_id} es miembro del tenant pero no existe en el schema '{schema_name}'.")
+            token, _ = Token.objects.get_or_create(user=user)
+        connection.set_schema_to_public()
+
+        load_test = ReaderLoadTest(domain.domain, token.key, threads=options['threads'])
+        progress = None if options['json'] else self.print_level
+        results = load_test.run(
+            cases, modes, levels, requests_per_client=options['requests'], slo_ms=options['slo_ms'], progress=progress
+        )
+        report = {
+            'schema_name': schema_name,
+            'environment': environment(),
+            'options': {name: options[name] for name in ('requests', 'threads', 'slo_ms')},
+            'results': results,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(f"\nClientes concurrentes con p99 <= {options['slo_ms']:g} ms:")
+            for result in results:
+                self.stdout.write(f"{result['name']:<18} {result['mode']:<11} {result['capacity']}")
+
+    def print_level(self, name, mode, row):
+        style = self.style.ERROR if row['errors'] else (lambda text: text)
+        self.stdout.write(style(
+            f"{name:<18} {mode:<11} c={row['concurrency']:<4} {row['rps']:>8.1f} req/s  "
+            f"p50 {row['p50_ms']:>9.2f} ms  p99 {row['p99_ms']:>9.2f} ms  "
+            f"{row['peak_threads']:>4} hilos  {row['errors']} errores"
+        ))
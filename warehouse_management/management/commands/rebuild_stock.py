@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django_tenants.utils import get_tenant_model, schema_context
+
+from warehouse_management.stock import rebuild_stock
+
+
+class Command(BaseCommand):
+    help = "Verifica WarehouseLotStock contra los pallets reales y corrige las desviaciones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('-s', '--schema', dest='schema_name', help="Sólo este schema (por defecto, todos los tenants).")
+        parser.add_argument('--check', action='store_true', help="Sólo informa de las desviaciones, sin corregirlas.")
+
+    def handle(self, *args, **options):
+        tenants = get_tenant_model().objects.order_by('schema_name')
+        if options['schema_name']:
+            tenants = tenants.filter(schema_name=options['schema_name'])
+            if not tenants.exists():
+                raise CommandError(f"No existe el schema '{options['schema_name']}'.")
+
+        repair = not options['check']
+        total = 0
+        for tenant in tenants:
+            with schema_context(tenant.schema_name):
+                drift = rebuild_stock(repair=repair)
+            total += len(drift)
+            if not drift:
+                self.stdout.write(f"[{tenant.schema_name}] stock correcto.")
+                continue
+            verb = 'corregidas' if repair else 'detectadas'
+            self.stdout.write(self.style.WARNING(f"[{tenant.schema_name}] {len(drift)} desviaciones {verb}:"))
+            for (warehouse_id, lot_id), (want, have) in sorted(drift.items()):
+                self.stdout.write(f"  almacén {warehouse_id} / lote {lot_id}: esperado {want}, guardado {have}")
+
+        if total and not repair:
+            raise CommandError(f"{total} desviaciones de stock.")
+        self.stdout.write(self.style.SUCCESS('Verificación de stock completada.'))
@@ -0,0 +1,61 @@
+import json
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from warehouse_management.reporting import REPORT_TOTAL_FIELDS, build_report, tenant_schemas
+
+
+class Command(BaseCommand):
+    help = "Informe consolidado de stock y entradas/salidas de todos los tenants, agregando cada schema en paralelo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('-s', '--schema', dest='schema_names', action='append', help="Limitar a este schema (repetible).")
+        parser.add_argument('--include-public', action='store_true', help="Incluir también el schema public.")
+        parser.add_argument('--since', help="Inicio del periodo (ISO 8601). Por defecto, hace 7 días.")
+        parser.add_argument('--until', help="Fin del periodo, exclusivo (ISO 8601). Por defecto, ahora.")
+        parser.add_argument('-c', '--concurrency', type=int, default=min(4, os.cpu_count() or 1),
+                            help="Procesos en paralelo (una conexión a la base de datos cada uno).")
+        parser.add_argument('--json', action='store_true', help="Salida en JSON.")
+
+    def parse_date(self, value, default):
+        if not value:
+            return default
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"Fecha no válida: '{value}'.")
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+    def handle(self, *args, **options):
+        until = self.parse_date(options['until'], timezone.now())
+        since = self.parse_date(options['since'], until - timedelta(days=7))
+        schemas = tenant_schemas(options['schema_names'], options['include_public'])
+        if not schemas:
+            raise CommandError("No hay tenants que cumplan el filtro.")
+
+        report = build_report(schemas, since, until, concurrency=options['concurrency'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.write_table(report)
+        if report['failed']:
+            raise CommandError(f"{report['failed']} tenants con errores.")
+
+    def write_table(self, report):
+        columns = ('schema_name',) + REPORT_TOTAL_FIELDS + ('elapsed_ms',)
+        self.stdout.write(f"Periodo: {report['since']} -> {report['until']}")
+        self.stdout.write('  '.join(columns))
+        for tenant in report['tenants']:
+            if 'error' in tenant:
+                self.stdout.write(self.style.ERROR(f"{tenant['schema_name']}  ERROR: {tenant['error']}"))
+            else:
+                self.stdout.write('  '.join(str(tenant[column]) for column in columns))
+        totals = report['totals']
+        self.stdout.write(self.style.SUCCESS(
+            'TOTAL  ' + '  '.join(str(totals[field]) for field in REPORT_TOTAL_FIELDS)
+            + f"  {report['elapsed_ms']}"
+        ))
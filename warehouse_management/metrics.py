@@ -0,0 +1,215 @@
+# warehouse_management/metrics.py
+"""
+Métricas de rendimiento por petición (ver middleware.RequestMetricsMiddleware).
+
+Durante cada petición se acumulan, en un RequestMetrics guardado en una
+ContextVar, el número y el tiempo de las consultas (execute_wrapper de la
+conexión), el tiempo de serialización (representación en los serializers
+raíz, el camino values() y la búsqueda por nombre, más el renderizado de la
+respuesta) y el total. Al terminar se añaden a histogramas en memoria del
+proceso, etiquetados por schema y vista, que ``metrics_view`` expone en el
+formato de texto de Prometheus. Como muestran los schemas y el tráfico de
+todos los tenants, sólo se sirven en el dominio del schema público y con el
+token de ``REQUEST_METRICS['TOKEN']``; sin token configurado, no se sirven.
+
+Los histogramas son por proceso: con varios workers, cada uno expone los
+suyos y Prometheus debe rasparlos por separado (o agregarlos por ``pid``).
+El tiempo de serialización incluye las consultas que disparen los propios
+serializers, así que puede solaparse con el de base de datos.
+"""
+import bisect
+import contextvars
+import hmac
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django_tenants.utils import get_public_schema_name
+
+REQUEST_METRICS_DEFAULTS = {'ENABLED': True, 'SERVER_TIMING': True, 'TENANT_LABEL': True, 'TOKEN': None}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def get_metrics_config():
+    return {**REQUEST_METRICS_DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+class RequestMetrics:
+    """Contadores de una petición. También es el execute_wrapper que cuenta las consultas."""
+    __slots__ = ('started', 'db_count', 'db_time', 'serialize_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_count = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.db_count += 1
+
+    def server_timing(self, total):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_count} queries"',
+            f'serialize;dur={self.serialize_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+@contextmanager
+def collect_request_metrics():
+    """Activa un RequestMetrics para el bloque (la petición) y lo devuelve."""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timing_serialization():
+    """Suma la duración del bloque al tiempo de serialización de la petición en curso, si la hay."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_time += time.perf_counter() - started
+
+
+def add_serialization_time(seconds):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.serialize_time += seconds
+
+
+# --- Histogramas --------------------------------------------------------------
+
+class Histogram:
+    """Histograma acumulativo al estilo Prometheus, con una serie por combinación de etiquetas."""
+
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Un contador por bucket más el de +Inf, la suma y el total.
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def samples(self):
+        """``{etiquetas: (conteos por bucket, suma, total)}``, copia consistente."""
+        with self._lock:
+            return {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.samples().items()):
+            base = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            prefix = f"{base}," if base else ''
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _format_number(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {_format_number(total)}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REQUEST_DURATION = Histogram(
+    'jar_http_request_duration_seconds', "Duración total de la petición.",
+    ('schema', 'view', 'method', 'status'), LATENCY_BUCKETS,
+)
+REQUEST_DB_QUERIES = Histogram(
+    'jar_http_request_db_queries', "Consultas a la base de datos por petición.",
+    ('schema', 'view'), QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    'jar_http_request_db_duration_seconds', "Tiempo en la base de datos por petición.",
+    ('schema', 'view'), LATENCY_BUCKETS,
+)
+REQUEST_SERIALIZATION_DURATION = Histogram(
+    'jar_http_request_serialization_seconds', "Tiempo de serialización y renderizado por petición.",
+    ('schema', 'view'), LATENCY_BUCKETS,
+)
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_DB_QUERIES, REQUEST_DB_DURATION, REQUEST_SERIALIZATION_DURATION)
+
+
+def observe_request(metrics, total, schema_name, view_name, method, status_code):
+    if not get_metrics_config()['TENANT_LABEL']:
+        schema_name = ''
+    REQUEST_DURATION.observe((schema_name, view_name, method, f"{status_code // 100}xx"), total)
+    labels = (schema_name, view_name)
+    REQUEST_DB_QUERIES.observe(labels, metrics.db_count)
+    REQUEST_DB_DURATION.observe(labels, metrics.db_time)
+    REQUEST_SERIALIZATION_DURATION.observe(labels, metrics.serialize_time)
+
+
+def reset_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
+
+
+def render_metrics():
+    lines = [
+        "# HELP jar_process_info Proceso que expone estas métricas (son por proceso).",
+        "# TYPE jar_process_info gauge",
+        f'jar_process_info{{pid="{os.getpid()}"}} 1',
+    ]
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.expose())
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Métricas en formato de texto de Prometheus, con ``Authorization: Bearer
+    <REQUEST_METRICS['TOKEN']>``. En los dominios de los tenants, o sin
+    token configurado, la ruta no existe (404).
+    """
+    token = get_metrics_config()['TOKEN']
+    if not token or connection.schema_name != get_public_schema_name():
+        raise Http404()
+    provided = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(provided.encode(), token.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
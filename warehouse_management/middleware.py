@@ -0,0 +1,121 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connection
+
+from .audit import buffered_action_logs
+from .metrics import collect_request_metrics, get_metrics_config, observe_request
+
+
+class ActionLogBufferMiddleware:
+    """
+    Agrupa los ActionLog registrados durante la petición y los escribe con un
+    único INSERT al terminarla. Debe ir después de TenantMainMiddleware.
+
+    Bajo ASGI el búfer es el del hilo de la petición (el de sus sync_to_async),
+    así que se abre y se cierra desde ese hilo.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with buffered_action_logs():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        buffered = buffered_action_logs()
+        await sync_to_async(buffered.__enter__)()
+        try:
+            return await self.get_response(request)
+        finally:
+            await sync_to_async(buffered.__exit__)(None, None, None)
+
+
+class RequestMetricsMiddleware:
+    """
+    Mide cada petición (ver metrics.py): consultas y su duración, tiempo de
+    serialización y total. Los añade a los histogramas del proceso y, con
+    ``REQUEST_METRICS['SERVER_TIMING']``, a la cabecera Server-Timing. Debe
+    ir la primera, para que el total incluya la resolución del tenant.
+
+    El renderizado de las respuestas de DRF (TemplateResponse) ocurre entre
+    process_template_response y su post_render_callback, y cuenta como
+    serialización. En las respuestas en streaming sólo se mide hasta que la
+    vista devuelve el iterador.
+
+    Bajo ASGI las conexiones son por hilo: el execute_wrapper se instala en
+    la del hilo de la petición, donde corren las consultas del ORM async.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        config = get_metrics_config()
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        with collect_request_metrics() as metrics, connection.execute_wrapper(metrics):
+            request.request_metrics = metrics
+            response = self.get_response(request)
+        return self.finish(request, response, metrics, config)
+
+    async def __acall__(self, request):
+        config = get_metrics_config()
+        if not config['ENABLED']:
+            return await self.get_response(request)
+
+        with collect_request_metrics() as metrics:
+            request.request_metrics = metrics
+            await sync_to_async(_add_wrapper)(metrics)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(_remove_wrapper)(metrics)
+        return self.finish(request, response, metrics, config)
+
+    def finish(self, request, response, metrics, config):
+        total = time.perf_counter() - metrics.started
+
+        match = request.resolver_match
+        view_name = (match.view_name or match.route) if match else '<unresolved>'
+        if view_name != 'metrics':
+            tenant = getattr(request, 'tenant', None)
+            schema_name = tenant.schema_name if tenant is not None else ''
+            observe_request(metrics, total, schema_name, view_name, request.method, response.status_code)
+        if config['SERVER_TIMING']:
+            response['Server-Timing'] = metrics.server_timing(total)
+        return response
+
+    def process_template_response(self, request, response):
+        metrics = getattr(request, 'request_metrics', None)
+        if metrics is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                metrics.serialize_time += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+# connection se resuelve dentro del hilo de la petición, no en el del bucle.
+def _add_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def _remove_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
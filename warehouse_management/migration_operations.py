@@ -0,0 +1,23 @@
+# warehouse_management/migration_operations.py
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db.migrations.operations import AddIndex
+
+
+class AddIndexConcurrentlyIfPossible(AddIndexConcurrently):
+    """
+    AddIndexConcurrently que, si la migración se ejecuta dentro de una
+    transacción, crea el índice sin CONCURRENTLY. Ocurre al dar de alta un
+    tenant con Tenant.save() dentro de atomic (get_or_create, el admin): su
+    schema se migra en esa transacción y está vacío, así que no hay
+    escrituras que bloquear.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.in_atomic_block:
+            return AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+        return super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.in_atomic_block:
+            return AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+        return super().database_backwards(app_label, schema_editor, from_state, to_state)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='actionlog',
+            name='object_repr',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+from warehouse_management.migration_operations import AddIndexConcurrentlyIfPossible
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción;
+    # así no se bloquean escrituras en schemas con tablas grandes. Si el schema
+    # se migra dentro de una transacción (alta de tenant), ver
+    # AddIndexConcurrentlyIfPossible.
+    atomic = False
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('warehouse_management', '0002_actionlog_object_repr'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='actionlog',
+            options={'ordering': ['-timestamp', '-id']},
+        ),
+        AddIndexConcurrentlyIfPossible(
+            model_name='actionlog',
+            index=models.Index(fields=['timestamp', 'id'], name='actionlog_timestamp_id_idx'),
+        ),
+        AddIndexConcurrentlyIfPossible(
+            model_name='pallet',
+            index=models.Index(fields=['create_date', 'id'], name='pallet_create_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from warehouse_management.migration_operations import AddIndexConcurrentlyIfPossible
+
+
+class Migration(migrations.Migration):
+    # Ver 0003: índices creados con CONCURRENTLY, fuera de transacción. Los
+    # índices simples de las FK que quedan cubiertos se eliminan al final,
+    # cuando los compuestos ya existen.
+    atomic = False
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('warehouse_management', '0003_cursor_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPossible(
+            model_name='actionlog',
+            index=models.Index(fields=['content_type', 'object_id'], name='actionlog_object_idx'),
+        ),
+        AddIndexConcurrentlyIfPossible(
+            model_name='pallet',
+            index=models.Index(condition=models.Q(('is_out', False)), fields=['warehouse', 'defective'], name='pallet_active_by_wh_idx'),
+        ),
+        AddIndexConcurrentlyIfPossible(
+            model_name='palletlot',
+            index=models.Index(fields=['lot', 'pallet'], name='palletlot_lot_pallet_idx'),
+        ),
+        migrations.AlterField(
+            model_name='actionlog',
+            name='content_type',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype'),
+        ),
+        migrations.AlterField(
+            model_name='palletlot',
+            name='lot',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='warehouse_management.lot'),
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Triggers por sentencia (con tablas de transición) que mantienen
+# WarehouseLotStock. Cada uno calcula los deltas de la sentencia, los agrupa
+# por (almacén, lote) y los aplica con un único INSERT ... ON CONFLICT. Las
+# tablas se cualifican con TG_TABLE_SCHEMA para no depender del search_path.
+
+STOCK_TABLE = 'warehouse_management_warehouselotstock'
+PALLET_TABLE = 'warehouse_management_pallet'
+PALLETLOT_TABLE = 'warehouse_management_palletlot'
+
+
+def _deltas(sign, pallet_lots, pallets, extra_join='', where='TRUE'):
+    """Aportación (con signo) de cada fila pallet-lote al stock; p es el estado del pallet."""
+    return f"""
+        SELECT p.warehouse_id, l.lot_id,
+               {sign} * (NOT p.is_out AND NOT p.defective)::int AS ok,
+               {sign} * (NOT p.is_out AND p.defective)::int AS defective,
+               {sign} * p.is_out::int AS out
+        FROM {pallet_lots} l JOIN {pallets} p ON p.id = l.pallet_id {extra_join}
+        WHERE p.warehouse_id IS NOT NULL AND {where}"""
+
+
+def _function(name, deltas):
+    return f"""
+CREATE OR REPLACE FUNCTION {name}() RETURNS trigger LANGUAGE plpgsql AS $fn$
+BEGIN
+    EXECUTE format($q$
+        INSERT INTO %1$I.{STOCK_TABLE} AS s (warehouse_id, lot_id, ok_count, defective_count, out_count)
+        SELECT warehouse_id, lot_id, sum(ok), sum(defective), sum(out)
+        FROM ({deltas}) d
+        GROUP BY warehouse_id, lot_id
+        HAVING sum(ok) <> 0 OR sum(defective) <> 0 OR sum(out) <> 0
+        ORDER BY warehouse_id, lot_id
+        ON CONFLICT (warehouse_id, lot_id) DO UPDATE SET
+            ok_count = s.ok_count + EXCLUDED.ok_count,
+            defective_count = s.defective_count + EXCLUDED.defective_count,
+            out_count = s.out_count + EXCLUDED.out_count
+    $q$, TG_TABLE_SCHEMA);
+    RETURN NULL;
+END
+$fn$;
+"""
+
+
+PALLETS = f'%1$I.{PALLET_TABLE}'
+PALLET_LOTS = f'%1$I.{PALLETLOT_TABLE}'
+
+TRIGGERS = [
+    # (función, tabla, evento, tablas de transición, deltas)
+    ('wm_stock_palletlot_insert', PALLETLOT_TABLE, 'INSERT', 'NEW TABLE AS new_rows',
+     _deltas('+1', 'new_rows', PALLETS)),
+    ('wm_stock_palletlot_delete', PALLETLOT_TABLE, 'DELETE', 'OLD TABLE AS old_rows',
+     _deltas('-1', 'old_rows', PALLETS)),
+    ('wm_stock_palletlot_update', PALLETLOT_TABLE, 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+     _deltas('-1', 'old_rows', PALLETS) + ' UNION ALL ' + _deltas('+1', 'new_rows', PALLETS)),
+    # Sólo cuentan los pallets cuyo almacén o estado ha cambiado: se resta el
+    # estado anterior y se suma el nuevo.
+    ('wm_stock_pallet_update', PALLET_TABLE, 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+     _deltas('-1', PALLET_LOTS, 'old_rows', 'JOIN new_rows n ON n.id = p.id',
+             '(p.warehouse_id, p.is_out, p.defective) IS DISTINCT FROM (n.warehouse_id, n.is_out, n.defective)')
+     + ' UNION ALL '
+     + _deltas('+1', PALLET_LOTS, 'new_rows', 'JOIN old_rows o ON o.id = p.id',
+               '(o.warehouse_id, o.is_out, o.defective) IS DISTINCT FROM (p.warehouse_id, p.is_out, p.defective)')),
+]
+
+CREATE_TRIGGERS_SQL = [
+    _function(function, deltas)
+    + f"CREATE TRIGGER {function} AFTER {event} ON {table} "
+      f"REFERENCING {transition} FOR EACH STATEMENT EXECUTE FUNCTION {function}();"
+    for function, table, event, transition, deltas in TRIGGERS
+]
+DROP_TRIGGERS_SQL = [
+    f"DROP TRIGGER IF EXISTS {function} ON {table}; DROP FUNCTION IF EXISTS {function}();"
+    for function, table, event, transition, deltas in TRIGGERS
+]
+
+# Carga inicial a partir de los pallets existentes.
+BACKFILL_SQL = f"""
+INSERT INTO {STOCK_TABLE} (warehouse_id, lot_id, ok_count, defective_count, out_count)
+SELECT warehouse_id, lot_id, sum(ok), sum(defective), sum(out)
+FROM ({_deltas('1', PALLETLOT_TABLE, PALLET_TABLE)}) d
+GROUP BY warehouse_id, lot_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_management', '0004_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WarehouseLotStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ok_count', models.IntegerField(default=0)),
+                ('defective_count', models.IntegerField(default=0)),
+                ('out_count', models.IntegerField(default=0)),
+                ('lot', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='warehouse_stock', to='warehouse_management.lot')),
+                ('warehouse', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='lot_stock', to='warehouse_management.warehouse')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('warehouse', 'lot'), name='warehouselotstock_warehouse_lot_uniq')],
+            },
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS_SQL, reverse_sql=DROP_TRIGGERS_SQL),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
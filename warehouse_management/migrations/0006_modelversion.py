@@ -0,0 +1,66 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# Trigger por sentencia que incrementa la versión de la tabla modificada en
+# ModelVersion. Como en 0005, se cualifica con TG_TABLE_SCHEMA. La fila de la
+# tabla queda bloqueada hasta el final de la transacción que escribe, así que
+# la nueva versión se ve exactamente cuando se ven los datos.
+
+VERSION_TABLE = 'warehouse_management_modelversion'
+VERSIONED_TABLES = [
+    'warehouse_management_product',
+    'warehouse_management_lot',
+    'warehouse_management_warehouse',
+    'warehouse_management_pallet',
+    'warehouse_management_palletlot',
+]
+
+CREATE_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION wm_bump_model_version() RETURNS trigger LANGUAGE plpgsql AS $fn$
+BEGIN
+    EXECUTE format($q$
+        INSERT INTO %1$I.{VERSION_TABLE} AS v (table_name, version, updated_at)
+        VALUES (%2$L, 1, now())
+        ON CONFLICT (table_name) DO UPDATE SET version = v.version + 1, updated_at = now()
+    $q$, TG_TABLE_SCHEMA, TG_TABLE_NAME);
+    RETURN NULL;
+END
+$fn$;
+"""
+
+CREATE_TRIGGERS_SQL = [CREATE_FUNCTION_SQL] + [
+    f"CREATE TRIGGER wm_model_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+    f"FOR EACH STATEMENT EXECUTE FUNCTION wm_bump_model_version();"
+    for table in VERSIONED_TABLES
+]
+DROP_TRIGGERS_SQL = [
+    f"DROP TRIGGER IF EXISTS wm_model_version ON {table};" for table in VERSIONED_TABLES
+] + ["DROP FUNCTION IF EXISTS wm_bump_model_version();"]
+
+# Versión inicial, para que las respuestas tengan Last-Modified desde el principio.
+INITIAL_VERSIONS_SQL = f"""
+INSERT INTO {VERSION_TABLE} (table_name, version, updated_at)
+SELECT unnest(ARRAY[{', '.join(f"'{table}'" for table in VERSIONED_TABLES)}]), 1, now()
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_management', '0005_warehouselotstock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelVersion',
+            fields=[
+                ('table_name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS_SQL, reverse_sql=DROP_TRIGGERS_SQL),
+        migrations.RunSQL(INITIAL_VERSIONS_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
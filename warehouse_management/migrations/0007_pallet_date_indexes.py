@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:26
+
+from django.db import migrations, models
+
+from warehouse_management.migration_operations import AddIndexConcurrentlyIfPossible
+
+
+class Migration(migrations.Migration):
+    # Ver 0003: índices creados con CONCURRENTLY, fuera de transacción.
+    atomic = False
+
+    dependencies = [
+        ('warehouse_management', '0006_modelversion'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPossible(
+            model_name='pallet',
+            index=models.Index(fields=['in_date'], name='pallet_in_date_idx'),
+        ),
+        AddIndexConcurrentlyIfPossible(
+            model_name='pallet',
+            index=models.Index(condition=models.Q(('out_date__isnull', False)), fields=['out_date'], name='pallet_out_date_idx'),
+        ),
+    ]
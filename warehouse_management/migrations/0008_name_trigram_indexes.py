@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# Índices GIN de trigramas sobre el nombre de pallets y lotes, para las
+# búsquedas ``contains`` y ``similar`` de lookup.py (la de prefijo ya la sirve
+# el índice varchar_pattern_ops del campo único).
+#
+# pg_trgm es un módulo de contrib que no todos los servidores tienen: si no
+# está disponible la migración no hace nada y esas búsquedas quedan sin
+# índice (``similar`` responde 400). La extensión se instala en public y no en
+# el schema del tenant que se esté migrando, para que sus operadores estén en
+# el search_path de todos los tenants.
+
+TRIGRAM_INDEXES = [
+    ('pallet_name_trgm_idx', 'warehouse_management_pallet'),
+    ('lot_name_trgm_idx', 'warehouse_management_lot'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public")
+        # Como AddIndexConcurrentlyIfPossible: sin CONCURRENTLY dentro de una transacción.
+        concurrently = '' if schema_editor.connection.in_atomic_block else 'CONCURRENTLY '
+        for index, table in TRIGRAM_INDEXES:
+            cursor.execute(
+                f"CREATE INDEX {concurrently}IF NOT EXISTS {index} ON {table} USING gin (name public.gin_trgm_ops)"
+            )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for index, _ in TRIGRAM_INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {index}")
+
+
+class Migration(migrations.Migration):
+    # Ver 0003: índices creados con CONCURRENTLY, fuera de transacción.
+    atomic = False
+
+    dependencies = [
+        ('warehouse_management', '0007_pallet_date_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# ActionLogHistory: tabla caliente y archivo unidos. Sin ORDER BY ni DISTINCT,
+# así PostgreSQL empuja los filtros a cada rama y resuelve ORDER BY
+# (timestamp, id) ... LIMIT con un Merge Append de los dos índices.
+COLUMNS = 'id, user_id, action_type, timestamp, content_type_id, object_id, object_repr, description'
+
+CREATE_VIEW_SQL = f"""
+CREATE VIEW warehouse_management_actionloghistory AS
+SELECT {COLUMNS}, false AS archived FROM warehouse_management_actionlog
+UNION ALL
+SELECT {COLUMNS}, true AS archived FROM warehouse_management_actionlogarchive
+"""
+DROP_VIEW_SQL = "DROP VIEW IF EXISTS warehouse_management_actionloghistory"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('warehouse_management', '0008_name_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActionLogArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('action_type', models.CharField(choices=[('CREATE', 'Creación'), ('UPDATE', 'Actualización'), ('DELETE', 'Eliminación'), ('MARK_OUT', 'Marcado como Salida'), ('MARK_DEFECTIVE', 'Marcado como Defectuoso')], max_length=20)),
+                ('timestamp', models.DateTimeField()),
+                ('object_id', models.PositiveIntegerField(null=True)),
+                ('object_repr', models.CharField(blank=True, default='', max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('content_type', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-timestamp', '-id'],
+                'indexes': [models.Index(fields=['timestamp', 'id'], name='actionlogarchive_ts_id_idx'), models.Index(fields=['content_type', 'object_id'], name='actionlogarchive_object_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ActionLogHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('action_type', models.CharField(choices=[('CREATE', 'Creación'), ('UPDATE', 'Actualización'), ('DELETE', 'Eliminación'), ('MARK_OUT', 'Marcado como Salida'), ('MARK_DEFECTIVE', 'Marcado como Defectuoso')], max_length=20)),
+                ('timestamp', models.DateTimeField()),
+                ('object_id', models.PositiveIntegerField(null=True)),
+                ('object_repr', models.CharField(blank=True, default='', max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('archived', models.BooleanField()),
+            ],
+            options={
+                'db_table': 'warehouse_management_actionloghistory',
+                'ordering': ['-timestamp', '-id'],
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CREATE_VIEW_SQL, reverse_sql=DROP_VIEW_SQL),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:51
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+import warehouse_management.models
+from django.db import migrations, models
+
+from warehouse_management.migration_operations import AddIndexConcurrentlyIfPossible
+
+
+class Migration(migrations.Migration):
+    # Ver 0003: índices creados con CONCURRENTLY, fuera de transacción.
+    atomic = False
+
+    dependencies = [
+        ('warehouse_management', '0009_actionlog_archive'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfPossible(
+            model_name='pallet',
+            index=django.contrib.postgres.indexes.GistIndex(warehouse_management.models.TsTzRange(django.db.models.functions.comparison.Coalesce('in_date', 'create_date'), models.Case(models.When(out_date__lt=django.db.models.functions.comparison.Coalesce('in_date', 'create_date'), then=django.db.models.functions.comparison.Coalesce('in_date', 'create_date')), models.When(out_date__isnull=False, then='out_date'), models.When(is_out=True, then=django.db.models.functions.comparison.Coalesce('in_date', 'create_date')), output_field=models.DateTimeField()), models.Value('[)')), name='pallet_presence_idx'),
+        ),
+    ]
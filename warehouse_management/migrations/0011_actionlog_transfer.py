@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_management', '0010_pallet_presence_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='actionlog',
+            name='action_type',
+            field=models.CharField(choices=[('CREATE', 'Creación'), ('UPDATE', 'Actualización'), ('DELETE', 'Eliminación'), ('MARK_OUT', 'Marcado como Salida'), ('MARK_DEFECTIVE', 'Marcado como Defectuoso'), ('TRANSFER', 'Traslado entre almacenes')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='actionlogarchive',
+            name='action_type',
+            field=models.CharField(choices=[('CREATE', 'Creación'), ('UPDATE', 'Actualización'), ('DELETE', 'Eliminación'), ('MARK_OUT', 'Marcado como Salida'), ('MARK_DEFECTIVE', 'Marcado como Defectuoso'), ('TRANSFER', 'Traslado entre almacenes')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+# El trigger de 0006 actualizaba una única fila de ModelVersion por tabla:
+# su bloqueo duraba hasta el commit, así que las transacciones que escribían
+# en una tabla del tenant iban de una en una, y dos caminos que tocan las
+# mismas tablas en distinto orden (crear pallet: pallet -> palletlot; borrar
+# un pallet o un lote: palletlot -> pallet) podían interbloquearse. Ahora
+# cada transacción cuenta sus sentencias en una fila propia por tabla de
+# ModelVersionChange, con su txid en la clave: ninguna otra transacción la
+# toca, así que no espera a nadie. La versión es ModelVersion.version más
+# esas filas, leídas en una sola consulta (ver versioning.model_versions).
+#
+# También desaparece updated_at: now() es el inicio de la transacción, no
+# su commit, y Last-Modified sólo tiene resolución de segundos, así que un
+# cliente con sólo If-Modified-Since podía recibir un 304 con datos viejos.
+# Las respuestas condicionales usan únicamente la ETag.
+
+VERSION_CHANGE_TABLE = 'warehouse_management_modelversionchange'
+VERSION_TABLE = 'warehouse_management_modelversion'
+
+CREATE_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION wm_bump_model_version() RETURNS trigger LANGUAGE plpgsql AS $fn$
+BEGIN
+    EXECUTE format($q$
+        INSERT INTO %1$I.{VERSION_CHANGE_TABLE} AS c (table_name, txid, statements)
+        VALUES (%2$L, txid_current(), 1)
+        ON CONFLICT (table_name, txid) DO UPDATE SET statements = c.statements + 1
+    $q$, TG_TABLE_SCHEMA, TG_TABLE_NAME);
+    RETURN NULL;
+END
+$fn$;
+"""
+
+# La función de 0006, con updated_at (que la reversión vuelve a crear).
+PREVIOUS_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION wm_bump_model_version() RETURNS trigger LANGUAGE plpgsql AS $fn$
+BEGIN
+    EXECUTE format($q$
+        INSERT INTO %1$I.{VERSION_TABLE} AS v (table_name, version, updated_at)
+        VALUES (%2$L, 1, now())
+        ON CONFLICT (table_name) DO UPDATE SET version = v.version + 1, updated_at = now()
+    $q$, TG_TABLE_SCHEMA, TG_TABLE_NAME);
+    RETURN NULL;
+END
+$fn$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_management', '0011_actionlog_transfer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelVersionChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=100)),
+                ('txid', models.BigIntegerField()),
+                ('statements', models.IntegerField(default=1)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('table_name', 'txid'), name='model_version_change_uniq')],
+            },
+        ),
+        migrations.RemoveField(
+            model_name='modelversion',
+            name='updated_at',
+        ),
+        migrations.RunSQL(CREATE_FUNCTION_SQL, reverse_sql=PREVIOUS_FUNCTION_SQL),
+    ]
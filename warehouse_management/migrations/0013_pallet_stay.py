@@ -0,0 +1,99 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:12
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import warehouse_management.models
+from django.db import migrations, models
+
+# Triggers por sentencia sobre Pallet que mantienen PalletStay (ver
+# 0005): un pallet nuevo con almacén abre su primera estancia, sin inicio;
+# un cambio de almacén cierra la abierta y abre otra desde now() (el inicio
+# de la transacción, que es también el de los ActionLog del traslado); un
+# pallet borrado se lleva sus estancias.
+
+STAY_TABLE = 'warehouse_management_palletstay'
+PALLET_TABLE = 'warehouse_management_pallet'
+
+INSERT_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION wm_stay_pallet_insert() RETURNS trigger LANGUAGE plpgsql AS $fn$
+BEGIN
+    EXECUTE format($q$
+        INSERT INTO %1$I.{STAY_TABLE} (pallet_id, warehouse_id)
+        SELECT id, warehouse_id FROM new_rows WHERE warehouse_id IS NOT NULL
+    $q$, TG_TABLE_SCHEMA);
+    RETURN NULL;
+END
+$fn$;
+CREATE TRIGGER wm_stay_pallet_insert AFTER INSERT ON {PALLET_TABLE}
+REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION wm_stay_pallet_insert();
+"""
+
+MOVED = "SELECT n.id, n.warehouse_id FROM new_rows n JOIN old_rows o ON o.id = n.id WHERE n.warehouse_id IS DISTINCT FROM o.warehouse_id"
+
+UPDATE_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION wm_stay_pallet_update() RETURNS trigger LANGUAGE plpgsql AS $fn$
+BEGIN
+    EXECUTE format($q$
+        UPDATE %1$I.{STAY_TABLE} s SET until = now()
+        FROM ({MOVED}) m WHERE s.pallet_id = m.id AND s.until IS NULL
+    $q$, TG_TABLE_SCHEMA);
+    EXECUTE format($q$
+        INSERT INTO %1$I.{STAY_TABLE} (pallet_id, warehouse_id, since)
+        SELECT id, warehouse_id, now() FROM ({MOVED}) m WHERE warehouse_id IS NOT NULL
+    $q$, TG_TABLE_SCHEMA);
+    RETURN NULL;
+END
+$fn$;
+CREATE TRIGGER wm_stay_pallet_update AFTER UPDATE ON {PALLET_TABLE}
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION wm_stay_pallet_update();
+"""
+
+DELETE_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION wm_stay_pallet_delete() RETURNS trigger LANGUAGE plpgsql AS $fn$
+BEGIN
+    EXECUTE format($q$
+        DELETE FROM %1$I.{STAY_TABLE} s USING old_rows o WHERE s.pallet_id = o.id
+    $q$, TG_TABLE_SCHEMA);
+    RETURN NULL;
+END
+$fn$;
+CREATE TRIGGER wm_stay_pallet_delete AFTER DELETE ON {PALLET_TABLE}
+REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION wm_stay_pallet_delete();
+"""
+
+DROP_TRIGGERS_SQL = [
+    f"DROP TRIGGER IF EXISTS {function} ON {PALLET_TABLE}; DROP FUNCTION IF EXISTS {function}();"
+    for function in ('wm_stay_pallet_insert', 'wm_stay_pallet_update', 'wm_stay_pallet_delete')
+]
+
+# Sin historial previo: cada pallet, una estancia en su almacén actual.
+BACKFILL_SQL = f"""
+INSERT INTO {STAY_TABLE} (pallet_id, warehouse_id)
+SELECT id, warehouse_id FROM {PALLET_TABLE} WHERE warehouse_id IS NOT NULL
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse_management', '0012_modelversion_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PalletStay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('since', models.DateTimeField(blank=True, null=True)),
+                ('until', models.DateTimeField(blank=True, null=True)),
+                ('pallet', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='stays', to='warehouse_management.pallet')),
+                ('warehouse', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='pallet_stays', to='warehouse_management.warehouse')),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GistIndex(warehouse_management.models.TsTzRange('since', 'until', models.Value('[)')), name='palletstay_period_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('until__isnull', True)), fields=('pallet',), name='palletstay_open_uniq')],
+            },
+        ),
+        migrations.RunSQL([INSERT_FUNCTION_SQL, UPDATE_FUNCTION_SQL, DELETE_FUNCTION_SQL], reverse_sql=DROP_TRIGGERS_SQL),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.contrib.postgres.indexes import GistIndex
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 class Product(models.Model):
@@ -25,6 +28,29 @@ class Warehouse(models.Model):
     def __str__(self):
         return self.name
 
+class TsTzRange(models.Func):
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+def pallet_presence():
+    """
+    Intervalo ``[entrada, salida)`` en que el pallet estuvo en su almacén. La
+    entrada es ``in_date`` o, si falta, ``create_date``; la salida, ``out_date``
+    (abierto si sigue dentro). Un pallet marcado como salido sin ``out_date``
+    tiene un intervalo vacío, igual que uno con ``out_date`` anterior a la
+    entrada (así la expresión nunca falla). Es la expresión de
+    pallet_presence_idx: las consultas deben usarla tal cual (ver
+    stock.stock_as_of) para que PostgreSQL use el índice.
+    """
+    entered = Coalesce('in_date', 'create_date')
+    left = models.Case(
+        models.When(out_date__lt=entered, then=entered),
+        models.When(out_date__isnull=False, then='out_date'),
+        models.When(is_out=True, then=entered),
+        output_field=models.DateTimeField(),
+    )
+    return TsTzRange(entered, left, models.Value('[)'))
+
 class Pallet(models.Model):
     name = models.CharField(max_length=255, unique=True)
     warehouse = models.ForeignKey(Warehouse, on_delete=models.SET_NULL, null=True, blank=True, related_name='pallets')
@@ -35,19 +61,169 @@ class Pallet(models.Model):
     is_out = models.BooleanField(default=False)
     defective = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Paginación por cursor de PalletViewSet (create_date, id).
+            models.Index(fields=['create_date', 'id'], name='pallet_create_date_id_idx'),
+            # Stock de un almacén: pallets activos, separando ok / defectuosos.
+            # Parcial: los pallets que ya han salido (la mayoría con el tiempo) no entran.
+            models.Index(
+                fields=['warehouse', 'defective'], condition=models.Q(is_out=False),
+                name='pallet_active_by_wh_idx'
+            ),
+            # Filtros por rango de fechas de PalletViewSet. out_date sólo
+            # existe en los pallets que han salido.
+            models.Index(fields=['in_date'], name='pallet_in_date_idx'),
+            models.Index(fields=['out_date'], condition=models.Q(out_date__isnull=False), name='pallet_out_date_idx'),
+            # Stock en una fecha (stock.stock_as_of): pallets cuyo intervalo de
+            # presencia contiene la fecha, sin recorrer el histórico.
+            GistIndex(pallet_presence(), name='pallet_presence_idx'),
+        ]
+
+    # Campos de los que dependen la caché de nombres y las series de
+    # throughput: signals.py compara sus valores guardados con los nuevos.
+    TRACKED_FIELDS = ('name', 'in_date', 'out_date', 'defective', 'warehouse_id')
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_db_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self.remember_db_values(fields)
+
+    def remember_db_values(self, fields=None, values=None):
+        """
+        Toma como valores guardados en la base de datos los de ``values`` o,
+        sin él, los actuales de TRACKED_FIELDS (sólo los de ``fields``, por
+        nombre de campo o de columna, si se indica; los diferidos, nunca).
+        """
+        if values is None:
+            values = {
+                field: self.__dict__[field] for field in self.TRACKED_FIELDS
+                if field in self.__dict__ and (fields is None or field in fields or field.removesuffix('_id') in fields)
+            }
+        self._db_values = {**self.db_values(), **values}
+
+    def db_values(self):
+        """Valores de TRACKED_FIELDS en la base de datos según lo último leído o guardado."""
+        return getattr(self, '_db_values', {})
+
 class PalletLot(models.Model):
     pallet = models.ForeignKey(Pallet, on_delete=models.CASCADE)
-    lot = models.ForeignKey(Lot, on_delete=models.CASCADE)
+    # Sin índice propio: lo cubre palletlot_lot_pallet_idx.
+    lot = models.ForeignKey(Lot, on_delete=models.CASCADE, db_index=False)
 
     class Meta:
-        unique_together = ('pallet', 'lot') 
+        unique_together = ('pallet', 'lot')
+        indexes = [
+            # unique_together ya indexa (pallet, lot); éste sirve los recorridos por lote.
+            models.Index(fields=['lot', 'pallet'], name='palletlot_lot_pallet_idx'),
+        ]
 
     def __str__(self):
         return f"Pallet: {self.pallet.name} - Lot: {self.lot.name}"
 
+def stay_period():
+    """
+    Intervalo ``[since, until)`` de una PalletStay (abierto por la izquierda
+    en la primera estancia, por la derecha en la actual). Es la expresión de
+    palletstay_period_idx (ver pallet_presence).
+    """
+    return TsTzRange('since', 'until', models.Value('[)'))
+
+class PalletStay(models.Model):
+    """
+    Estancia de un pallet en un almacén. La mantienen triggers de PostgreSQL
+    sobre Pallet (migración 0013), así que vale para cualquier vía de
+    escritura: al cambiar ``warehouse`` (traslados, PATCH, borrado de un
+    almacén) se cierra la estancia abierta y se abre otra desde ese
+    instante. La primera no tiene ``since``: cuándo entró el pallet lo dice
+    pallet_presence. Los pallets que existían antes de la migración tienen
+    una sola estancia, en su almacén de entonces.
+
+    Sin FK reales: las estancias de un pallet las borra el trigger al
+    borrarlo (también por SQL directo), y las cerradas sobreviven al borrado
+    de su almacén.
+    """
+    pallet = models.ForeignKey(Pallet, on_delete=models.DO_NOTHING, db_constraint=False, related_name='stays')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.DO_NOTHING, db_constraint=False, related_name='pallet_stays')
+    since = models.DateTimeField(null=True, blank=True)
+    until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pallet'], condition=models.Q(until__isnull=True), name='palletstay_open_uniq'),
+        ]
+        indexes = [
+            # Stock en una fecha (stock.stock_as_of): dónde estaba cada pallet.
+            GistIndex(stay_period(), name='palletstay_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.pallet_id} en {self.warehouse_id}: {self.since} - {self.until}"
+
+class WarehouseLotStock(models.Model):
+    """
+    Conteo materializado de pallets por (almacén, lote): activos ok, activos
+    defectuosos y salidos. Lo mantienen triggers de PostgreSQL sobre Pallet y
+    PalletLot (migración 0005), así que vale para cualquier vía de escritura:
+    API, admin, bulk_create o queryset.update(). ``rebuild_stock`` lo verifica
+    y repara.
+
+    Sin FK reales: al borrar un lote o almacén las filas de PalletLot/Pallet se
+    tocan antes y el orden de borrado no debe chocar con los triggers.
+    """
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.DO_NOTHING, db_constraint=False, related_name='lot_stock')
+    lot = models.ForeignKey(Lot, on_delete=models.DO_NOTHING, db_constraint=False, related_name='warehouse_stock')
+    ok_count = models.IntegerField(default=0)
+    defective_count = models.IntegerField(default=0)
+    out_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['warehouse', 'lot'], name='warehouselotstock_warehouse_lot_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.warehouse_id}/{self.lot_id}: {self.ok_count} ok, {self.defective_count} def, {self.out_count} out"
+
+class ModelVersion(models.Model):
+    """
+    Versión de cada tabla versionada del schema, por nombre de tabla: la
+    base ya compactada más las filas de ModelVersionChange de la tabla (ver
+    versioning.model_versions). De ella salen las ETag de las respuestas
+    condicionales.
+    """
+    table_name = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.table_name} v{self.version}"
+
+class ModelVersionChange(models.Model):
+    """
+    Una fila por tabla y transacción que la escribe, con el número de
+    sentencias que la han escrito, mantenida por un trigger por sentencia en
+    cada INSERT/UPDATE/DELETE (migración 0012), así que cubre cualquier vía
+    de escritura. La clave incluye el txid: cada transacción sólo toca su
+    propia fila y los escritores no se bloquean entre sí.
+    versioning.compact_model_versions las suma a ModelVersion.
+    """
+    table_name = models.CharField(max_length=100)
+    txid = models.BigIntegerField()
+    statements = models.IntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['table_name', 'txid'], name='model_version_change_uniq'),
+        ]
+
 class ActionLog(models.Model):
     ACTION_CHOICES = [
         ('CREATE', 'Creación'),
@@ -55,17 +231,79 @@ class ActionLog(models.Model):
         ('DELETE', 'Eliminación'),
         ('MARK_OUT', 'Marcado como Salida'),
         ('MARK_DEFECTIVE', 'Marcado como Defectuoso'),
+        ('TRANSFER', 'Traslado entre almacenes'),
     ]
 
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     action_type = models.CharField(max_length=20, choices=ACTION_CHOICES)
     timestamp = models.DateTimeField(default=timezone.now)
-    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE, null=True)
+    # Sin índice propio: lo cubre actionlog_object_idx.
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE, null=True, db_index=False)
+    object_id = models.PositiveIntegerField(null=True)
+    # Representación del objeto en el momento de registrar la acción; evita
+    # tener que buscarlo (o no encontrarlo) cuando ya ha sido eliminado.
+    object_repr = models.CharField(max_length=255, blank=True, default='')
+    description = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.user} - {self.action_type} - {self.timestamp}"
+
+    class Meta:
+        ordering = ['-timestamp', '-id']
+        indexes = [
+            # Paginación por cursor de ActionLogViewSet (timestamp, id).
+            models.Index(fields=['timestamp', 'id'], name='actionlog_timestamp_id_idx'),
+            # Historial de un objeto concreto.
+            models.Index(fields=['content_type', 'object_id'], name='actionlog_object_idx'),
+        ]
+class ActionLogArchive(models.Model):
+    """
+    ActionLog antiguos, fuera de la tabla caliente (ver archive.py y el
+    comando archive_action_logs). Mismas columnas y el mismo id que tenían,
+    para que la paginación por (timestamp, id) siga siendo estable al
+    consultar ambas tablas juntas (ActionLogHistory).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    action_type = models.CharField(max_length=20, choices=ActionLog.ACTION_CHOICES)
+    timestamp = models.DateTimeField()
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE, null=True, db_index=False, related_name='+')
+    object_id = models.PositiveIntegerField(null=True)
+    object_repr = models.CharField(max_length=255, blank=True, default='')
+    description = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.user} - {self.action_type} - {self.timestamp}"
+
+    class Meta:
+        ordering = ['-timestamp', '-id']
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='actionlogarchive_ts_id_idx'),
+            # Historial archivado de un objeto concreto.
+            models.Index(fields=['content_type', 'object_id'], name='actionlogarchive_object_idx'),
+        ]
+
+class ActionLogHistory(models.Model):
+    """
+    Vista (migración 0009) con ActionLog y ActionLogArchive unidos con UNION
+    ALL; ``archived`` indica de qué tabla sale cada fila. PostgreSQL empuja
+    los filtros y el ORDER BY ... LIMIT a cada rama, así que cada una usa sus
+    propios índices. Sólo lectura.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, null=True, related_name='+')
+    action_type = models.CharField(max_length=20, choices=ActionLog.ACTION_CHOICES)
+    timestamp = models.DateTimeField()
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.DO_NOTHING, null=True, related_name='+')
     object_id = models.PositiveIntegerField(null=True)
+    object_repr = models.CharField(max_length=255, blank=True, default='')
     description = models.TextField(blank=True)
+    archived = models.BooleanField()
 
     def __str__(self):
         return f"{self.user} - {self.action_type} - {self.timestamp}"
 
     class Meta:
-        ordering = ['-timestamp']
\ No newline at end of file
+        managed = False
+        db_table = 'warehouse_management_actionloghistory'
+        ordering = ['-timestamp', '-id']
@@ -0,0 +1,140 @@
+# warehouse_management/pagination.py
+import base64
+import json
+from collections import namedtuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+Cursor = namedtuple('Cursor', ['value', 'pk', 'reverse'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre ``ordering`` + ``id`` como desempate.
+
+    Cada página se obtiene con ``WHERE (campo, id) < (valor, id)`` y un LIMIT,
+    sin COUNT ni OFFSET, así que el coste no crece con la profundidad de la
+    página. Necesita un índice compuesto (campo, id). ``ordering`` debe ser
+    un DateTimeField no nulo, con '-' para orden descendente.
+    """
+    ordering = '-id'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = cursor.reverse if cursor else False
+
+        field = self.ordering.lstrip('-')
+        descending = self.ordering.startswith('-') != reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{field}', f'{prefix}id')
+
+        if cursor:
+            strict, inclusive = ('lt', 'lte') if descending else ('gt', 'gte')
+            # La condición redundante sobre el campo permite usarla como límite
+            # del recorrido del índice; el OR sólo filtra los empates.
+            queryset = queryset.filter(
+                Q(**{f'{field}__{inclusive}': cursor.value}),
+                Q(**{f'{field}__{strict}': cursor.value}) | Q(**{field: cursor.value, f'id__{strict}': cursor.pk}),
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            value = parse_datetime(value)
+            if value is None:
+                raise ValueError
+            return Cursor(value, int(pk), bool(reverse))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        # Las filas pueden ser instancias o diccionarios de values() (ver views.ValuesListMixin).
+        field = self.ordering.lstrip('-')
+        if isinstance(instance, dict):
+            value, pk = instance[field], instance['id']
+        else:
+            value, pk = getattr(instance, field), instance.pk
+        payload = json.dumps([value.isoformat(), pk, reverse])
+        encoded = base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii')
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class OptionalKeysetPagination(KeysetPagination):
+    """
+    Paginación por cursor a petición del cliente (``?pagination=cursor`` en la
+    primera página, ``?cursor=`` en las siguientes). Sin ellos se comporta
+    como la PageNumberPagination global, para no romper a los clientes actuales.
+    """
+    opt_in_query_param = 'pagination'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params or request.query_params.get(self.opt_in_query_param) == 'cursor':
+            self.page_number_paginator = None
+            return super().paginate_queryset(queryset, request, view)
+        self.page_number_paginator = PageNumberPagination()
+        return self.page_number_paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.page_number_paginator is not None:
+            return self.page_number_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class ActionLogPagination(OptionalKeysetPagination):
+    ordering = '-timestamp'
+
+
+class PalletPagination(OptionalKeysetPagination):
+    ordering = '-create_date'
@@ -1,10 +1,11 @@
 from rest_framework.permissions import BasePermission
-from tenants.models import TenantMembership 
+from tenants.cache import is_tenant_member
 
 class IsMemberOfCurrentTenant(BasePermission):
     """
     Permite el acceso solo si el usuario autenticado es miembro
     del tenant actualmente activo (identificado por django-tenants).
+    La comprobación se cachea por (usuario, tenant); ver tenants.cache.
     """
     message = "No tienes permiso para acceder a este tenant."
 
@@ -15,4 +16,4 @@ class IsMemberOfCurrentTenant(BasePermission):
         if not hasattr(request, 'tenant') or not request.tenant:
             return False
 
-        return TenantMembership.objects.filter(user=request.user, tenant=request.tenant).exists()
\ No newline at end of file
+        return is_tenant_member(request.user, request.tenant)
\ No newline at end of file
@@ -1,9 +1,77 @@
 # warehouse_management/serializers.py
+import time
+from datetime import timedelta
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Product, Lot, Warehouse, Pallet, PalletLot, ActionLog
+from django.db import models
+from django.utils import timezone
+from .analytics import GROUPS, MAX_BUCKETS, PERIODS, period_buckets
+from .audit import resolve_affected_objects
+from .metrics import add_serialization_time
+from .models import Product, Lot, Warehouse, Pallet, PalletLot, ActionLog, WarehouseLotStock
 from django.contrib.contenttypes.models import ContentType
 
+def parse_field_list(value):
+    """``'a, b,c'`` -> ``{'a', 'b', 'c'}``; vacío o None -> conjunto vacío."""
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Representación parcial a petición del cliente (ver
+    views.SparseFieldsetMixin, que pone ``fields`` y ``expand`` en el
+    contexto): ``fields`` limita los campos de primer nivel y ``expand``
+    sustituye el id de una relación de ``expandable_fields`` por el objeto
+    anidado. Sólo se aplica al serializer raíz; los anidados salen completos.
+    """
+    expandable_fields = {}
+
+    def is_root_serializer(self):
+        return self.parent is None or (isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_root_serializer():
+            return fields
+        requested = self.context.get('fields') or set()
+        expand = self.context.get('expand') or set()
+
+        unknown = expand - set(self.expandable_fields)
+        if unknown:
+            raise serializers.ValidationError({'expand': [f"No se puede expandir: {', '.join(sorted(unknown))}."]})
+        for name in expand:
+            fields[name] = self.expandable_fields[name](read_only=True)
+
+        if requested:
+            unknown = requested - set(fields)
+            if unknown:
+                raise serializers.ValidationError({'fields': [f"Campos desconocidos: {', '.join(sorted(unknown))}."]})
+            fields = {name: field for name, field in fields.items() if name in requested or name in expand}
+        return fields
+
+    def to_representation(self, instance):
+        # Sólo en el raíz: los anidados ya cuentan dentro de su padre.
+        if not self.is_root_serializer():
+            return super().to_representation(instance)
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            add_serialization_time(time.perf_counter() - started)
+
+
+def value_converter(field):
+    """
+    Función que da la representación de ``field`` a partir del valor de una
+    columna de values(): la de su propio to_representation, salvo en las FK
+    (PrimaryKeyRelatedField), cuyo valor ya es el id.
+    """
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return lambda value: value
+    return field.to_representation
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -16,26 +84,37 @@ class ContentTypeSerializer(serializers.ModelSerializer):
         fields = ['id', 'app_label', 'model']
         read_only_fields = fields
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = ['id', 'name', 'create_date']
         read_only_fields = ['create_date']
 
-class LotSerializer(serializers.ModelSerializer):
+class LotSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
+    expandable_fields = {'product': ProductSerializer}
 
     class Meta:
         model = Lot
         fields = ['id', 'name', 'product', 'product_name', 'create_date']
         read_only_fields = ['create_date', 'product_name']
 
-class WarehouseSerializer(serializers.ModelSerializer):
+class WarehouseSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Warehouse
         fields = ['id', 'name', 'address', 'create_date']
         read_only_fields = ['create_date']
 
+class WarehouseLotStockSerializer(serializers.ModelSerializer):
+    lot_name = serializers.CharField(source='lot.name', read_only=True)
+    product = serializers.IntegerField(source='lot.product_id', read_only=True)
+    product_name = serializers.CharField(source='lot.product.name', read_only=True)
+
+    class Meta:
+        model = WarehouseLotStock
+        fields = ['lot', 'lot_name', 'product', 'product_name', 'ok_count', 'defective_count', 'out_count']
+        read_only_fields = fields
+
 class PalletLotSerializer(serializers.ModelSerializer):
     lot_name = serializers.CharField(source='lot.name', read_only=True)
     product_name = serializers.CharField(source='lot.product.name', read_only=True)
@@ -45,7 +124,7 @@ class PalletLotSerializer(serializers.ModelSerializer):
         fields = ['id', 'pallet', 'lot', 'lot_name', 'product_name'] 
         read_only_fields = ['pallet', 'lot_name', 'product_name']
 
-class PalletSerializer(serializers.ModelSerializer):
+class PalletSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     warehouse_name = serializers.CharField(source='warehouse.name', read_only=True, allow_null=True)
     lots_ids = serializers.PrimaryKeyRelatedField(
         queryset=Lot.objects.all(),
@@ -55,7 +134,7 @@ class PalletSerializer(serializers.ModelSerializer):
         allow_empty=True
     )
     pallet_lots_details = PalletLotSerializer(source='palletlot_set', many=True, read_only=True)
-
+    expandable_fields = {'warehouse': WarehouseSerializer}
 
     class Meta:
         model = Pallet
@@ -68,24 +147,133 @@ class PalletSerializer(serializers.ModelSerializer):
         read_only_fields = ['create_date', 'warehouse_name', 'pallet_lots_details']
 
 
-class ActionLogSerializer(serializers.ModelSerializer):
+class PalletBulkItemSerializer(serializers.Serializer):
+    """
+    Un pallet dentro de una alta masiva. Sólo valida formato: la existencia de
+    almacenes y lotes se comprueba para todo el lote a la vez en services.
+    """
+    name = serializers.CharField(max_length=255)
+    warehouse = serializers.IntegerField(required=False, allow_null=True)
+    lots_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    in_date = serializers.DateTimeField(required=False, allow_null=True)
+    out_date = serializers.DateTimeField(required=False, allow_null=True)
+    is_out = serializers.BooleanField(required=False, default=False)
+    defective = serializers.BooleanField(required=False, default=False)
+
+
+class PalletSelectionSerializer(serializers.Serializer):
+    """
+    Selección de pallets para las operaciones por lotes: una lista de ids,
+    un filtro (almacén, lote, producto) o ambos combinados.
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    warehouse = serializers.IntegerField(required=False)
+    lot = serializers.IntegerField(required=False)
+    product = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if not any(field in attrs for field in ('ids', 'warehouse', 'lot', 'product')):
+            raise serializers.ValidationError("Indique 'ids' o al menos un filtro (warehouse, lot, product).")
+        return attrs
+
+
+class PalletMarkOutSerializer(PalletSelectionSerializer):
+    out_date = serializers.DateTimeField(required=False)
+
+
+class PalletTransferSerializer(serializers.Serializer):
+    """
+    Traslado de pallets de ``source`` a ``destination``: los indicados en
+    ``ids`` y/o los de un lote o producto; sin ninguno, todos los activos de
+    ``source``.
+    """
+    source = serializers.PrimaryKeyRelatedField(queryset=Warehouse.objects.all())
+    destination = serializers.PrimaryKeyRelatedField(queryset=Warehouse.objects.all())
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    lot = serializers.IntegerField(required=False)
+    product = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if attrs['source'] == attrs['destination']:
+            raise serializers.ValidationError("El almacén de origen y el de destino deben ser distintos.")
+        return attrs
+
+
+class NameBatchSerializer(serializers.Serializer):
+    """Nombres (códigos escaneados) de una búsqueda exacta por lotes."""
+    names = serializers.ListField(child=serializers.CharField(max_length=255), allow_empty=False, max_length=1000)
+
+
+class NameSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=255)
+    mode = serializers.ChoiceField(choices=['prefix', 'contains', 'similar'], default='prefix')
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class StockAsOfSerializer(serializers.Serializer):
+    """Parámetro ``as_of`` del stock de un almacén en una fecha (ver stock.stock_as_of)."""
+    as_of = serializers.DateTimeField()
+
+
+class ThroughputQuerySerializer(serializers.Serializer):
+    """
+    Parámetros de analytics.throughput. Por defecto, los últimos 30 días o
+    12 semanas hasta hoy incluido; ``until`` es exclusivo.
+    """
+    period = serializers.ChoiceField(choices=PERIODS, default='day')
+    group_by = serializers.ChoiceField(choices=GROUPS, required=False, allow_null=True, default=None)
+    since = serializers.DateField(required=False)
+    until = serializers.DateField(required=False)
+    warehouse = serializers.IntegerField(required=False, allow_null=True, default=None)
+    product = serializers.IntegerField(required=False, allow_null=True, default=None)
+    lot = serializers.IntegerField(required=False, allow_null=True, default=None)
+
+    def validate(self, attrs):
+        until = attrs.get('until') or timezone.localdate() + timedelta(days=1)
+        since = attrs.get('since') or until - timedelta(days=30 if attrs['period'] == 'day' else 12 * 7)
+        if since >= until:
+            raise serializers.ValidationError("'since' debe ser anterior a 'until'.")
+        if len(period_buckets(since, until, attrs['period'])) > MAX_BUCKETS:
+            raise serializers.ValidationError(f"Como máximo {MAX_BUCKETS} periodos por consulta.")
+        return {**attrs, 'since': since, 'until': until}
+
+
+class ActionLogTailSerializer(serializers.Serializer):
+    """Parámetros de async_views.action_log_tail."""
+    after = serializers.IntegerField(required=False, min_value=0, default=None)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=200, default=50)
+
+
+class ActionLogListSerializer(serializers.ListSerializer):
+    """Resuelve los objetos afectados de toda la página antes de serializarla."""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        if 'affected_object_str' in self.child.fields:
+            iterable = resolve_affected_objects(iterable)
+        return super().to_representation(iterable)
+
+
+class ActionLogSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     content_type = ContentTypeSerializer(read_only=True) 
     affected_object_str = serializers.SerializerMethodField()
 
     class Meta:
         model = ActionLog
-        fields = ['id', 'user', 'action_type', 'timestamp', 'content_type', 'object_id', 'affected_object_str', 'description']
+        fields = ['id', 'user', 'action_type', 'timestamp', 'content_type', 'object_id', 'object_repr', 'affected_object_str', 'description']
         read_only_fields = fields
+        list_serializer_class = ActionLogListSerializer
 
     def get_affected_object_str(self, obj):
-        if obj.content_type and obj.object_id:
-            ModelClass = obj.content_type.model_class()
-            if ModelClass:
-                try:
-                    return str(ModelClass.objects.get(pk=obj.object_id))
-                except ModelClass.DoesNotExist:
-                    return f"Object ({obj.content_type.model}) ID: {obj.object_id} (Delete)"
+        if obj.content_type_id and obj.object_id:
+            if not hasattr(obj, 'resolved_object_str'):
+                resolve_affected_objects([obj])
+            if obj.resolved_object_str is not None:
+                return obj.resolved_object_str
+            if obj.object_repr:
+                return f"{obj.object_repr} (Delete)"
+            return f"Object ({obj.content_type.model}) ID: {obj.object_id} (Delete)"
         return None
 
 class SimplePalletForGroupingSerializer(serializers.ModelSerializer):
@@ -95,13 +283,20 @@ class SimplePalletForGroupingSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'in_date', 'is_out', 'defective']
 
 class LotWithPalletsInWarehouseSerializer(serializers.ModelSerializer):
+    """
+    Lote con sus pallets dentro de un almacén concreto.
+
+    Espera un queryset preparado por la vista: ``count_pallets_ok`` y
+    ``count_pallets_defective`` anotados y ``cached_pallets_for_view``
+    precargado. No lanza consultas por lote.
+    """
     product_name = serializers.CharField(source='product.name', read_only=True)
     # Lista de pallets (activos y no defectuosos) en este almacén para este lote
-    pallets_active = serializers.SerializerMethodField()
+    pallets_active = SimplePalletForGroupingSerializer(source='cached_pallets_for_view', many=True, read_only=True)
     # Conteo de pallets no defectuosos (y activos)
-    count_pallets_ok = serializers.SerializerMethodField()
+    count_pallets_ok = serializers.IntegerField(read_only=True)
     # Conteo de pallets defectuosos (pero activos)
-    count_pallets_defective = serializers.SerializerMethodField()
+    count_pallets_defective = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Lot
@@ -111,43 +306,3 @@ class LotWithPalletsInWarehouseSerializer(serializers.ModelSerializer):
             'count_pallets_ok',
             'count_pallets_defective'
         ]
-
-    def _get_filtered_pallets_for_lot_in_warehouse(self, lot_instance, warehouse_instance):
-        """
-        Helper interno para obtener los pallets de un lote en un almacén específico.
-        Aquí asumimos que queremos pallets que NO han salido (is_out=False).
-        """
-        if not warehouse_instance:
-            return Pallet.objects.none() # Devuelve un queryset vacío si no hay almacén
-
-        # Si usaste 'to_attr' en prefetch_related en la vista, podrías intentar accederlo aquí
-        # if hasattr(lot_instance, 'prefetched_pallets_for_warehouse_and_lot'):
-        #     return lot_instance.prefetched_pallets_for_warehouse_and_lot
-
-        # Si no, filtramos aquí. El prefetch_related general en la vista ayudará.
-        return Pallet.objects.filter(
-            lots=lot_instance,
-            warehouse=warehouse_instance,
-            is_out=False # Condición: Pallets que no han salido (activos en almacén)
-        )
-
-    def get_pallets_active(self, obj):
-        # 'obj' es la instancia del Lote
-        warehouse = self.context.get('warehouse')
-        all_pallets_for_lot_in_warehouse = self._get_filtered_pallets_for_lot_in_warehouse(obj, warehouse)
-        
-        # Filtramos para los que NO son defectuosos para esta lista específica
-        active_non_defective_pallets = all_pallets_for_lot_in_warehouse.filter(defective=False).order_by('create_date')
-        return SimplePalletForGroupingSerializer(active_non_defective_pallets, many=True).data
-
-    def get_count_pallets_ok(self, obj):
-        # 'obj' es la instancia del Lote
-        warehouse = self.context.get('warehouse')
-        all_pallets_for_lot_in_warehouse = self._get_filtered_pallets_for_lot_in_warehouse(obj, warehouse)
-        return all_pallets_for_lot_in_warehouse.filter(defective=False).count()
-
-    def get_count_pallets_defective(self, obj):
-        # 'obj' es la instancia del Lote
-        warehouse = self.context.get('warehouse')
-        all_pallets_for_lot_in_warehouse = self._get_filtered_pallets_for_lot_in_warehouse(obj, warehouse)
-        return all_pallets_for_lot_in_warehouse.filter(defective=True).count()
\ No newline at end of file
@@ -0,0 +1,168 @@
+# warehouse_management/services.py
+"""
+Operaciones por lotes sobre pallets: validan con un número fijo de consultas
+y escriben con bulk_create / UPDATE de conjunto dentro de una transacción.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import invalidate_throughput_cache, touches_closed_period
+from .audit import make_action_log, record_entries
+from .lookup import invalidate_pallet_names
+from .models import Lot, Warehouse, Pallet, PalletLot
+
+BULK_BATCH_SIZE = 1000
+
+
+def validate_pallet_batch(items):
+    """
+    Comprueba contra la base de datos un lote de pallets ya validado campo a
+    campo (ver PalletBulkItemSerializer): nombres duplicados o existentes,
+    almacenes y lotes inexistentes. Tres consultas en total, sea cual sea el
+    tamaño del lote.
+
+    Devuelve una lista ``[{'index': i, <campo>: [errores]}]``, vacía si todo es válido.
+    """
+    names = [item['name'] for item in items]
+    warehouse_ids = {item['warehouse'] for item in items if item.get('warehouse') is not None}
+    lot_ids = {lot_id for item in items for lot_id in item['lots_ids']}
+
+    existing_names = set(Pallet.objects.filter(name__in=names).values_list('name', flat=True))
+    existing_warehouses = set(Warehouse.objects.filter(pk__in=warehouse_ids).values_list('pk', flat=True))
+    existing_lots = set(Lot.objects.filter(pk__in=lot_ids).values_list('pk', flat=True))
+
+    errors = []
+    seen_names = set()
+    for index, item in enumerate(items):
+        item_errors = {}
+        if item['name'] in existing_names:
+            item_errors['name'] = [f"Ya existe un pallet con el nombre '{item['name']}'."]
+        elif item['name'] in seen_names:
+            item_errors['name'] = [f"Nombre '{item['name']}' repetido en la petición."]
+        seen_names.add(item['name'])
+
+        warehouse_id = item.get('warehouse')
+        if warehouse_id is not None and warehouse_id not in existing_warehouses:
+            item_errors['warehouse'] = [f"El almacén {warehouse_id} no existe."]
+
+        missing_lots = [lot_id for lot_id in item['lots_ids'] if lot_id not in existing_lots]
+        if missing_lots:
+            item_errors['lots_ids'] = [f"Lotes inexistentes: {missing_lots}."]
+
+        if item_errors:
+            errors.append({'index': index, **item_errors})
+    return errors
+
+
+@transaction.atomic
+def bulk_create_pallets(items, user):
+    """
+    Crea los pallets de ``items`` (validados) y sus PalletLot con bulk_create
+    en una sola transacción; los ActionLog de creación se registran al confirmar.
+    Devuelve los pallets creados, en el mismo orden.
+    """
+    pallets = [
+        Pallet(
+            name=item['name'],
+            warehouse_id=item.get('warehouse'),
+            in_date=item.get('in_date'),
+            out_date=item.get('out_date'),
+            is_out=item.get('is_out', False),
+            defective=item.get('defective', False),
+        )
+        for item in items
+    ]
+    Pallet.objects.bulk_create(pallets, batch_size=BULK_BATCH_SIZE)
+    if touches_closed_period(*(date for pallet in pallets for date in (pallet.in_date, pallet.out_date))):
+        invalidate_throughput_cache()
+
+    PalletLot.objects.bulk_create(
+        [
+            PalletLot(pallet_id=pallet.pk, lot_id=lot_id)
+            for pallet, item in zip(pallets, items)
+            for lot_id in dict.fromkeys(item['lots_ids'])
+        ],
+        batch_size=BULK_BATCH_SIZE
+    )
+
+    record_entries(make_action_log(user, 'CREATE', pallet, f"Pallet '{pallet.name}' creado.") for pallet in pallets)
+    return pallets
+
+
+def filter_pallets(ids=None, warehouse=None, lot=None, product=None, pallets=None):
+    """
+    Pallets (de ``pallets``, por defecto todos) seleccionados por una lista
+    de ids y/o por almacén, lote o producto. El filtro por lote/producto va
+    por subconsulta sobre PalletLot para no duplicar filas.
+    """
+    pallets = Pallet.objects.all() if pallets is None else pallets
+    if ids is not None:
+        pallets = pallets.filter(pk__in=ids)
+    if warehouse is not None:
+        pallets = pallets.filter(warehouse_id=warehouse)
+    if lot is not None:
+        pallets = pallets.filter(pk__in=PalletLot.objects.filter(lot_id=lot).values('pallet_id'))
+    if product is not None:
+        pallets = pallets.filter(pk__in=PalletLot.objects.filter(lot__product_id=product).values('pallet_id'))
+    return pallets
+
+
+def _transition_pallets(pallets, user, action_type, description, **changes):
+    """
+    Bloquea en orden de id los pallets afectados, los actualiza con un único
+    UPDATE y registra un ActionLog por pallet (audit.record_entries).
+    Devuelve los ids actualizados.
+    """
+    with transaction.atomic():
+        affected = list(pallets.select_for_update().order_by('pk').values_list('pk', 'name', 'in_date'))
+        if not affected:
+            return []
+        ids = [pk for pk, _, _ in affected]
+        Pallet.objects.filter(pk__in=ids).update(**changes)
+        invalidate_pallet_names(*[name for _, name, _ in affected])
+        # Una salida con fecha atrasada, o un defecto o un traslado de un
+        # pallet que entró en un periodo cerrado, cambian las series guardadas.
+        in_dates = [in_date for _, _, in_date in affected] if changes.keys() & {'defective', 'warehouse'} else []
+        if touches_closed_period(changes.get('out_date'), *in_dates):
+            invalidate_throughput_cache()
+
+        logs = []
+        for pk, name, _ in affected:
+            pallet = Pallet(pk=pk, name=name)
+            logs.append(make_action_log(user, action_type, pallet, description.format(name=name)))
+        record_entries(logs)
+    return ids
+
+
+def mark_pallets_out(pallets, user, out_date=None):
+    """Marca como salida los pallets activos de ``pallets``."""
+    return _transition_pallets(
+        pallets.filter(is_out=False), user, 'MARK_OUT', "Pallet '{name}' marcado como salida.",
+        is_out=True, out_date=out_date or timezone.now()
+    )
+
+
+def mark_pallets_defective(pallets, user):
+    """Marca como defectuosos los pallets activos y aún no defectuosos de ``pallets``."""
+    return _transition_pallets(
+        pallets.filter(is_out=False, defective=False), user, 'MARK_DEFECTIVE', "Pallet '{name}' marcado como defectuoso.",
+        defective=True
+    )
+
+
+def transfer_pallets(pallets, user, source, destination):
+    """
+    Traslada a ``destination`` los pallets activos de ``pallets`` que están en
+    ``source``. Los pallets se bloquean en orden de id, así que traslados
+    concurrentes con pallets en común no se bloquean mutuamente: el segundo
+    espera al primero y, al revisar las filas bloqueadas, omite las que ya
+    no están en ``source``.
+    """
+    def escape(text):
+        return text.replace('{', '{{').replace('}', '}}')
+
+    return _transition_pallets(
+        pallets.filter(warehouse=source, is_out=False), user, 'TRANSFER',
+        f"Pallet '{{name}}' trasladado de '{escape(source.name)}' a '{escape(destination.name)}'.",
+        warehouse=destination
+    )
@@ -0,0 +1,118 @@
+# warehouse_management/signals.py
+"""Invalidación de la caché de nombres de lookup.py y de la de periodos cerrados de analytics.py."""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .analytics import invalidate_throughput_cache, pallet_change_touches_closed_period, touches_closed_period
+from .lookup import invalidate_all_names, invalidate_pallet_names
+from .models import Lot, Pallet, PalletLot, Product, Warehouse
+
+
+def _saved_fields(update_fields):
+    """Campos de Pallet.TRACKED_FIELDS que escribe un save() con ``update_fields``."""
+    if update_fields is None:
+        return Pallet.TRACKED_FIELDS
+    return tuple(
+        field for field in Pallet.TRACKED_FIELDS if field in update_fields or field.removesuffix('_id') in update_fields
+    )
+
+
+@receiver(pre_save, sender=Pallet)
+def load_pallet_db_values(sender, instance, update_fields=None, **kwargs):
+    # Un pallet leído de la base de datos ya tiene sus valores (Pallet.from_db);
+    # sólo se consultan los de uno construido a mano con su pk.
+    if instance.pk is None:
+        return
+    missing = [field for field in _saved_fields(update_fields) if field not in instance.db_values()]
+    if missing:
+        values = Pallet.objects.filter(pk=instance.pk).values(*missing).first()
+        if values:
+            instance.remember_db_values(values=values)
+
+
+@receiver(post_save, sender=Pallet)
+def invalidate_saved_pallet(sender, instance, created=False, update_fields=None, **kwargs):
+    old = {} if created else instance.db_values()
+    saved = _saved_fields(update_fields)
+    if 'name' in saved and old.get('name', instance.name) != instance.name:
+        invalidate_pallet_names(old['name'])
+    invalidate_pallet_names(instance.name)
+    new = {**old, **{field: instance.__dict__[field] for field in saved if field in instance.__dict__}}
+    if pallet_change_touches_closed_period(old, new):
+        invalidate_throughput_cache()
+    instance.remember_db_values(saved)
+
+
+@receiver(post_delete, sender=Pallet)
+def invalidate_deleted_pallet(sender, instance, **kwargs):
+    invalidate_pallet_names(instance.name)
+    if touches_closed_period(instance.in_date, instance.out_date):
+        invalidate_throughput_cache()
+
+
+@receiver(m2m_changed, sender=Pallet.lots.through)
+def invalidate_pallet_lots(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        # lot.pallets.add(...): cambian varios pallets a la vez.
+        invalidate_all_names()
+        invalidate_throughput_cache()
+    else:
+        invalidate_pallet_names(instance.name)
+        if touches_closed_period(instance.in_date, instance.out_date):
+            invalidate_throughput_cache()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Lot)
+@receiver(post_save, sender=Warehouse)
+def invalidate_related_names(sender, instance, created=False, **kwargs):
+    # Un objeto nuevo todavía no aparece en ninguna entrada.
+    if not created:
+        invalidate_all_names()
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Lot)
+@receiver(post_delete, sender=Warehouse)
+@receiver(post_save, sender=PalletLot)
+def invalidate_all_on_write(sender, instance, **kwargs):
+    invalidate_all_names()
+
+
+@receiver(post_save, sender=Lot)
+def invalidate_throughput_on_lot_change(sender, instance, created=False, **kwargs):
+    # Cambiar el producto de un lote reagrupa sus pallets ya contados.
+    if not created:
+        invalidate_throughput_cache()
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Warehouse)
+def invalidate_throughput_on_delete(sender, instance, **kwargs):
+    # Borrar un almacén deja sus pallets sin almacén con un update del
+    # queryset, que no envía señales de Pallet.
+    invalidate_throughput_cache()
+
+
+@receiver(pre_delete, sender=Lot)
+def invalidate_throughput_on_lot_delete(sender, instance, **kwargs):
+    # Sus PalletLot se borran en cascada sin señales por fila (PalletLot no
+    # tiene receptores de borrado, así que el Collector los borra de una vez):
+    # se invalida una vez por lote. Los de un pallet borrado ya los cubre
+    # invalidate_deleted_pallet.
+    invalidate_throughput_cache()
+
+
+@receiver(post_save, sender=PalletLot)
+def invalidate_throughput_on_pallet_lot(sender, instance, **kwargs):
+    # Sin volver a leer el pallet: la API asigna lotes con lots.set() (ver
+    # invalidate_pallet_lots) y el inline del admin o palletlot_set.create()
+    # ya traen el pallet. Sólo un PalletLot creado con pallet_id a secas
+    # invalida sin mirar sus fechas.
+    if PalletLot.pallet.is_cached(instance):
+        if touches_closed_period(instance.pallet.in_date, instance.pallet.out_date):
+            invalidate_throughput_cache()
+    else:
+        invalidate_throughput_cache()
@@ -0,0 +1,115 @@
+# warehouse_management/stock.py
+"""
+Verificación y reparación de WarehouseLotStock frente al recuento real de
+Pallet/PalletLot. El mantenimiento incremental lo hacen los triggers de la
+migración 0005; esto sólo corrige desviaciones (datos cargados con los
+triggers desactivados, restauraciones parciales...).
+
+También el stock en una fecha pasada (stock_as_of), calculado a partir de
+los intervalos de presencia de los pallets y de sus estancias en cada almacén.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from .models import Pallet, PalletLot, PalletStay, WarehouseLotStock, pallet_presence, stay_period
+
+STOCK_FIELDS = ('ok_count', 'defective_count', 'out_count')
+
+
+def compute_stock():
+    """Recuento real ``{(warehouse_id, lot_id): (ok, defective, out)}`` con una sola consulta."""
+    rows = PalletLot.objects.filter(pallet__warehouse__isnull=False).values(
+        'pallet__warehouse_id', 'lot_id'
+    ).annotate(
+        ok=Count('id', filter=Q(pallet__is_out=False, pallet__defective=False)),
+        defective=Count('id', filter=Q(pallet__is_out=False, pallet__defective=True)),
+        out=Count('id', filter=Q(pallet__is_out=True)),
+    ).order_by()
+    return {
+        (row['pallet__warehouse_id'], row['lot_id']): (row['ok'], row['defective'], row['out'])
+        for row in rows
+    }
+
+
+def stored_stock():
+    return {
+        (warehouse_id, lot_id): counts
+        for warehouse_id, lot_id, *counts in WarehouseLotStock.objects.values_list('warehouse_id', 'lot_id', *STOCK_FIELDS)
+    }
+
+
+def stock_drift():
+    """
+    Diferencias entre la tabla materializada y el recuento real:
+    ``{(warehouse_id, lot_id): (esperado, guardado)}``. Las filas a cero y las
+    que faltan se consideran equivalentes.
+    """
+    zero = (0, 0, 0)
+    expected, stored = compute_stock(), stored_stock()
+    drift = {}
+    for key in expected.keys() | stored.keys():
+        want, have = expected.get(key, zero), tuple(stored.get(key, zero))
+        if want != have:
+            drift[key] = (want, have)
+    return drift
+
+
+@transaction.atomic
+def rebuild_stock(repair=True):
+    """
+    Calcula las desviaciones y, si ``repair``, reescribe las filas afectadas.
+    La tabla se bloquea frente a escrituras mientras tanto: los triggers de
+    pallets concurrentes esperan y aplican su delta sobre el valor ya corregido.
+    """
+    if repair:
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {WarehouseLotStock._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+    drift = stock_drift()
+    if repair and drift:
+        WarehouseLotStock.objects.bulk_create(
+            [
+                WarehouseLotStock(warehouse_id=warehouse_id, lot_id=lot_id, **dict(zip(STOCK_FIELDS, want)))
+                for (warehouse_id, lot_id), (want, _) in drift.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['warehouse', 'lot'],
+            update_fields=list(STOCK_FIELDS),
+            batch_size=1000,
+        )
+        # Filas de almacenes/lotes que ya no existen o sin pallets.
+        WarehouseLotStock.objects.filter(ok_count=0, defective_count=0, out_count=0).delete()
+    return drift
+
+
+def stock_as_of(as_of, warehouse=None):
+    """
+    Existencias por almacén y lote en el instante ``as_of``: los pallets cuyo
+    intervalo de presencia (models.pallet_presence) lo contiene, en el
+    almacén de su estancia (PalletStay) de ese instante, separando ok y
+    defectuosos. Devuelve dicts con ``warehouse``, ``lot``, ``lot_name``,
+    ``product``, ``product_name``, ``ok_count`` y ``defective_count``,
+    ordenados por almacén y nombre de lote.
+
+    Usa pallet_presence_idx y palletstay_period_idx, así que el coste
+    depende de los pallets que había en ``as_of``, no de todo el histórico.
+    No hay historial de defectos: cada pallet cuenta con su estado
+    ``defective`` actual.
+    """
+    present = Pallet.objects.alias(presence=pallet_presence()).filter(presence__contains=as_of)
+    stays = PalletStay.objects.alias(period=stay_period()).filter(period__contains=as_of, pallet__in=present.values('id'))
+    if warehouse is not None:
+        stays = stays.filter(warehouse=warehouse)
+    rows = PalletLot.objects.filter(pallet__stays__in=stays.values('id')).values(
+        'pallet__stays__warehouse_id', 'lot_id', 'lot__name', 'lot__product_id', 'lot__product__name'
+    ).annotate(
+        ok=Count('id', filter=Q(pallet__defective=False)),
+        defective=Count('id', filter=Q(pallet__defective=True)),
+    ).order_by('pallet__stays__warehouse_id', 'lot__name')
+    return [
+        {
+            'warehouse': row['pallet__stays__warehouse_id'], 'lot': row['lot_id'], 'lot_name': row['lot__name'],
+            'product': row['lot__product_id'], 'product_name': row['lot__product__name'],
+            'ok_count': row['ok'], 'defective_count': row['defective'],
+        }
+        for row in rows
+    ]
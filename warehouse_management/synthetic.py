@@ -0,0 +1,179 @@
+# warehouse_management/synthetic.py
+"""
+Datos sintéticos para medir la app con un volumen realista (ver los comandos
+generate_synthetic_data y benchmark_endpoints).
+
+Todo se inserta con bulk_create, en tandas de ``batch_size`` filas y una
+transacción por tanda: la memoria no crece con el volumen y si se interrumpe
+quedan tandas completas (pallets siempre con sus PalletLot). Los nombres
+llevan un prefijo y un número con ceros a la izquierda; se continúa la
+numeración existente, así que se puede ejecutar varias veces sobre el mismo
+schema para ir añadiendo volumen. El stock (WarehouseLotStock) y las
+versiones de tabla los mantienen los triggers, como con cualquier escritura.
+"""
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import invalidate_throughput_cache
+from .models import ActionLog, Lot, Pallet, PalletLot, Product, Warehouse
+
+# Proporción de cada tipo de acción en el ActionLog generado.
+ACTION_WEIGHTS = {'CREATE': 50, 'UPDATE': 20, 'MARK_OUT': 20, 'MARK_DEFECTIVE': 5, 'DELETE': 5}
+
+ACTION_DESCRIPTIONS = {
+    'CREATE': "Pallet '{name}' creado.",
+    'UPDATE': "Pallet '{name}' actualizado.",
+    'MARK_OUT': "Pallet '{name}' marcado como salida.",
+    'MARK_DEFECTIVE': "Pallet '{name}' marcado como defectuoso.",
+    'DELETE': "Pallet '{name}' (ID: {pk}) eliminado.",
+}
+
+
+def _next_number(model, stem):
+    """Primer número libre para nombres ``<stem><número>`` (de ancho fijo, así que ordenan bien)."""
+    last = model.objects.filter(name__startswith=stem).order_by('-name').values_list('name', flat=True).first()
+    return int(last[len(stem):]) + 1 if last else 1
+
+
+def _chunks(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+class SyntheticDataGenerator:
+    """
+    Genera datos en el schema activo. ``progress(mensaje)``, si se da, recibe
+    un aviso por tanda.
+    """
+
+    def __init__(self, prefix='SYN', days=365, out_ratio=0.3, defective_ratio=0.05, max_lots_per_pallet=2,
+                 batch_size=5000, seed=None, progress=None):
+        self.prefix = prefix
+        self.days = days
+        self.out_ratio = out_ratio
+        self.defective_ratio = defective_ratio
+        self.max_lots_per_pallet = max_lots_per_pallet
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.progress = progress or (lambda message: None)
+        self.now = timezone.now()
+
+    def random_date(self):
+        return self.now - timedelta(seconds=self.rng.uniform(0, self.days * 86400))
+
+    def names(self, model, kind, count):
+        stem = f"{self.prefix}-{kind}-"
+        first = _next_number(model, stem)
+        return [f"{stem}{number:08d}" for number in range(first, first + count)]
+
+    def generate(self, products=0, lots_per_product=0, warehouses=0, pallets=0, action_logs=0):
+        """Crea los objetos pedidos y devuelve ``{modelo: filas creadas, 'elapsed_ms': ...}``."""
+        started = time.perf_counter()
+        created = {'products': 0, 'lots': 0, 'warehouses': 0, 'pallets': 0, 'pallet_lots': 0, 'action_logs': 0}
+
+        new_products = self.create_products(products)
+        created['products'] = len(new_products)
+        created['lots'] = self.create_lots(new_products, lots_per_product)
+        created['warehouses'] = self.create_warehouses(warehouses)
+        if pallets:
+            created['pallets'], created['pallet_lots'] = self.create_pallets(pallets)
+            # Pallets con fechas pasadas: cambian periodos ya cerrados.
+            invalidate_throughput_cache()
+        if action_logs:
+            created['action_logs'] = self.create_action_logs(action_logs)
+
+        created['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return created
+
+    def create_products(self, count):
+        products = [Product(name=name, create_date=self.random_date()) for name in self.names(Product, 'PRD', count)]
+        Product.objects.bulk_create(products, batch_size=self.batch_size)
+        return products
+
+    def create_lots(self, products, lots_per_product):
+        names = iter(self.names(Lot, 'LOT', len(products) * lots_per_product))
+        lots = [
+            Lot(name=next(names), product=product, create_date=max(product.create_date, self.random_date()))
+            for product in products for _ in range(lots_per_product)
+        ]
+        Lot.objects.bulk_create(lots, batch_size=self.batch_size)
+        return len(lots)
+
+    def create_warehouses(self, count):
+        warehouses = [
+            Warehouse(name=name, address=f"Calle Sintética {number}", create_date=self.random_date())
+            for number, name in enumerate(self.names(Warehouse, 'WH', count), start=1)
+        ]
+        Warehouse.objects.bulk_create(warehouses, batch_size=self.batch_size)
+        return len(warehouses)
+
+    def create_pallets(self, count):
+        """Pallets repartidos entre todos los almacenes y lotes del schema, con 1..max_lots_per_pallet lotes."""
+        warehouse_ids = list(Warehouse.objects.values_list('pk', flat=True))
+        lot_ids = list(Lot.objects.values_list('pk', flat=True))
+        if not warehouse_ids or not lot_ids:
+            raise ValueError("Hacen falta almacenes y lotes para generar pallets.")
+        max_lots = max(1, min(self.max_lots_per_pallet, len(lot_ids)))
+
+        names = self.names(Pallet, 'PAL', count)
+        links_total = 0
+        for start, size in _chunks(count, self.batch_size):
+            with transaction.atomic():
+                pallets = [self.make_pallet(name, warehouse_ids) for name in names[start:start + size]]
+                Pallet.objects.bulk_create(pallets)
+                links = [
+                    PalletLot(pallet_id=pallet.pk, lot_id=lot_id)
+                    for pallet in pallets for lot_id in self.rng.sample(lot_ids, self.rng.randint(1, max_lots))
+                ]
+                PalletLot.objects.bulk_create(links, batch_size=self.batch_size)
+            links_total += len(links)
+            self.progress(f"pallets: {start + size}/{count}")
+        return count, links_total
+
+    def make_pallet(self, name, warehouse_ids):
+        created = self.random_date()
+        is_out = self.rng.random() < self.out_ratio
+        return Pallet(
+            name=name,
+            warehouse_id=self.rng.choice(warehouse_ids),
+            create_date=created,
+            in_date=created,
+            is_out=is_out,
+            out_date=created + (self.now - created) * self.rng.random() if is_out else None,
+            defective=self.rng.random() < self.defective_ratio,
+        )
+
+    def create_action_logs(self, count):
+        """Entradas sobre pallets existentes, con fechas repartidas en ``days`` días."""
+        bounds = Pallet.objects.order_by('pk').values_list('pk', flat=True)
+        first_id, last_id = bounds.first(), bounds.last()
+        if first_id is None:
+            raise ValueError("Hacen falta pallets para generar el historial de acciones.")
+        user_ids = list(User.objects.values_list('pk', flat=True)) or [None]
+        content_type = ContentType.objects.get_for_model(Pallet)
+        actions, weights = list(ACTION_WEIGHTS), list(ACTION_WEIGHTS.values())
+
+        for start, size in _chunks(count, self.batch_size):
+            object_ids = [self.rng.randint(first_id, last_id) for _ in range(size)]
+            names = dict(Pallet.objects.filter(pk__in=object_ids).values_list('pk', 'name'))
+            logs = []
+            for object_id, action_type in zip(object_ids, self.rng.choices(actions, weights, k=size)):
+                name = names.get(object_id, f"{self.prefix}-PAL-{object_id}")
+                logs.append(ActionLog(
+                    user_id=self.rng.choice(user_ids),
+                    action_type=action_type,
+                    timestamp=self.random_date(),
+                    content_type=content_type,
+                    object_id=object_id,
+                    object_repr=name,
+                    description=ACTION_DESCRIPTIONS[action_type].format(name=name, pk=object_id),
+                ))
+            ActionLog.objects.bulk_create(logs)
+            self.progress(f"action logs: {start + size}/{count}")
+        return count
@@ -1,3 +1,1503 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.http import Http404
+from django.test import AsyncClient, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_tenants.test.cases import TenantTestCase
+from django_tenants.test.client import TenantClient
+from rest_framework.authtoken.models import Token
+
+from tenants.cache import get_membership_cache
+from tenants.models import TenantMembership
+from .analytics import get_throughput_cache, throughput
+from .audit import buffered_action_logs, flush_action_logs, record_action
+from .lookup import get_name_cache, has_trigram_extension
+from .metrics import REQUEST_DB_QUERIES, metrics_view, render_metrics, reset_metrics
+from .reporting import REPORT_TOTAL_FIELDS, build_report
+from .services import mark_pallets_out, transfer_pallets
+from .stock import compute_stock, stock_as_of, stock_drift
+from .versioning import compact_model_versions, model_versions
+from .models import (
+    Product, Lot, Warehouse, Pallet, PalletLot, PalletStay, ActionLog, ActionLogArchive, ModelVersionChange,
+    WarehouseLotStock, pallet_presence, stay_period,
+)
+
+
+class WarehouseAPITestCase(TenantTestCase):
+    """
+    Base para los tests de la API: crea un usuario miembro del tenant de
+    pruebas y un cliente autenticado por token contra su dominio. Los
+    ActionLog se escriben en modo síncrono (TestCase nunca confirma la
+    transacción, así que on_commit no llegaría a ejecutarse).
+    """
+
+    def setUp(self):
+        super().setUp()
+        # TenantTestCase.setUpClass no llama a super(): override_settings de clase no aplica.
+        sync_action_logs = override_settings(ACTION_LOG_BUFFER={'MODE': 'sync'})
+        sync_action_logs.enable()
+        self.addCleanup(sync_action_logs.disable)
+        get_membership_cache().clear()
+        get_name_cache().clear()
+        get_throughput_cache().clear()
+        # auth vive tanto en public (donde apuntan las membresías) como en el
+        # schema del tenant (donde se resuelven token y usuario): mismo id en ambos.
+        connection.set_schema_to_public()
+        public_user = User.objects.create_user(username='operario', password='secret')
+        TenantMembership.objects.create(user=public_user, tenant=self.tenant)
+        connection.set_tenant(self.tenant)
+        self.user = User.objects.create_user(pk=public_user.pk, username='operario', password='secret')
+        token = Token.objects.create(user=self.user)
+        self.client = TenantClient(self.tenant, HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def create_pallet(self, name, warehouse, lots, **kwargs):
+        pallet = Pallet.objects.create(name=name, warehouse=warehouse, **kwargs)
+        PalletLot.objects.bulk_create([PalletLot(pallet=pallet, lot=lot) for lot in lots])
+        return pallet
+
+
+class PalletsByLotTests(WarehouseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.warehouse = Warehouse.objects.create(name='Central')
+        self.other_warehouse = Warehouse.objects.create(name='Norte')
+        self.product = Product.objects.create(name='Aceite')
+        self.url = f'/api/v1/warehouse/warehouses/{self.warehouse.pk}/pallets-by-lot/'
+
+    def add_lot(self, index, ok=2, defective=1):
+        lot = Lot.objects.create(name=f'L-{index:03d}', product=self.product)
+        for n in range(ok):
+            self.create_pallet(f'P-{index}-ok-{n}', self.warehouse, [lot])
+        for n in range(defective):
+            self.create_pallet(f'P-{index}-def-{n}', self.warehouse, [lot], defective=True)
+        self.create_pallet(f'P-{index}-out', self.warehouse, [lot], is_out=True)
+        self.create_pallet(f'P-{index}-other', self.other_warehouse, [lot])
+        return lot
+
+    def test_counts_and_active_pallets(self):
+        self.add_lot(1, ok=3, defective=2)
+        only_defective = Lot.objects.create(name='L-999', product=self.product)
+        self.create_pallet('P-999-def', self.warehouse, [only_defective], defective=True)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 1)
+        lot = results[0]
+        self.assertEqual(lot['name'], 'L-001')
+        self.assertEqual(lot['product_name'], 'Aceite')
+        self.assertEqual(lot['count_pallets_ok'], 3)
+        self.assertEqual(lot['count_pallets_defective'], 2)
+        self.assertEqual([p['name'] for p in lot['pallets_active']], ['P-1-ok-0', 'P-1-ok-1', 'P-1-ok-2'])
+
+    def test_query_count_does_not_depend_on_number_of_lots(self):
+        self.add_lot(1)
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as single_lot:
+            self.client.get(self.url)
+
+        for index in range(2, 11):
+            self.add_lot(index)
+        with CaptureQueriesContext(connection) as full_page:
+            response = self.client.get(self.url)
+
+        self.assertEqual(len(response.json()['results']), 10)
+        self.assertEqual(len(full_page), len(single_lot))
+
+
+class ActionLogAPITests(WarehouseAPITestCase):
+    url = '/api/v1/warehouse/action-logs/'
+
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(name='Harina')
+
+    def create_lot_via_api(self, name):
+        return self.client.post('/api/v1/warehouse/lots/', {'name': name, 'product': self.product.pk})
+
+    def test_deleted_objects_use_snapshot(self):
+        lot_id = self.create_lot_via_api('L-1').json()['id']
+        self.client.delete(f'/api/v1/warehouse/lots/{lot_id}/')
+
+        results = self.client.get(self.url).json()['results']
+
+        self.assertEqual([r['action_type'] for r in results], ['DELETE', 'CREATE'])
+        self.assertEqual(results[0]['object_repr'], 'L-1 (Product: Harina)')
+        self.assertEqual(results[0]['affected_object_str'], 'L-1 (Product: Harina) (Delete)')
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        self.create_lot_via_api('L-1')
+        with CaptureQueriesContext(connection) as one_entry:
+            self.client.get(self.url)
+
+        for index in range(2, 11):
+            self.create_lot_via_api(f'L-{index}')
+        with CaptureQueriesContext(connection) as full_page:
+            results = self.client.get(self.url).json()['results']
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(results[0]['affected_object_str'], 'L-10 (Product: Harina)')
+        self.assertEqual(len(full_page), len(one_entry))
+
+
+class MembershipPermissionTests(WarehouseAPITestCase):
+    url = '/api/v1/warehouse/products/'
+
+    def test_repeated_requests_skip_membership_query(self):
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(self.url)
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(second), len(first))
+        self.assertFalse(any('tenants_tenantmembership' in q['sql'] for q in second))
+
+    def test_revoked_membership_applies_immediately(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        connection.set_schema_to_public()
+        TenantMembership.objects.filter(tenant=self.tenant).delete()
+        connection.set_tenant(self.tenant)
+
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class PalletBulkCreateTests(WarehouseAPITestCase):
+    url = '/api/v1/warehouse/pallets/bulk/'
+
+    def setUp(self):
+        super().setUp()
+        self.warehouse = Warehouse.objects.create(name='Central')
+        product = Product.objects.create(name='Aceite')
+        self.lots = [Lot.objects.create(name=f'L-{n}', product=product) for n in range(3)]
+
+    def post(self, items):
+        return self.client.post(self.url, items, content_type='application/json')
+
+    def test_creates_pallets_lots_and_logs(self):
+        items = [
+            {'name': f'P-{n}', 'warehouse': self.warehouse.pk, 'lots_ids': [self.lots[n % 3].pk]}
+            for n in range(50)
+        ]
+        items[0]['lots_ids'] = [lot.pk for lot in self.lots]
+
+        response = self.post(items)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 50)
+        self.assertEqual(Pallet.objects.filter(warehouse=self.warehouse).count(), 50)
+        self.assertEqual(PalletLot.objects.count(), 52)
+        self.assertEqual(ActionLog.objects.filter(action_type='CREATE', object_repr__startswith='P-').count(), 50)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        self.post([{'name': 'warm-up', 'lots_ids': []}])
+        with CaptureQueriesContext(connection) as small:
+            self.post([{'name': f'A-{n}', 'lots_ids': [self.lots[0].pk]} for n in range(2)])
+        with CaptureQueriesContext(connection) as large:
+            self.post([{'name': f'B-{n}', 'lots_ids': [self.lots[0].pk]} for n in range(200)])
+
+        self.assertEqual(Pallet.objects.count(), 203)
+        self.assertEqual(len(large), len(small))
+
+    def test_reports_errors_per_item_and_writes_nothing(self):
+        Pallet.objects.create(name='P-exists')
+        items = [
+            {'name': 'P-ok', 'lots_ids': [self.lots[0].pk]},
+            {'name': 'P-exists'},
+            {'name': 'P-dup'},
+            {'name': 'P-dup', 'warehouse': 999999},
+            {'name': 'P-bad-lot', 'lots_ids': [999999]},
+            {'lots_ids': []},
+        ]
+
+        response = self.post(items)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [5])
+        del items[5]
+
+        response = self.post(items)
+
+        self.assertEqual(response.status_code, 400)
+        errors = {error['index']: error for error in response.json()['errors']}
+        self.assertEqual(sorted(errors), [1, 3, 4])
+        self.assertIn('name', errors[1])
+        self.assertEqual(sorted(errors[3]), ['index', 'name', 'warehouse'])
+        self.assertIn('lots_ids', errors[4])
+        self.assertEqual(Pallet.objects.count(), 1)
+
+
+class PalletBatchTransitionTests(WarehouseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.warehouse = Warehouse.objects.create(name='Central')
+        self.other_warehouse = Warehouse.objects.create(name='Norte')
+        product = Product.objects.create(name='Aceite')
+        self.lot = Lot.objects.create(name='L-1', product=product)
+        self.other_lot = Lot.objects.create(name='L-2', product=product)
+        self.pallets = [self.create_pallet(f'P-{n}', self.warehouse, [self.lot]) for n in range(5)]
+        self.create_pallet('P-other-warehouse', self.other_warehouse, [self.lot])
+        self.create_pallet('P-other-lot', self.warehouse, [self.other_lot])
+        self.create_pallet('P-shipped', self.warehouse, [self.lot], is_out=True)
+
+    def post(self, action, data):
+        return self.client.post(f'/api/v1/warehouse/pallets/{action}/', data, content_type='application/json')
+
+    def test_mark_out_by_filter(self):
+        response = self.post('mark-out', {'warehouse': self.warehouse.pk, 'lot': self.lot.pk})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['updated'], 5)
+        self.assertCountEqual(response.json()['ids'], [p.pk for p in self.pallets])
+        self.assertFalse(Pallet.objects.filter(pk__in=response.json()['ids'], out_date__isnull=True).exists())
+        self.assertEqual(Pallet.objects.filter(is_out=False).count(), 2)
+        self.assertEqual(ActionLog.objects.filter(action_type='MARK_OUT').count(), 5)
+
+    def test_mark_defective_by_ids_skips_already_defective(self):
+        Pallet.objects.filter(pk=self.pallets[0].pk).update(defective=True)
+
+        response = self.post('mark-defective', {'ids': [p.pk for p in self.pallets[:3]]})
+
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(Pallet.objects.filter(defective=True).count(), 3)
+        self.assertEqual(
+            sorted(ActionLog.objects.filter(action_type='MARK_DEFECTIVE').values_list('object_repr', flat=True)),
+            ['P-1', 'P-2']
+        )
+
+    def test_requires_a_selection(self):
+        self.assertEqual(self.post('mark-out', {}).status_code, 400)
+        self.assertFalse(Pallet.objects.filter(is_out=True).exclude(name='P-shipped').exists())
+
+    def test_transfer_locks_in_id_order_and_skips_pallets_elsewhere(self):
+        selected = [p.pk for p in self.pallets[:3]] + [Pallet.objects.get(name='P-other-warehouse').pk]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post('transfer', {'source': self.warehouse.pk, 'destination': self.other_warehouse.pk, 'ids': selected})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['ids'], sorted(p.pk for p in self.pallets[:3]))
+        self.assertEqual(Pallet.objects.filter(warehouse=self.other_warehouse).count(), 4)
+        locking = [query['sql'] for query in queries.captured_queries if 'FOR UPDATE' in query['sql']]
+        self.assertEqual(len(locking), 1)
+        self.assertIn('ORDER BY 1 ASC FOR UPDATE', locking[0])
+        self.assertEqual(
+            sorted(ActionLog.objects.filter(action_type='TRANSFER').values_list('description', flat=True)),
+            [f"Pallet 'P-{n}' trasladado de 'Central' a 'Norte'." for n in range(3)]
+        )
+        self.assertEqual(stock_drift(), {})
+
+        # Repetido: ya no están en el origen.
+        response = self.post('transfer', {'source': self.warehouse.pk, 'destination': self.other_warehouse.pk, 'ids': selected})
+        self.assertEqual(response.json()['updated'], 0)
+
+    def test_transfer_validation(self):
+        same = self.post('transfer', {'source': self.warehouse.pk, 'destination': self.warehouse.pk})
+        self.assertEqual(same.status_code, 400)
+        missing = self.post('transfer', {'source': self.warehouse.pk, 'destination': 999999})
+        self.assertEqual(missing.status_code, 400)
+        response = self.post('transfer', {'source': self.warehouse.pk, 'destination': self.other_warehouse.pk, 'lot': self.other_lot.pk})
+        self.assertEqual(response.json()['updated'], 1)
+
+
+class ActionLogBufferTests(WarehouseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.warehouse = Warehouse.objects.create(name='Central')
+        self.pallet = Pallet.objects.create(name='P-1', warehouse=self.warehouse)
+
+    def actionlog_inserts(self, queries):
+        return [q for q in queries if q['sql'].startswith('INSERT INTO "warehouse_management_actionlog"')]
+
+    @override_settings(ACTION_LOG_BUFFER={'MODE': 'buffered'})
+    def test_request_entries_are_written_with_one_insert(self):
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/v1/warehouse/pallets/{self.pallet.pk}/', {'is_out': True, 'defective': True},
+                content_type='application/json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.actionlog_inserts(queries)), 1)
+        self.assertCountEqual(
+            ActionLog.objects.values_list('action_type', flat=True),
+            ['UPDATE', 'MARK_OUT', 'MARK_DEFECTIVE']
+        )
+
+    @override_settings(ACTION_LOG_BUFFER={'MODE': 'buffered'})
+    def test_rolled_back_entries_are_discarded(self):
+        with self.captureOnCommitCallbacks(execute=True), buffered_action_logs():
+            try:
+                with transaction.atomic():
+                    record_action(self.user, 'UPDATE', self.pallet, 'descartada')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            record_action(self.user, 'UPDATE', self.pallet, 'confirmada')
+            self.assertFalse(ActionLog.objects.exists())
+
+        self.assertEqual(list(ActionLog.objects.values_list('description', flat=True)), ['confirmada'])
+
+    @override_settings(ACTION_LOG_BUFFER={'MODE': 'worker', 'MAX_SIZE': 3, 'MAX_AGE': 3600})
+    def test_worker_mode_flushes_on_size_threshold(self):
+        def record_and_commit(description):
+            with self.captureOnCommitCallbacks(execute=True), buffered_action_logs():
+                record_action(self.user, 'UPDATE', self.pallet, description)
+
+        record_and_commit('entrada 0')
+        record_and_commit('entrada 1')
+        self.assertFalse(ActionLog.objects.exists())
+
+        record_and_commit('entrada 2')
+        self.assertEqual(ActionLog.objects.count(), 3)
+
+        record_and_commit('entrada 3')
+        flush_action_logs()
+        self.assertEqual(ActionLog.objects.count(), 4)
+
+
+class KeysetPaginationTests(WarehouseAPITestCase):
+    url = '/api/v1/warehouse/action-logs/'
+
+    def setUp(self):
+        super().setUp()
+        pallet = Pallet.objects.create(name='P-1')
+        # Marcas de tiempo repetidas: el desempate por id debe mantener el orden estable.
+        timestamps = [timezone.now() - timedelta(minutes=n // 3) for n in range(25)]
+        ActionLog.objects.bulk_create([
+            ActionLog(action_type='UPDATE', timestamp=ts, object_id=pallet.pk, description=str(n))
+            for n, ts in enumerate(timestamps)
+        ])
+        self.expected = list(ActionLog.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+
+    def test_walks_all_pages_forward_and_back(self):
+        response = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 7}).json()
+        self.assertNotIn('count', response)
+        self.assertIsNone(response['previous'])
+        pages = [response]
+        while pages[-1]['next']:
+            pages.append(self.client.get(pages[-1]['next']).json())
+
+        seen = [entry['id'] for page in pages for entry in page['results']]
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(page['results']) for page in pages], [7, 7, 7, 4])
+
+        previous = self.client.get(pages[2]['previous']).json()
+        self.assertEqual(previous['results'], pages[1]['results'])
+
+    def test_page_numbers_remain_the_default(self):
+        response = self.client.get(self.url, {'page': 2}).json()
+
+        self.assertEqual(response['count'], 25)
+        self.assertEqual([entry['id'] for entry in response['results']], self.expected[10:20])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'nope'}).status_code, 404)
+
+
+class IndexUsageTests(WarehouseAPITestCase):
+    """
+    Comprueba con EXPLAIN que las consultas calientes pueden servirse con sus
+    índices. Con tan pocos datos el planificador preferiría un seq scan, así
+    que se desactiva para la transacción del test; la mayoría de pallets ya
+    han salido, como en un almacén real.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.warehouse = Warehouse.objects.create(name='Central')
+        self.lot = Lot.objects.create(name='L-1', product=Product.objects.create(name='Aceite'))
+        self.pallet = self.create_pallet('P-1', self.warehouse, [self.lot])
+        shipped = Pallet.objects.bulk_create(
+            Pallet(name=f'P-out-{n}', warehouse=self.warehouse, is_out=True) for n in range(200)
+        )
+        PalletLot.objects.bulk_create(PalletLot(pallet=pallet, lot=self.lot) for pallet in shipped)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE warehouse_management_pallet')
+            cursor.execute('ANALYZE warehouse_management_palletlot')
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name):
+        self.assertIn(index_name, queryset.explain())
+
+    def test_warehouse_stock_filters(self):
+        active = Pallet.objects.filter(warehouse=self.warehouse, is_out=False)
+        self.assertUsesIndex(active.filter(defective=False), 'pallet_active_by_wh_idx')
+        self.assertUsesIndex(active.filter(defective=True), 'pallet_active_by_wh_idx')
+
+    def test_pallets_of_lot(self):
+        self.assertUsesIndex(PalletLot.objects.filter(lot=self.lot).values('pallet_id'), 'palletlot_lot_pallet_idx')
+
+    def test_pallet_date_ranges(self):
+        now = timezone.now()
+        self.assertUsesIndex(Pallet.objects.filter(in_date__gte=now - timedelta(days=1), in_date__lt=now), 'pallet_in_date_idx')
+        self.assertUsesIndex(Pallet.objects.filter(out_date__gte=now - timedelta(days=1)), 'pallet_out_date_idx')
+
+    def test_action_log_by_object(self):
+        content_type = ContentType.objects.get_for_model(Pallet)
+        queryset = ActionLog.objects.filter(content_type=content_type, object_id=self.pallet.pk)
+        self.assertUsesIndex(queryset, 'actionlog_object_idx')
+
+    def test_action_log_cursor_page(self):
+        now = timezone.now()
+        queryset = ActionLog.objects.filter(timestamp__lte=now).order_by('-timestamp', '-id')[:10]
+        self.assertUsesIndex(queryset, 'actionlog_timestamp_id_idx')
+
+
+class ExportTests(WarehouseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        warehouse = Warehouse.objects.create(name='Central')
+        product = Product.objects.create(name='Aceite')
+        lots = [Lot.objects.create(name=f'L-{n}', product=product) for n in range(2)]
+        self.create_pallet('P-1', warehouse, lots)
+        self.create_pallet('P-2', None, [])
+
+    def export(self, resource, export_format):
+        response = self.client.get(f'/api/v1/warehouse/{resource}/export/', {'export_format': export_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_pallets_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('pallets', 'csv'))))
+
+        self.assertEqual([row['name'] for row in rows], ['P-2', 'P-1'])
+        self.assertEqual(rows[1]['warehouse_name'], 'Central')
+        self.assertEqual(rows[1]['lot_names'], 'L-0|L-1')
+        self.assertEqual(rows[1]['product_names'], 'Aceite')
+        self.assertEqual(rows[0]['warehouse_name'], '')
+
+    def test_action_logs_ndjson(self):
+        self.client.post('/api/v1/warehouse/products/', {'name': 'Harina'})
+
+        lines = self.export('action-logs', 'ndjson').splitlines()
+
+        self.assertEqual(len(lines), 1)
+        entry = json.loads(lines[0])
+        self.assertEqual(entry['username'], 'operario')
+        self.assertEqual(entry['content_type_model'], 'product')
+        self.assertEqual(entry['object_repr'], 'Harina')
+
+    def test_unknown_format(self):
+        response = self.client.get('/api/v1/warehouse/pallets/export/', {'export_format': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+
+
+class WarehouseLotStockTests(WarehouseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.central = Warehouse.objects.create(name='Central')
+        self.north = Warehouse.objects.create(name='Norte')
+        product = Product.objects.create(name='Aceite')
+        self.lot = Lot.objects.create(name='L-1', product=product)
+        self.other_lot = Lot.objects.create(name='L-2', product=product)
+
+    def stock(self, warehouse, lot):
+        row = WarehouseLotStock.objects.filter(warehouse=warehouse, lot=lot).first()
+        return (row.ok_count, row.defective_count, row.out_count) if row else (0, 0, 0)
+
+    def tearDown(self):
+        self.assertEqual(stock_drift(), {})
+        super().tearDown()
+
+    def test_api_writes(self):
+        pallet_id = self.client.post(
+            '/api/v1/warehouse/pallets/',
+            {'name': 'P-1', 'warehouse': self.central.pk, 'lots_ids': [self.lot.pk, self.other_lot.pk]},
+            content_type='application/json'
+        ).json()['id']
+        self.assertEqual(self.stock(self.central, self.lot), (1, 0, 0))
+
+        url = f'/api/v1/warehouse/pallets/{pallet_id}/'
+        self.client.patch(url, {'warehouse': self.north.pk, 'defective': True, 'lots_ids': [self.lot.pk]}, content_type='application/json')
+        self.assertEqual(self.stock(self.central, self.lot), (0, 0, 0))
+        self.assertEqual(self.stock(self.north, self.lot), (0, 1, 0))
+        self.assertEqual(self.stock(self.north, self.other_lot), (0, 0, 0))
+
+        self.client.delete(url)
+        self.assertEqual(self.stock(self.north, self.lot), (0, 0, 0))
+
+    def test_bulk_paths(self):
+        self.client.post('/api/v1/warehouse/pallets/bulk/', [
+            {'name': f'P-{n}', 'warehouse': self.central.pk, 'lots_ids': [self.lot.pk]} for n in range(6)
+        ], content_type='application/json')
+        self.assertEqual(self.stock(self.central, self.lot), (6, 0, 0))
+
+        ids = list(Pallet.objects.order_by('pk').values_list('pk', flat=True))
+        mark = lambda action, data: self.client.post(f'/api/v1/warehouse/pallets/{action}/', data, content_type='application/json')
+        mark('mark-defective', {'ids': ids[:2]})
+        mark('mark-out', {'ids': ids[1:4]})
+        self.assertEqual(self.stock(self.central, self.lot), (2, 1, 3))
+
+    def test_inline_links_and_deletions(self):
+        pallet = self.create_pallet('P-1', self.central, [self.lot])
+        link = PalletLot.objects.create(pallet=pallet, lot=self.other_lot)
+        self.assertEqual(self.stock(self.central, self.other_lot), (1, 0, 0))
+
+        link.delete()
+        self.assertEqual(self.stock(self.central, self.other_lot), (0, 0, 0))
+
+        self.lot.delete()
+        self.assertFalse(WarehouseLotStock.objects.filter(lot_id=self.lot.pk).exclude(ok_count=0).exists())
+
+        self.create_pallet('P-2', self.north, [self.other_lot])
+        self.north.delete()
+        self.assertFalse(WarehouseLotStock.objects.filter(warehouse_id=self.north.pk).exclude(ok_count=0).exists())
+
+    def test_rebuild_repairs_drift(self):
+        self.create_pallet('P-1', self.central, [self.lot])
+        WarehouseLotStock.objects.filter(warehouse=self.central, lot=self.lot).update(ok_count=7)
+        WarehouseLotStock.objects.create(warehouse=self.north, lot=self.lot, out_count=2)
+
+        out = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_stock', schema_name=self.tenant.schema_name, check=True, stdout=out)
+        self.assertIn('2 desviaciones', out.getvalue())
+
+        call_command('rebuild_stock', schema_name=self.tenant.schema_name, stdout=io.StringIO())
+        self.assertEqual(self.stock(self.central, self.lot), (1, 0, 0))
+        self.assertFalse(WarehouseLotStock.objects.filter(warehouse=self.north).exists())
+
+    def test_stock_endpoint(self):
+        self.create_pallet('P-1', self.central, [self.lot])
+        self.create_pallet('P-2', self.central, [self.lot], is_out=True)
+        self.create_pallet('P-3', self.central, [self.other_lot], defective=True)
+
+        results = self.client.get(f'/api/v1/warehouse/warehouses/{self.central.pk}/stock/').json()['results']
+
+        self.assertEqual(
+            [(r['lot_name'], r['product_name'], r['ok_count'], r['defective_count'], r['out_count']) for r in results],
+            [('L-1', 'Aceite', 1, 0, 1), ('L-2', 'Aceite', 0, 1, 0)]
+        )
+
+
+class StockAsOfTests(WarehouseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.central = Warehouse.objects.create(name='Central')
+        self.north = Warehouse.objects.create(name='Norte')
+        product = Product.objects.create(name='Aceite')
+        self.lot = Lot.objects.create(name='L-1', product=product)
+        self.other_lot = Lot.objects.create(name='L-2', product=product)
+        self.now = timezone.now()
+
+    def days_ago(self, days):
+        return self.now - timedelta(days=days)
+
+    def holdings(self, as_of, warehouse):
+        return {row['lot_name']: (row['ok_count'], row['defective_count']) for row in stock_as_of(as_of, warehouse)}
+
+    def test_holdings_over_time(self):
+        self.create_pallet('P-1', self.central, [self.lot], in_date=self.days_ago(100), out_date=self.days_ago(50), is_out=True)
+        self.create_pallet('P-2', self.central, [self.lot, self.other_lot], in_date=self.days_ago(80))
+        self.create_pallet('P-3', self.central, [self.lot], in_date=self.days_ago(60), defective=True)
+        self.create_pallet('P-4', self.north, [self.lot], in_date=self.days_ago(70))
+        # Salido sin out_date, y con out_date anterior a la entrada: nunca presentes.
+        self.create_pallet('P-5', self.central, [self.lot], in_date=self.days_ago(90), is_out=True)
+        self.create_pallet('P-6', self.central, [self.lot], in_date=self.days_ago(90), out_date=self.days_ago(95), is_out=True)
+
+        self.assertEqual(self.holdings(self.days_ago(120), self.central), {})
+        self.assertEqual(self.holdings(self.days_ago(90), self.central), {'L-1': (1, 0)})
+        self.assertEqual(self.holdings(self.days_ago(55), self.central), {'L-1': (2, 1), 'L-2': (1, 0)})
+        # La salida es exclusiva: en out_date el pallet ya no está.
+        self.assertEqual(self.holdings(self.days_ago(50), self.central), {'L-1': (1, 1), 'L-2': (1, 0)})
+
+        # En el instante actual coincide con el stock actual.
+        current = {
+            (warehouse_id, lot_id): (ok, defective)
+            for (warehouse_id, lot_id), (ok, defective, _) in compute_stock().items() if ok or defective
+        }
+        self.assertEqual(
+            {(row['warehouse'], row['lot']): (row['ok_count'], row['defective_count']) for row in stock_as_of(self.now)},
+            current
+        )
+
+        url = f'/api/v1/warehouse/warehouses/{self.central.pk}/stock/'
+        response = self.client.get(url, {'as_of': self.days_ago(55).isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['lot_name'], row['ok_count']) for row in response.json()['results']], [('L-1', 2), ('L-2', 1)])
+        self.assertEqual(self.client.get(url, {'as_of': 'ayer'}).status_code, 400)
+
+    def test_moved_pallets_count_where_they_were(self):
+        self.create_pallet('P-1', self.central, [self.lot], in_date=self.days_ago(30))
+        self.create_pallet('P-2', self.central, [self.lot], in_date=self.days_ago(30))
+        self.create_pallet('P-3', self.central, [self.other_lot], in_date=self.days_ago(30))
+        transfer_pallets(Pallet.objects.filter(name='P-1'), self.user, self.central, self.north)
+        response = self.client.patch(
+            f'/api/v1/warehouse/pallets/{Pallet.objects.get(name="P-2").pk}/', {'warehouse': self.north.pk},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # Antes de los traslados, los tres seguían en Central.
+        self.assertEqual(self.holdings(self.days_ago(10), self.central), {'L-1': (2, 0), 'L-2': (1, 0)})
+        self.assertEqual(self.holdings(self.days_ago(10), self.north), {})
+        later = timezone.now()
+        self.assertEqual(self.holdings(later, self.central), {'L-2': (1, 0)})
+        self.assertEqual(self.holdings(later, self.north), {'L-1': (2, 0)})
+
+        # Borrar un almacén cierra las estancias de sus pallets, sin perder las pasadas.
+        north_id = self.north.pk
+        self.north.delete()
+        self.assertEqual(stock_as_of(timezone.now(), north_id), [])
+        self.assertEqual(self.holdings(self.days_ago(10), self.central), {'L-1': (2, 0), 'L-2': (1, 0)})
+        self.assertEqual(PalletStay.objects.filter(until__isnull=True).count(), 1)
+        Pallet.objects.filter(name='P-1').delete()
+        self.assertEqual(PalletStay.objects.filter(pallet__name='P-1').count(), 0)
+        self.assertEqual(PalletStay.objects.count(), 3)
+
+    def test_uses_presence_index(self):
+        pallets = Pallet.objects.alias(presence=pallet_presence()).filter(presence__contains=self.now)
+        stays = PalletStay.objects.alias(period=stay_period()).filter(period__contains=self.now)
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = pallets.explain()
+            stays_plan = stays.explain()
+        self.assertIn('pallet_presence_idx', plan)
+        self.assertIn('palletstay_period_idx', stays_plan)
+
+
+class TenantReportTests(WarehouseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        warehouse = Warehouse.objects.create(name='Central')
+        lot = Lot.objects.create(name='L-1', product=Product.objects.create(name='Aceite'))
+        now = timezone.now()
+        self.create_pallet('P-1', warehouse, [lot], in_date=now)
+        self.create_pallet('P-2', warehouse, [lot], in_date=now, defective=True)
+        self.create_pallet('P-3', warehouse, [lot], in_date=now - timedelta(days=30), is_out=True, out_date=now)
+        self.since, self.until = now - timedelta(days=1), now + timedelta(seconds=1)
+
+    def test_aggregates_schema(self):
+        report = build_report([self.tenant.schema_name], self.since, self.until, concurrency=1)
+
+        tenant = report['tenants'][0]
+        self.assertEqual(tenant['schema_name'], self.tenant.schema_name)
+        self.assertEqual(
+            {field: tenant[field] for field in REPORT_TOTAL_FIELDS},
+            {'warehouses': 1, 'stock_ok': 1, 'stock_defective': 1, 'stock_out': 1,
+             'pallets_in': 2, 'pallets_out': 1, 'pallets_in_defective': 1}
+        )
+        self.assertEqual(report['totals']['pallets_in'], 2)
+        self.assertIn('elapsed_ms', tenant)
+
+    def test_process_pool(self):
+        # Los workers usan su propia conexión: no ven los datos sin confirmar del test.
+        report = build_report([self.tenant.schema_name, 'public'], self.since, self.until, concurrency=2)
+
+        self.assertEqual(report['failed'], 0)
+        self.assertEqual([tenant['schema_name'] for tenant in report['tenants']], ['public', self.tenant.schema_name])
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('tenant_report', schema_names=[self.tenant.schema_name], concurrency=1, json=True, stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['totals']['stock_ok'], 1)
+
+
+class ConditionalGetTests(WarehouseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.warehouse = Warehouse.objects.create(name='Central')
+        self.lot = Lot.objects.create(name='L-1', product=Product.objects.create(name='Aceite'))
+        self.pallet = self.create_pallet('P-1', self.warehouse, [self.lot])
+        self.pallets_by_lot_url = f'/api/v1/warehouse/warehouses/{self.warehouse.pk}/pallets-by-lot/'
+
+    def revalidate(self, url, etag):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response, queries
+
+    def test_not_modified_skips_queries_and_serialization(self):
+        for url in ('/api/v1/warehouse/products/', f'/api/v1/warehouse/lots/{self.lot.pk}/', self.pallets_by_lot_url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('ETag', response)
+            self.assertNotIn('Last-Modified', response)
+
+            revalidated, queries = self.revalidate(url, response['ETag'])
+            self.assertEqual(revalidated.status_code, 304)
+            self.assertEqual(revalidated['ETag'], response['ETag'])
+            self.assertEqual(revalidated.content, b'')
+            self.assertFalse(any('warehouse_management_lot"' in q['sql'] or 'warehouse_management_product"' in q['sql']
+                                 for q in queries))
+
+    def test_etag_depends_on_url(self):
+        etag = self.client.get('/api/v1/warehouse/products/')['ETag']
+        self.assertNotEqual(self.client.get('/api/v1/warehouse/products/?page=1')['ETag'], etag)
+
+    def test_writes_change_etag(self):
+        url = '/api/v1/warehouse/products/'
+        etag = self.client.get(url)['ETag']
+        self.client.post(url, {'name': 'Harina'})
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 200)
+
+        # Vías que no pasan por los viewsets: queryset.update() y los servicios por lotes.
+        etag = self.client.get(self.pallets_by_lot_url)['ETag']
+        Product.objects.filter(pk=self.lot.product_id).update(name='Aceite de oliva')
+        response = self.revalidate(self.pallets_by_lot_url, etag)[0]
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        mark_pallets_out(Pallet.objects.filter(pk=self.pallet.pk), self.user)
+        self.assertEqual(self.revalidate(self.pallets_by_lot_url, etag)[0].status_code, 200)
+
+    def test_unrelated_writes_keep_etag(self):
+        url = '/api/v1/warehouse/products/'
+        etag = self.client.get(url)['ETag']
+        Warehouse.objects.create(name='Norte')
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 304)
+
+
+class ModelVersionTests(WarehouseAPITestCase):
+
+    def raw_connection(self, autocommit=False):
+        # Conexiones propias: ven sólo lo confirmado, no la transacción del test.
+        raw = connection.get_new_connection(connection.get_connection_params())
+        raw.autocommit = autocommit
+        with raw.cursor() as cursor:
+            cursor.execute(f'SET search_path TO "{self.tenant.schema_name}", public')
+            cursor.execute("SET lock_timeout = '3s'")
+        if not autocommit:
+            raw.commit()
+        self.addCleanup(raw.close)
+        return raw
+
+    def test_create_and_delete_do_not_wait_on_each_other(self):
+        admin = self.raw_connection(autocommit=True)
+        with admin.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO warehouse_management_warehouse (name, create_date) VALUES ('VC-1', now()), ('VC-2', now()) RETURNING id"
+            )
+            central, north = [row[0] for row in cursor.fetchall()]
+            cursor.execute("INSERT INTO warehouse_management_product (name, create_date) VALUES ('VC-P', now()) RETURNING id")
+            product = cursor.fetchone()[0]
+            cursor.execute(
+                "INSERT INTO warehouse_management_lot (name, product_id, create_date) VALUES ('VC-L1', %s, now()), ('VC-L2', %s, now()) RETURNING id",
+                [product, product]
+            )
+            lot, other_lot = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "INSERT INTO warehouse_management_pallet (name, warehouse_id, create_date, is_out, defective) "
+                "VALUES ('VC-OLD', %s, now(), false, false) RETURNING id", [north]
+            )
+            old_pallet = cursor.fetchone()[0]
+            cursor.execute("INSERT INTO warehouse_management_palletlot (pallet_id, lot_id) VALUES (%s, %s)", [old_pallet, other_lot])
+
+        def cleanup():
+            with admin.cursor() as cursor:
+                cursor.execute("DELETE FROM warehouse_management_palletlot WHERE lot_id IN (%s, %s)", [lot, other_lot])
+                cursor.execute("DELETE FROM warehouse_management_pallet WHERE name LIKE 'VC-%%'")
+                cursor.execute("DELETE FROM warehouse_management_warehouselotstock WHERE warehouse_id IN (%s, %s)", [central, north])
+                cursor.execute("DELETE FROM warehouse_management_lot WHERE product_id = %s", [product])
+                cursor.execute("DELETE FROM warehouse_management_product WHERE id = %s", [product])
+                cursor.execute("DELETE FROM warehouse_management_warehouse WHERE id IN (%s, %s)", [central, north])
+                cursor.execute("DELETE FROM warehouse_management_modelversionchange")
+        self.addCleanup(cleanup)
+        before = model_versions([Pallet, PalletLot])
+
+        # Crear un pallet escribe pallet y luego palletlot; borrarlo (Collector), al revés.
+        creating, deleting = self.raw_connection(), self.raw_connection()
+        with creating.cursor() as create, deleting.cursor() as delete:
+            create.execute(
+                "INSERT INTO warehouse_management_pallet (name, warehouse_id, create_date, is_out, defective) "
+                "VALUES ('VC-NEW', %s, now(), false, false) RETURNING id", [central]
+            )
+            new_pallet = create.fetchone()[0]
+            delete.execute("DELETE FROM warehouse_management_palletlot WHERE pallet_id = %s", [old_pallet])
+            create.execute("INSERT INTO warehouse_management_palletlot (pallet_id, lot_id) VALUES (%s, %s)", [new_pallet, lot])
+            delete.execute("DELETE FROM warehouse_management_pallet WHERE id = %s", [old_pallet])
+        creating.commit()
+        deleting.commit()
+
+        after = model_versions([Pallet, PalletLot])
+        for table in (Pallet._meta.db_table, PalletLot._meta.db_table):
+            self.assertEqual(after[table], before[table] + 2)
+
+    def test_compaction_keeps_versions(self):
+        for n in range(3):
+            Product.objects.create(name=f'Producto {n}')
+        table = Product._meta.db_table
+        before = model_versions([Product])
+        self.assertTrue(ModelVersionChange.objects.filter(table_name=table).exists())
+        compact_model_versions([table])
+        self.assertFalse(ModelVersionChange.objects.filter(table_name=table).exists())
+        self.assertEqual(model_versions([Product]), before)
+        Product.objects.create(name='Producto 3')
+        self.assertEqual(model_versions([Product])[table], before[table] + 1)
+
+    def test_archive_command_compacts_unread_tables(self):
+        warehouse = Warehouse.objects.create(name='Central')
+        for n in range(3):
+            Pallet.objects.create(name=f'P-{n}', warehouse=warehouse)
+        tables = [Pallet._meta.db_table, Warehouse._meta.db_table]
+        before = model_versions([Pallet, Warehouse])
+        output = io.StringIO()
+        call_command('archive_action_logs', schema_name=self.tenant.schema_name, stdout=output)
+        self.assertIn('cambios de versión compactados', output.getvalue())
+        self.assertFalse(ModelVersionChange.objects.filter(table_name__in=tables).exists())
+        self.assertEqual(model_versions([Pallet, Warehouse]), before)
+
+    def test_if_modified_since_alone_is_ignored(self):
+        url = '/api/v1/warehouse/products/'
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2100 00:00:00 GMT').status_code, 200)
+
+
+class SparseFieldsetTests(WarehouseAPITestCase):
+    url = '/api/v1/warehouse/pallets/'
+
+    def setUp(self):
+        super().setUp()
+        self.warehouse = Warehouse.objects.create(name='Central', address='Calle 1')
+        product = Product.objects.create(name='Aceite')
+        self.lots = [Lot.objects.create(name=f'L-{n}', product=product) for n in range(2)]
+        now = timezone.now()
+        for n in range(3):
+            self.create_pallet(f'P-{n}', self.warehouse, self.lots, in_date=now, defective=n == 2)
+        self.create_pallet('P-sin-almacen', None, [])
+
+    def test_fields_limit_representation(self):
+        response = self.client.get(self.url, {'fields': 'id,name'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({tuple(sorted(row)) for row in response.json()['results']}, {('id', 'name')})
+
+    def test_expand_nests_relation(self):
+        response = self.client.get(self.url, {'fields': 'name,warehouse', 'expand': 'warehouse'})
+
+        rows = {row['name']: row for row in response.json()['results']}
+        self.assertEqual(rows['P-0']['warehouse']['address'], 'Calle 1')
+        self.assertIsNone(rows['P-sin-almacen']['warehouse'])
+
+    def test_unknown_fields(self):
+        self.assertEqual(self.client.get(self.url, {'fields': 'id,nope'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'expand': 'lots'}).status_code, 400)
+
+    def test_values_path_matches_serializers(self):
+        from rest_framework.renderers import JSONRenderer
+        from .serializers import LotSerializer, PalletSerializer, ProductSerializer
+
+        cases = [
+            ('/api/v1/warehouse/pallets/', PalletSerializer, Pallet.objects.order_by('-create_date', '-id')),
+            ('/api/v1/warehouse/lots/', LotSerializer, Lot.objects.order_by('-create_date')),
+            ('/api/v1/warehouse/products/', ProductSerializer, Product.objects.order_by('-create_date')),
+        ]
+        for url, serializer_class, queryset in cases:
+            expected = json.loads(JSONRenderer().render(serializer_class(queryset, many=True).data))
+            self.assertEqual(self.client.get(url).json()['results'], expected)
+
+        cursor_page = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 2, 'fields': 'name'}).json()
+        self.assertEqual([row['name'] for row in cursor_page['results']], ['P-sin-almacen', 'P-2'])
+        self.assertIsNotNone(cursor_page['next'])
+
+    def test_values_path_query_count_is_constant(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.url)
+        for n in range(3, 10):
+            self.create_pallet(f'P-{n}', self.warehouse, self.lots)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(self.url)
+        self.assertEqual(len(many), len(few))
+
+
+class PalletFilterTests(WarehouseAPITestCase):
+    url = '/api/v1/warehouse/pallets/'
+
+    def setUp(self):
+        super().setUp()
+        self.central = Warehouse.objects.create(name='Central')
+        self.norte = Warehouse.objects.create(name='Norte')
+        self.aceite = Product.objects.create(name='Aceite')
+        self.harina = Product.objects.create(name='Harina')
+        self.lot_aceite = Lot.objects.create(name='L-A', product=self.aceite)
+        self.lot_harina = Lot.objects.create(name='L-H', product=self.harina)
+        now = timezone.now()
+        self.now = now
+        self.create_pallet('P-1', self.central, [self.lot_aceite], in_date=now - timedelta(days=3))
+        self.create_pallet('P-2', self.central, [self.lot_aceite, self.lot_harina], in_date=now - timedelta(days=1),
+                           defective=True)
+        self.create_pallet('P-3', self.norte, [self.lot_harina], in_date=now - timedelta(days=5), is_out=True,
+                           out_date=now - timedelta(days=1))
+
+    def names(self, **params):
+        response = self.client.get(self.url, {'fields': 'name', **params})
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['name'] for row in response.json()['results'])
+
+    def test_filters(self):
+        self.assertEqual(self.names(warehouse=self.central.pk), ['P-1', 'P-2'])
+        self.assertEqual(self.names(lot=self.lot_harina.pk), ['P-2', 'P-3'])
+        self.assertEqual(self.names(product=self.aceite.pk, defective='false'), ['P-1'])
+        self.assertEqual(self.names(is_out='true'), ['P-3'])
+        self.assertEqual(self.names(in_date_after=(self.now - timedelta(days=4)).isoformat(),
+                                    in_date_before=(self.now - timedelta(days=2)).isoformat()), ['P-1'])
+        self.assertEqual(self.names(out_date_after=(self.now - timedelta(days=2)).isoformat()), ['P-3'])
+        # Un pallet con dos lotes del mismo producto no se duplica.
+        self.assertEqual(self.names(product=self.harina.pk), ['P-2', 'P-3'])
+
+    def test_invalid_filter(self):
+        response = self.client.get(self.url, {'warehouse': 'central'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('warehouse', response.json())
+
+    def test_query_count_per_page_is_fixed(self):
+        # expand=warehouse fuerza el camino del serializer; retrieve también lo usa.
+        params = {'expand': 'warehouse'}
+        self.client.get(self.url, params)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.url, params)
+        for n in range(4, 11):
+            self.create_pallet(f'P-{n}', self.norte if n % 2 else self.central, [self.lot_aceite, self.lot_harina])
+        with CaptureQueriesContext(connection) as page:
+            response = self.client.get(self.url, params)
+
+        self.assertEqual(len(response.json()['results']), 10)
+        self.assertEqual(len(page), len(few))
+
+        pallet = Pallet.objects.get(name='P-2')
+        with CaptureQueriesContext(connection) as detail:
+            self.client.get(f'{self.url}{pallet.pk}/')
+        self.assertLessEqual(len(detail), len(page))
+
+
+class NameLookupTests(WarehouseAPITestCase):
+    url = '/api/v1/warehouse/pallets/'
+
+    def setUp(self):
+        super().setUp()
+        self.central = Warehouse.objects.create(name='Central')
+        self.norte = Warehouse.objects.create(name='Norte')
+        aceite = Product.objects.create(name='Aceite')
+        self.lot_a = Lot.objects.create(name='L-A', product=aceite)
+        self.lot_b = Lot.objects.create(name='L-B', product=aceite)
+        self.create_pallet('PAL-001', self.central, [self.lot_a, self.lot_b])
+        self.create_pallet('PAL-002', self.central, [])
+        self.create_pallet('PAL-013', self.norte, [self.lot_b])
+
+    def pallet_queries(self, queries):
+        return [query['sql'] for query in queries.captured_queries if 'warehouse_management_pallet' in query['sql']]
+
+    def by_name(self, name):
+        return self.client.get(f'{self.url}by-name/', {'name': name})
+
+    def test_by_name_matches_detail_in_one_query(self):
+        pallet = Pallet.objects.get(name='PAL-001')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.by_name('PAL-001')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.pallet_queries(queries)), 1)
+        self.assertEqual(response.json(), self.client.get(f'{self.url}{pallet.pk}/').json())
+        self.assertEqual([detail['lot_name'] for detail in response.json()['pallet_lots_details']], ['L-A', 'L-B'])
+
+        # La segunda vez sale de la caché.
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.by_name('PAL-001')
+        self.assertEqual(self.pallet_queries(queries), [])
+        self.assertEqual(cached.json(), response.json())
+
+        self.assertEqual(self.by_name('PAL-002').json()['pallet_lots_details'], [])
+        self.assertEqual(self.by_name('NO-EXISTE').status_code, 404)
+        self.assertEqual(self.client.get(f'{self.url}by-name/').status_code, 400)
+
+    def test_batch_lookup(self):
+        self.by_name('PAL-013')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                f'{self.url}lookup/', {'names': ['PAL-002', 'NO-EXISTE', 'PAL-001', 'PAL-002', 'PAL-013']}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([item['name'] for item in body['results']], ['PAL-002', 'PAL-001', 'PAL-013'])
+        self.assertEqual(body['missing'], ['NO-EXISTE'])
+        # PAL-013 ya estaba en caché; el resto, en una sola consulta.
+        self.assertEqual(len(self.pallet_queries(queries)), 1)
+
+        self.assertEqual(self.client.post(f'{self.url}lookup/', {'names': []}, content_type='application/json').status_code, 400)
+
+    def test_writes_invalidate_cached_names(self):
+        pallet = Pallet.objects.get(name='PAL-001')
+        self.by_name('PAL-001')
+
+        self.client.post(f'{self.url}mark-out/', {'ids': [pallet.pk]}, content_type='application/json')
+        self.assertTrue(self.by_name('PAL-001').json()['is_out'])
+
+        self.client.patch(f'{self.url}{pallet.pk}/', {'lots_ids': [self.lot_a.pk]}, content_type='application/json')
+        self.assertEqual([d['lot_name'] for d in self.by_name('PAL-001').json()['pallet_lots_details']], ['L-A'])
+
+        self.client.patch(f'/api/v1/warehouse/lots/{self.lot_a.pk}/', {'name': 'L-A2'}, content_type='application/json')
+        self.assertEqual([d['lot_name'] for d in self.by_name('PAL-001').json()['pallet_lots_details']], ['L-A2'])
+
+        self.client.patch(f'{self.url}{pallet.pk}/', {'name': 'PAL-100'}, content_type='application/json')
+        self.assertEqual(self.by_name('PAL-001').status_code, 404)
+        self.assertEqual(self.by_name('PAL-100').json()['id'], pallet.pk)
+
+    def test_renaming_a_loaded_pallet_reads_nothing_back(self):
+        self.by_name('PAL-001')
+        pallet = Pallet.objects.get(name='PAL-001')
+        pallet.name = 'PAL-101'
+        with CaptureQueriesContext(connection) as queries:
+            pallet.save()
+        self.assertFalse(any(sql.startswith('SELECT') for sql in self.pallet_queries(queries)))
+        self.assertEqual(self.by_name('PAL-001').status_code, 404)
+
+        # Sin valores leídos (pallet construido con su pk), se consultan una vez.
+        with CaptureQueriesContext(connection) as queries:
+            Pallet(pk=pallet.pk, name='PAL-001', warehouse=self.central).save()
+        self.assertEqual(len([sql for sql in self.pallet_queries(queries) if sql.startswith('SELECT')]), 1)
+        self.assertEqual(self.by_name('PAL-101').status_code, 404)
+        self.assertEqual(self.by_name('PAL-001').json()['id'], pallet.pk)
+
+    def test_search(self):
+        def names(**params):
+            response = self.client.get(f'{self.url}search/', params)
+            self.assertEqual(response.status_code, 200)
+            return [item['name'] for item in response.json()['results']]
+
+        self.assertEqual(names(q='PAL-0'), ['PAL-001', 'PAL-002', 'PAL-013'])
+        self.assertEqual(names(q='PAL-0', limit=2), ['PAL-001', 'PAL-002'])
+        self.assertEqual(names(q='13', mode='contains'), ['PAL-013'])
+        # Con los filtros del list.
+        self.assertEqual(names(q='PAL', warehouse=self.central.pk), ['PAL-001', 'PAL-002'])
+        self.assertEqual(self.client.get(f'{self.url}search/', {'q': 'PAL', 'mode': 'regex'}).status_code, 400)
+
+        similar = self.client.get(f'{self.url}search/', {'q': 'pal-0013', 'mode': 'similar'})
+        if has_trigram_extension():
+            self.assertEqual(similar.json()['results'][0]['name'], 'PAL-013')
+        else:
+            self.assertEqual(similar.status_code, 400)
+
+    def test_lot_lookup(self):
+        response = self.client.get('/api/v1/warehouse/lots/by-name/', {'name': 'L-B'})
+        self.assertEqual(response.json(), self.client.get(f'/api/v1/warehouse/lots/{self.lot_b.pk}/').json())
+        body = self.client.post('/api/v1/warehouse/lots/lookup/', {'names': ['L-A', 'L-Z']}, content_type='application/json').json()
+        self.assertEqual([item['name'] for item in body['results']], ['L-A'])
+        self.assertEqual(body['missing'], ['L-Z'])
+        results = self.client.get('/api/v1/warehouse/lots/search/', {'q': 'L-'}).json()['results']
+        self.assertEqual([item['name'] for item in results], ['L-A', 'L-B'])
+
+
+class SyntheticDataBenchmarkTests(WarehouseAPITestCase):
+
+    def generate(self, **options):
+        out = io.StringIO()
+        call_command('generate_synthetic_data', schema=self.tenant.schema_name, seed=7, json=True, stdout=out, **options)
+        return json.loads(out.getvalue())
+
+    def test_generate_and_continue_numbering(self):
+        created = self.generate(products=2, lots_per_product=3, warehouses=2, pallets=250, action_logs=100, batch_size=100)
+        self.assertEqual(
+            {name: created[name] for name in ('products', 'lots', 'warehouses', 'pallets', 'action_logs')},
+            {'products': 2, 'lots': 6, 'warehouses': 2, 'pallets': 250, 'action_logs': 100}
+        )
+        self.assertEqual(PalletLot.objects.count(), created['pallet_lots'])
+        self.assertFalse(Pallet.objects.filter(palletlot__isnull=True).exists())
+        self.assertEqual(ActionLog.objects.filter(object_repr__startswith='SYN-PAL-').count(), 100)
+        # Los triggers mantienen el stock también con bulk_create.
+        self.assertEqual(stock_drift(), {})
+
+        self.generate(pallets=10)
+        self.assertEqual(Pallet.objects.order_by('-name').values_list('name', flat=True).first(), 'SYN-PAL-00000260')
+
+        with self.assertRaises(CommandError):
+            call_command('generate_synthetic_data', schema='public', products=1, stdout=io.StringIO())
+
+    def test_benchmark_report(self):
+        self.generate(products=1, lots_per_product=2, warehouses=1, pallets=30, action_logs=10)
+        pallet = Pallet.objects.order_by('-pk').first()
+        out = io.StringIO()
+        call_command(
+            'benchmark_endpoints', schema=self.tenant.schema_name, repeat=2, warmup=0, json=True, stdout=out,
+            only='warehouses.pallets_by_lot,pallets.by_name,pallets.destroy'
+        )
+        report = json.loads(out.getvalue())
+        connection.set_tenant(self.tenant)
+
+        self.assertEqual(report['dataset']['pallets'], 30)
+        results = {result['name']: result for result in report['results']}
+        self.assertEqual(set(results), {'warehouses.pallets_by_lot', 'pallets.by_name', 'pallets.destroy'})
+        for result in results.values():
+            self.assertLess(result['status'], 300)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            self.assertIn('queries', result)
+            self.assertGreater(result['peak_memory_kb'], 0)
+        # Las escrituras se deshacen.
+        self.assertTrue(Pallet.objects.filter(pk=pallet.pk).exists())
+
+
+class RequestMetricsTests(WarehouseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        reset_metrics()
+        self.addCleanup(reset_metrics)
+        warehouse = Warehouse.objects.create(name='Central')
+        lot = Lot.objects.create(name='L1', product=Product.objects.create(name='Aceite'))
+        self.create_pallet('P1', warehouse, [lot])
+
+    def get_public_metrics(self, **headers):
+        # Como lo vería Prometheus en el dominio público (el middleware fija el schema público).
+        connection.set_schema_to_public()
+        try:
+            return metrics_view(RequestFactory().get('/metrics/', **headers))
+        finally:
+            connection.set_tenant(self.tenant)
+
+    def test_server_timing_and_histograms(self):
+        response = self.client.get('/api/v1/warehouse/pallets/')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'serialize;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+        self.assertRegex(timing, r'desc="[1-9]\d* queries"')
+
+        samples = REQUEST_DB_QUERIES.samples()
+        self.assertIn((self.tenant.schema_name, 'pallet-list'), samples)
+        _, total, count = samples[(self.tenant.schema_name, 'pallet-list')]
+        self.assertEqual(count, 1)
+        self.assertGreater(total, 0)
+
+        with override_settings(REQUEST_METRICS={'TOKEN': 'secreto'}):
+            text = self.get_public_metrics(HTTP_AUTHORIZATION='Bearer secreto').content.decode()
+        self.assertIn(
+            f'jar_http_request_duration_seconds_count{{schema="{self.tenant.schema_name}",view="pallet-list",method="GET",status="2xx"}} 1',
+            text
+        )
+        self.assertIn('jar_process_info{pid=', text)
+        # El propio endpoint de métricas no se mide.
+        self.assertNotIn('view="metrics"', render_metrics())
+
+    def test_pallets_by_lot_times_serialization_without_pagination(self):
+        from . import views
+        url = f'/api/v1/warehouse/warehouses/{Warehouse.objects.get(name="Central").pk}/pallets-by-lot/'
+        for pagination_class in (views.WarehouseViewSet.pagination_class, None):
+            with mock.patch.object(views.WarehouseViewSet, 'pagination_class', pagination_class), \
+                    mock.patch.object(views, 'timing_serialization', wraps=views.timing_serialization) as timing:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(timing.call_count, 1)
+
+    def test_metrics_token_and_disabled(self):
+        # Sin token configurado no se sirven.
+        with self.assertRaises(Http404):
+            self.get_public_metrics()
+
+        config = {'ENABLED': True, 'SERVER_TIMING': False, 'TOKEN': 'secreto'}
+        with override_settings(REQUEST_METRICS=config):
+            self.assertEqual(self.get_public_metrics().status_code, 403)
+            self.assertEqual(self.get_public_metrics(HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+            response = self.get_public_metrics(HTTP_AUTHORIZATION='Bearer secreto')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['Content-Type'].startswith('text/plain'))
+            # En el dominio de un tenant no existen, ni siquiera con el token.
+            self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secreto').status_code, 404)
+            self.assertNotIn('Server-Timing', self.client.get('/api/v1/warehouse/pallets/'))
+
+        reset_metrics()
+        with override_settings(REQUEST_METRICS={'ENABLED': False}):
+            response = self.client.get('/api/v1/warehouse/pallets/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(REQUEST_DB_QUERIES.samples(), {})
+
+
+class ActionLogArchiveTests(WarehouseAPITestCase):
+    url = '/api/v1/warehouse/action-logs/'
+
+    def setUp(self):
+        super().setUp()
+        self.lot = Lot.objects.create(name='L1', product=Product.objects.create(name='Aceite'))
+        content_type = ContentType.objects.get_for_model(Lot)
+        now = timezone.now()
+        self.logs = ActionLog.objects.bulk_create([
+            ActionLog(
+                user=self.user, action_type='UPDATE', timestamp=now - timedelta(days=days),
+                content_type=content_type, object_id=self.lot.pk, object_repr=str(self.lot)
+            )
+            for days in (400, 300, 200, 10, 1)
+        ])
+        self.object_params = f'content_type={content_type.pk}&object_id={self.lot.pk}'
+
+    def archive(self, **options):
+        out = io.StringIO()
+        call_command('archive_action_logs', schema_name=self.tenant.schema_name, stdout=out, **options)
+        return out.getvalue()
+
+    def test_archive_in_chunks_and_read_transparently(self):
+        output = self.archive(older_than_days=180, dry_run=True)
+        self.assertIn('3 entradas anteriores', output)
+        self.assertEqual(ActionLogArchive.objects.count(), 0)
+
+        self.archive(older_than_days=180, chunk_size=2)
+        archived_ids = sorted(log.pk for log in self.logs[:3])
+        self.assertEqual(sorted(ActionLogArchive.objects.values_list('id', flat=True)), archived_ids)
+        self.assertEqual(ActionLog.objects.count(), 2)
+
+        # Sin rango, sólo la tabla caliente.
+        self.assertEqual(len(self.client.get(self.url).json()['results']), 2)
+        # Un rango que llega a fechas archivadas, o el historial de un objeto, lee ambas.
+        after = (timezone.now() - timedelta(days=350)).isoformat()
+        response = self.client.get(self.url, {'timestamp_after': after})
+        self.assertEqual([r['id'] for r in response.json()['results']], [log.pk for log in reversed(self.logs[1:])])
+        response = self.client.get(f'{self.url}?{self.object_params}&pagination=cursor&page_size=2')
+        first = response.json()
+        self.assertEqual([r['id'] for r in first['results']], [self.logs[4].pk, self.logs[3].pk])
+        second = self.client.get(first['next']).json()
+        rest = second['results'] + self.client.get(second['next']).json()['results']
+        self.assertEqual([r['id'] for r in rest], [log.pk for log in reversed(self.logs[:3])])
+        self.assertEqual(len(self.client.get(f'{self.url}?{self.object_params}&archive=false').json()['results']), 2)
+
+        detail = self.client.get(f'{self.url}{self.logs[0].pk}/')
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.json()['affected_object_str'], str(self.lot))
+
+    def test_id_already_archived_keeps_the_hot_row(self):
+        oldest = self.logs[0]
+        ActionLogArchive.objects.create(
+            id=oldest.pk, action_type='CREATE', timestamp=oldest.timestamp, object_repr='copia anterior'
+        )
+        with self.assertRaises(CommandError), transaction.atomic():
+            self.archive(older_than_days=180)
+        # La tanda entera se deshace: nada se borra de la tabla caliente.
+        self.assertEqual(ActionLog.objects.count(), 5)
+        self.assertEqual(list(ActionLogArchive.objects.values_list('object_repr', flat=True)), ['copia anterior'])
+
+    def test_nothing_to_archive_and_invalid_options(self):
+        self.assertIn('0 entradas archivadas', self.archive(older_than_days=1000))
+        self.assertEqual(self.client.get(self.url, {'timestamp_after': 'ayer'}).status_code, 400)
+        with self.assertRaises(CommandError):
+            self.archive(older_than_days=10, before='2020-01-01T00:00:00Z')
+
+
+class ThroughputTests(WarehouseAPITestCase):
+    url = '/api/v1/warehouse/analytics/throughput/'
+
+    def setUp(self):
+        super().setUp()
+        self.central = Warehouse.objects.create(name='Central')
+        self.north = Warehouse.objects.create(name='Norte')
+        product = Product.objects.create(name='Aceite')
+        self.lot = Lot.objects.create(name='L-1', product=product)
+        self.other_lot = Lot.objects.create(name='L-2', product=product)
+        self.today = timezone.localdate()
+
+    def at(self, days_ago, hour=12):
+        return timezone.make_aware(datetime.combine(self.today - timedelta(days=days_ago), time(hour)))
+
+    def test_daily_series_by_warehouse(self):
+        self.create_pallet('P-1', self.central, [self.lot], in_date=self.at(3), out_date=self.at(1), is_out=True)
+        self.create_pallet('P-2', self.central, [self.lot, self.other_lot], in_date=self.at(3), defective=True)
+        self.create_pallet('P-3', self.north, [self.lot], in_date=self.at(2))
+        self.create_pallet('P-4', self.north, [self.lot], in_date=self.at(0))
+
+        response = self.client.get(self.url, {
+            'group_by': 'warehouse', 'since': (self.today - timedelta(days=3)).isoformat(),
+            'until': (self.today + timedelta(days=1)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['periods']), 4)
+        self.assertEqual(data['closed'], 3)
+        series = {row['name']: row for row in data['series']}
+        self.assertEqual(series['Central']['pallets_in'], [2, 0, 0, 0])
+        self.assertEqual(series['Central']['pallets_out'], [0, 0, 1, 0])
+        self.assertEqual(series['Central']['defect_rate'], [0.5, None, None, None])
+        self.assertEqual(series['Norte']['pallets_in'], [0, 1, 0, 1])
+
+        # Por producto se cuenta cada pallet una vez aunque tenga dos lotes suyos.
+        weekly = throughput('week', self.today - timedelta(days=3), self.today + timedelta(days=1), group_by='product')
+        self.assertEqual(sum(weekly['series'][0]['pallets_in']), 4)
+        self.assertEqual(self.client.get(self.url, {'period': 'month'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'since': '2020-01-01', 'until': '2026-01-01'}).status_code, 400)
+
+    def test_closed_periods_are_cached_until_a_write_changes_them(self):
+        self.create_pallet('P-1', self.central, [self.lot], in_date=self.at(5))
+        since, until = self.today - timedelta(days=6), self.today
+        self.assertEqual(throughput('day', since, until)['series'][0]['pallets_in'], [0, 1, 0, 0, 0, 0])
+
+        def selects(queries):
+            return [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+
+        with CaptureQueriesContext(connection) as queries:
+            throughput('day', since, until)
+        self.assertEqual(selects(queries), [])
+        # Con el periodo en curso, sólo se recalcula éste.
+        with CaptureQueriesContext(connection) as queries:
+            throughput('day', since, self.today + timedelta(days=1))
+        self.assertEqual(len(selects(queries)), 2)
+        self.assertTrue(all(str(self.today) in sql for sql in selects(queries)))
+
+        # Un pallet con fecha atrasada invalida los periodos cerrados.
+        self.create_pallet('P-2', self.north, [self.lot], in_date=self.at(4))
+        self.assertEqual(throughput('day', since, until)['series'][0]['pallets_in'], [0, 1, 1, 0, 0, 0])
+        mark_pallets_out(Pallet.objects.filter(name='P-2'), self.user, out_date=self.at(2))
+        self.assertEqual(throughput('day', since, until)['series'][0]['pallets_out'], [0, 0, 0, 0, 1, 0])
+
+    def test_saves_that_leave_closed_periods_alone_keep_the_cache(self):
+        pallet = self.create_pallet('P-1', self.central, [self.lot], in_date=self.at(3))
+        since, until = self.today - timedelta(days=4), self.today
+
+        def selects():
+            with CaptureQueriesContext(connection) as queries:
+                throughput('day', since, until)
+            return [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+
+        selects()
+        url = f'/api/v1/warehouse/pallets/{pallet.pk}/'
+        # Salir hoy, o renombrarlo, no toca ningún día cerrado.
+        self.client.patch(url, {'is_out': True, 'out_date': timezone.now().isoformat()}, content_type='application/json')
+        self.assertEqual(selects(), [])
+        self.client.patch(url, {'name': 'P-1b'}, content_type='application/json')
+        self.assertEqual(selects(), [])
+        # Un defecto sí: cuenta en su día de entrada, ya cerrado.
+        self.client.patch(url, {'defective': True}, content_type='application/json')
+        self.assertNotEqual(selects(), [])
+        self.assertEqual(throughput('day', since, until)['series'][0]['defect_rate'], [None, 1.0, None, None])
+
+    def test_linking_lots_does_not_read_the_pallet(self):
+        pallet = self.create_pallet('P-1', self.central, [], in_date=self.at(3))
+        since, until = self.today - timedelta(days=4), self.today
+        throughput('day', since, until, group_by='lot')
+        with CaptureQueriesContext(connection) as queries:
+            pallet.palletlot_set.create(lot=self.lot)
+            pallet.palletlot_set.create(lot=self.other_lot)
+        self.assertFalse(any(
+            query['sql'].startswith('SELECT') and 'warehouse_management_pallet"' in query['sql']
+            for query in queries.captured_queries
+        ))
+        by_lot = {row['name']: row['pallets_in'] for row in throughput('day', since, until, group_by='lot')['series']}
+        self.assertEqual(by_lot, {'L-1': [0, 1, 0, 0], 'L-2': [0, 1, 0, 0]})
+
+    def test_deleting_a_lot_invalidates_once(self):
+        small, large = (Lot.objects.create(name=name, product=self.lot.product) for name in ('L-S', 'L-G'))
+        self.create_pallet('P-S', self.central, [small], in_date=self.at(3))
+        for number in range(5):
+            self.create_pallet(f'P-G{number}', self.central, [large], in_date=self.at(3))
+        since, until = self.today - timedelta(days=4), self.today
+        by_lot = {row['name']: row['pallets_in'] for row in throughput('day', since, until, group_by='lot')['series']}
+        self.assertEqual(by_lot, {'L-S': [0, 1, 0, 0], 'L-G': [0, 5, 0, 0]})
+
+        # Los PalletLot se borran de una vez, sin consultas por fila.
+        counts = []
+        for lot in (small, large):
+            with CaptureQueriesContext(connection) as queries:
+                lot.delete()
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(throughput('day', since, until, group_by='lot')['series'], [])
+
+    def test_regrouping_writes_invalidate_closed_periods(self):
+        self.create_pallet('P-1', self.central, [self.lot], in_date=self.at(3))
+        since, until = self.today - timedelta(days=4), self.today
+
+        def names(group_by):
+            return [row['name'] for row in throughput('day', since, until, group_by=group_by)['series']]
+
+        self.assertEqual(names('product'), ['Aceite'])
+        self.lot.product = Product.objects.create(name='Vinagre')
+        self.lot.save()
+        self.assertEqual(names('product'), ['Vinagre'])
+
+        self.assertEqual(names('warehouse'), ['Central'])
+        self.central.delete()
+        self.assertEqual(names('warehouse'), [None])
+
+
+class AsyncReadTests(WarehouseAPITestCase):
+    live = '/api/v1/warehouse/live'
+
+    def setUp(self):
+        super().setUp()
+        self.warehouse = Warehouse.objects.create(name='Central')
+        self.other_warehouse = Warehouse.objects.create(name='Norte')
+        product = Product.objects.create(name='Aceite')
+        # Más lotes que PAGE_SIZE, para comparar también la segunda página.
+        for index in range(12):
+            lot = Lot.objects.create(name=f'L-{index:03d}', product=product)
+            self.create_pallet(f'P-{index}-a', self.warehouse, [lot])
+            self.create_pallet(f'P-{index}-b', self.warehouse, [lot], defective=index % 3 == 0)
+            self.create_pallet(f'P-{index}-c', self.other_warehouse, [lot])
+        self.create_pallet('P-out', self.warehouse, [lot], is_out=True, out_date=timezone.now())
+        self.token = Token.objects.get(user=self.user)
+
+    def test_same_json_as_drf_views(self):
+        for kind in ('stock', 'pallets-by-lot'):
+            for page in (1, 2):
+                expected = self.client.get(f'/api/v1/warehouse/warehouses/{self.warehouse.pk}/{kind}/', {'page': page}).json()
+                response = self.client.get(f'{self.live}/warehouses/{self.warehouse.pk}/{kind}/', {'page': page})
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                self.assertEqual((data['count'], data['results']), (expected['count'], expected['results']))
+                self.assertEqual(data['next'] is None, expected['next'] is None)
+                self.assertEqual(data['previous'] is None, expected['previous'] is None)
+
+        url = f'{self.live}/warehouses/{self.warehouse.pk}/pallets-by-lot/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.create_pallet('P-new', self.warehouse, [Lot.objects.first()])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.assertEqual(self.client.get(url, {'page': 3}).status_code, 404)
+        self.assertEqual(self.client.get(f'{self.live}/warehouses/0/stock/').status_code, 404)
+        self.assertEqual(self.client.post(url).status_code, 405)
+
+    def test_authentication_and_membership(self):
+        url = f'{self.live}/warehouses/{self.warehouse.pk}/stock/'
+        response = TenantClient(self.tenant).get(url)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        self.assertEqual(TenantClient(self.tenant, HTTP_AUTHORIZATION='Token nope').get(url).status_code, 401)
+
+        outsider = User.objects.create_user(username='ajeno')
+        outsider_token = Token.objects.create(user=outsider)
+        response = TenantClient(self.tenant, HTTP_AUTHORIZATION=f'Token {outsider_token.key}').get(url)
+        self.assertEqual(response.status_code, 403)
+
+    def test_action_log_tail(self):
+        url = f'{self.live}/action-logs/tail/'
+        for n in range(3):
+            self.client.post('/api/v1/warehouse/warehouses/', {'name': f'W-{n}'}, content_type='application/json')
+        ids = list(ActionLog.objects.order_by('id').values_list('id', flat=True))
+
+        data = self.client.get(url, {'limit': 2}).json()
+        self.assertEqual([entry['id'] for entry in data['results']], ids[-2:])
+        self.assertEqual(data['last_id'], ids[-1])
+        self.assertEqual(data['results'][-1]['affected_object_str'], 'W-2')
+        self.assertEqual(data['results'][-1]['user']['username'], 'operario')
+
+        data = self.client.get(url, {'after': ids[0] - 1, 'limit': 2}).json()
+        self.assertEqual([entry['id'] for entry in data['results']], ids[:2])
+        self.assertTrue(data['has_more'])
+        data = self.client.get(url, {'after': data['last_id'], 'limit': 2}).json()
+        self.assertEqual([entry['id'] for entry in data['results']], ids[2:])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(self.client.get(url, {'after': ids[-1]}).json(), {'results': [], 'last_id': ids[-1], 'has_more': False})
+        self.assertEqual(self.client.get(url, {'limit': 1000}).status_code, 400)
+
+    async def test_asgi_request_cycle(self):
+        # Por el handler ASGI: middlewares async (tenant, métricas, búfer de
+        # ActionLog) y vista async. request() en lugar de get(): get() añade
+        # siempre el host testserver.
+        client = AsyncClient()
+        headers = [(b'host', self.domain.domain.encode()), (b'authorization', f'Token {self.token.key}'.encode())]
+        for path in (f'{self.live}/warehouses/{self.warehouse.pk}/stock/', f'/api/v1/warehouse/warehouses/{self.warehouse.pk}/stock/'):
+            response = await client.request(path=path, query_string='', headers=list(headers))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['count'], 12)
+            self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
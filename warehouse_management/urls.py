@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     ProductViewSet, LotViewSet, WarehouseViewSet,
-    PalletViewSet, ActionLogViewSet
+    PalletViewSet, ActionLogViewSet, AnalyticsViewSet
 )
 
 router = DefaultRouter()
@@ -11,7 +12,16 @@ router.register(r'lots', LotViewSet, basename='lot')
 router.register(r'warehouses', WarehouseViewSet, basename='warehouse')
 router.register(r'pallets', PalletViewSet, basename='pallet')
 router.register(r'action-logs', ActionLogViewSet, basename='actionlog')
+router.register(r'analytics', AnalyticsViewSet, basename='analytics')
+
+# Lecturas async para paneles que sondean (ver async_views.py).
+live_urlpatterns = [
+    path('warehouses/<int:pk>/stock/', async_views.warehouse_stock, name='live-warehouse-stock'),
+    path('warehouses/<int:pk>/pallets-by-lot/', async_views.pallets_by_lot, name='live-warehouse-pallets-by-lot'),
+    path('action-logs/tail/', async_views.action_log_tail, name='live-actionlog-tail'),
+]
 
 urlpatterns = [
+    path('live/', include(live_urlpatterns)),
     path('', include(router.urls)),
 ]
\ No newline at end of file
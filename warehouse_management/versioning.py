@@ -0,0 +1,131 @@
+# warehouse_management/versioning.py
+"""
+Validadores para GET condicionales (ETag) a partir de las versiones por
+tabla de ModelVersion y ModelVersionChange, que mantienen triggers
+(migraciones 0006 y 0012).
+
+Cada transacción que escribe una tabla cuenta sus sentencias en su propia
+fila de ModelVersionChange, visible cuando se confirma, así que la versión
+de una tabla (la base de ModelVersion más la suma de esas filas, leídas en
+una sola consulta) cambia con cada commit visible: dos lecturas con la
+misma versión ven los mismos datos. Las versiones se leen
+antes que los datos: si una escritura se confirma entre medias, la
+respuesta lleva la ETag anterior con datos nuevos y la siguiente petición
+simplemente no coincide. Nunca se da un 304 con datos viejos. No se envía
+Last-Modified: su resolución de segundos no distingue dos escrituras del
+mismo segundo.
+
+Las filas de ModelVersionChange se compactan en ModelVersion al leer una
+tabla con más de COMPACT_AFTER pendientes y, para las tablas que se
+escriben sin leerse nunca por aquí, en el mantenimiento periódico
+(compact_pending_model_versions, desde el comando archive_action_logs).
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from .models import ModelVersion, ModelVersionChange
+
+# Sentencias pendientes a partir de las cuales una lectura compacta la tabla.
+COMPACT_AFTER = 1000
+
+
+def model_versions(models):
+    """``{tabla: versión}`` de ``models``, en una consulta (una sola instantánea)."""
+    tables = [model._meta.db_table for model in models]
+    pending = ModelVersionChange.objects.filter(table_name=OuterRef('table_name')).order_by().values(
+        'table_name'
+    ).annotate(total=Sum('statements')).values('total')
+    rows = list(ModelVersion.objects.filter(table_name__in=tables).annotate(
+        pending=Coalesce(Subquery(pending), 0)
+    ).values_list('table_name', 'version', 'pending'))
+    missing = set(tables) - {table for table, _, _ in rows}
+    if missing:
+        # Sin fila base, las filas pendientes de la tabla no se leerían.
+        ModelVersion.objects.bulk_create([ModelVersion(table_name=table) for table in missing], ignore_conflicts=True)
+        return model_versions(models)
+    crowded = [table for table, _, count in rows if count > COMPACT_AFTER]
+    if crowded and not connection.in_atomic_block:
+        compact_model_versions(crowded)
+    return {table: version + count for table, version, count in rows}
+
+
+def compact_model_versions(tables):
+    """
+    Suma a ModelVersion las filas confirmadas de ModelVersionChange de
+    ``tables`` y las borra, sin cambiar ninguna versión. Una sentencia por
+    tabla: fuera de una transacción, cada una bloquea sólo su fila base.
+    """
+    quote = connection.ops.quote_name
+    changes, versions = quote(ModelVersionChange._meta.db_table), quote(ModelVersion._meta.db_table)
+    sql = f"""
+        WITH moved AS (DELETE FROM {changes} WHERE table_name = %s RETURNING statements)
+        UPDATE {versions} SET version = version + (SELECT coalesce(sum(statements), 0) FROM moved)
+        WHERE table_name = %s
+    """
+    with connection.cursor() as cursor:
+        for table in sorted(tables):
+            cursor.execute(sql, [table, table])
+
+
+def compact_pending_model_versions():
+    """
+    Compacta (compact_model_versions) todas las tablas del schema actual con
+    filas pendientes. Devuelve cuántas filas había.
+    """
+    pending = dict(ModelVersionChange.objects.order_by().values_list('table_name').annotate(rows=Count('id')))
+    if pending:
+        compact_model_versions(pending)
+    return sum(pending.values())
+
+
+def conditional_validators(request, models):
+    """
+    ETag fuerte de la respuesta a ``request`` si depende sólo de ``models``.
+    Incluye schema, host, ruta con parámetros y formato, porque todos
+    cambian el cuerpo.
+    """
+    versions = model_versions(models)
+    # Las vistas async (async_views.py) no pasan por la negociación de DRF: siempre JSON.
+    media_type = getattr(request, 'accepted_media_type', 'application/json')
+    parts = [connection.schema_name, request.get_host(), request.get_full_path(), media_type]
+    parts += [f"{table}:{versions.get(table, 0)}" for table in sorted(m._meta.db_table for m in models)]
+    return quote_etag(hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest())
+
+
+def conditional_get(request, models, handler, *args, **kwargs):
+    """
+    Responde 304 si el cliente ya tiene la versión actual (If-None-Match),
+    sin llamar a ``handler``; si no, devuelve la respuesta de ``handler``
+    con ETag.
+    """
+    etag = conditional_validators(request, models)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = handler(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+    return _add_validators(response, etag)
+
+
+async def aconditional_get(request, models, handler, *args, **kwargs):
+    """conditional_get para vistas async: ``handler`` es una corrutina."""
+    etag = await sync_to_async(conditional_validators)(request, models)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = await handler(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+    return _add_validators(response, etag)
+
+
+def _add_validators(response, etag):
+    response['ETag'] = etag
+    # El cliente puede guardarla, pero debe revalidar en cada uso.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -4,173 +4,493 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
-from django.contrib.contenttypes.models import ContentType
-from django.db.models import Prefetch
-from .models import Product, Lot, Warehouse, Pallet, PalletLot, ActionLog
+from django.db import IntegrityError
+from collections import defaultdict
+
+from django.db.models import Count, F, Prefetch, Q
+from .analytics import throughput
+from .audit import make_action_log, record_action, record_entries
+from .exports import (
+    EXPORT_FORMATS, PALLET_EXPORT_FIELDS, ACTION_LOG_EXPORT_FIELDS,
+    export_response, pallet_export_rows, action_log_export_rows
+)
+from .filters import ActionLogFilterBackend, PalletFilterBackend
+from .lookup import has_trigram_extension, lookup_by_names, search_by_name
+from .metrics import timing_serialization
+from .models import Product, Lot, Warehouse, Pallet, PalletLot, ActionLog, ActionLogHistory, WarehouseLotStock
+from .pagination import ActionLogPagination, PalletPagination
 from .permissions import IsMemberOfCurrentTenant
 from .serializers import (
     ProductSerializer, LotSerializer, WarehouseSerializer,
-    PalletSerializer, PalletLotSerializer, ActionLogSerializer,
-    LotWithPalletsInWarehouseSerializer
+    PalletSerializer, PalletLotSerializer, ActionLogSerializer, StockAsOfSerializer, ThroughputQuerySerializer,
+    LotWithPalletsInWarehouseSerializer, WarehouseLotStockSerializer, PalletBulkItemSerializer,
+    PalletSelectionSerializer, PalletMarkOutSerializer, PalletTransferSerializer, NameBatchSerializer, NameSearchSerializer,
+    parse_field_list, value_converter
+)
+from .services import (
+    bulk_create_pallets, validate_pallet_batch,
+    filter_pallets, mark_pallets_out, mark_pallets_defective, transfer_pallets
 )
+from .stock import stock_as_of
+from .versioning import conditional_get
+
+class ActionLogMixin:
+    """
+    Registra en ActionLog las operaciones del viewset (ver audit.record_entries).
+    La baja es común a todos; ``log_label`` es el nombre del modelo en su
+    descripción ("Producto", "Lote"...).
+    """
+    log_label = None
+
+    def log_action(self, action_type, instance, description):
+        record_action(self.request.user, action_type, instance, description)
+
+    def perform_destroy(self, instance):
+        # La entrada se construye antes de borrar, mientras el objeto aún tiene pk.
+        entry = make_action_log(
+            self.request.user, 'DELETE', instance,
+            f"{self.log_label} '{instance.name}' (ID: {instance.pk}) eliminado."
+        )
+        instance.delete()
+        record_entries([entry])
+
+class ExportMixin:
+    """
+    Acción ``export/`` que descarga el listado completo, con los mismos
+    filtros que el list, como CSV o NDJSON (``?export_format=``) en streaming.
+    """
+    export_fields = None
+    export_basename = None
+
+    def get_export_rows(self, queryset):
+        raise NotImplementedError
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'detail': f"Formato no soportado. Opciones: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        rows = self.get_export_rows(self.filter_queryset(self.get_queryset()).prefetch_related(None))
+        return export_response(rows, self.export_fields, export_format, self.export_basename)
+
+class ConditionalGetMixin:
+    """
+    GET condicional en list y retrieve (ver versioning.conditional_get):
+    ETag según las versiones de ``conditional_models``, los modelos de los
+    que depende la respuesta, y 304 antes de consultar o serializar nada si
+    el cliente ya la tiene.
+    """
+    conditional_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return conditional_get(request, self.conditional_models, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_get(request, self.conditional_models, super().retrieve, *args, **kwargs)
+
+class SparseFieldsetMixin:
+    """
+    ``?fields=id,name`` y ``?expand=relación`` en las lecturas (ver
+    serializers.SparseFieldsetMixin). En escrituras no se aplican: el
+    serializer necesita todos sus campos para validar.
+    """
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request is not None and self.request.method == 'GET':
+            context['fields'] = parse_field_list(self.request.query_params.get('fields'))
+            context['expand'] = parse_field_list(self.request.query_params.get('expand'))
+        return context
 
-def log_action(user, action_type, instance, description=""):
-    ActionLog.objects.create(
-        user=user,
-        action_type=action_type,
-        content_type=ContentType.objects.get_for_model(instance),
-        object_id=instance.pk,
-        description=description
-    )
+    def get_rendered_fields(self):
+        """Campos que va a devolver el serializer en esta petición (para ajustar las precargas)."""
+        return {name for name, field in self.get_serializer().fields.items() if not field.write_only}
 
-class ProductViewSet(viewsets.ModelViewSet):
+class NameLookupMixin:
+    """
+    Búsqueda por nombre (ver lookup.py), con la representación completa:
+
+    - ``by-name/?name=``: búsqueda exacta; 404 si no existe.
+    - ``lookup/`` (POST ``{"names": [...]}``): muchos códigos escaneados en
+      una llamada; devuelve los encontrados en el orden pedido y los que faltan.
+    - ``search/?q=&mode=prefix|contains|similar&limit=``: con los mismos
+      filtros que el list.
+    """
+    lookup_kind = None
+
+    @action(detail=False, methods=['get'], url_path='by-name')
+    def by_name(self, request):
+        name = request.query_params.get('name')
+        if not name:
+            return Response({'detail': "Indique el parámetro 'name'."}, status=status.HTTP_400_BAD_REQUEST)
+        item = lookup_by_names(self.lookup_kind, [name]).get(name)
+        if item is None:
+            return Response({'detail': f"No existe '{name}'."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(item)
+
+    @action(detail=False, methods=['post'], url_path='lookup')
+    def lookup_names(self, request):
+        serializer = NameBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        names = list(dict.fromkeys(serializer.validated_data['names']))
+        found = lookup_by_names(self.lookup_kind, names)
+        return Response({
+            'results': [found[name] for name in names if name in found],
+            'missing': [name for name in names if name not in found],
+        })
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        serializer = NameSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        if params['mode'] == 'similar' and not has_trigram_extension():
+            return Response(
+                {'detail': "La búsqueda por similitud no está disponible (falta la extensión pg_trgm)."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        return Response({'results': search_by_name(self.lookup_kind, queryset, params['q'], params['mode'], params['limit'])})
+
+class ValuesListMixin:
+    """
+    Camino rápido de list(): las filas salen de ``values()``, sin instanciar
+    modelos ni pasar por el ModelSerializer, y cada columna se formatea con
+    el campo correspondiente del serializer (serializers.value_converter),
+    de modo que el JSON es el mismo. Respeta ``?fields=``; con ``?expand=``
+    se usa el camino normal.
+
+    ``values_fields`` asocia cada campo del serializer a su lookup en el
+    ORM. Los que no estén (relaciones a muchos) los rellena
+    ``get_values_related`` con una consulta por página.
+    """
+    values_fields = None
+
+    def get_values_related(self, name, ids):
+        """``{id: representación}`` del campo ``name`` para las filas ``ids``."""
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        if self.values_fields is None or self.get_serializer_context().get('expand'):
+            return super().list(request, *args, **kwargs)
+
+        fields = {name: field for name, field in self.get_serializer().fields.items() if not field.write_only}
+        columns = {name: self.values_fields[name] for name in fields if name in self.values_fields}
+        # id y el campo del cursor hacen falta para paginar aunque no se pidan.
+        ordering = getattr(self.paginator, 'ordering', None)
+        for name in {'id', ordering.lstrip('-') if ordering else 'id'}:
+            columns.setdefault(name, name)
+
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        rows = queryset.values(
+            *[name for name, lookup in columns.items() if name == lookup],
+            **{name: F(lookup) for name, lookup in columns.items() if name != lookup}
+        )
+        page = self.paginate_queryset(rows)
+        rows = list(rows if page is None else page)
+
+        ids = [row['id'] for row in rows]
+        related = {name: self.get_values_related(name, ids) for name in fields if name not in columns}
+        converters = {name: value_converter(field) for name, field in fields.items() if name in columns}
+        data = []
+        with timing_serialization():
+            for row in rows:
+                item = {}
+                for name in fields:
+                    if name in converters:
+                        value = row[name]
+                        item[name] = None if value is None else converters[name](value)
+                    else:
+                        item[name] = related[name].get(row['id'], [])
+                data.append(item)
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+class ProductViewSet(ConditionalGetMixin, SparseFieldsetMixin, ValuesListMixin, ActionLogMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all().order_by('-create_date')
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated, IsMemberOfCurrentTenant]
+    log_label = 'Producto'
+    conditional_models = (Product,)
+    values_fields = {'id': 'id', 'name': 'name', 'create_date': 'create_date'}
 
     def perform_create(self, serializer):
         instance = serializer.save()
-        log_action(self.request.user, 'CREATE', instance, f"Producto '{instance.name}' creado.")
+        self.log_action('CREATE', instance, f"Producto '{instance.name}' creado.")
 
     def perform_update(self, serializer):
         instance = serializer.save()
-        log_action(self.request.user, 'UPDATE', instance, f"Producto '{instance.name}' actualizado.")
-
-    def perform_destroy(self, instance):
-        description = f"Producto '{instance.name}' (ID: {instance.pk}) eliminado."
-        content_type_instance = ContentType.objects.get_for_model(instance)
-        object_id_instance = instance.pk
-        instance.delete()
-        ActionLog.objects.create(
-            user=self.request.user,
-            action_type='DELETE',
-            content_type=content_type_instance,
-            object_id=object_id_instance,
-            description=description
-        )
+        self.log_action('UPDATE', instance, f"Producto '{instance.name}' actualizado.")
 
 
-class LotViewSet(viewsets.ModelViewSet):
+class LotViewSet(ConditionalGetMixin, SparseFieldsetMixin, ValuesListMixin, NameLookupMixin, ActionLogMixin, viewsets.ModelViewSet):
     queryset = Lot.objects.all().order_by('-create_date')
     serializer_class = LotSerializer
     permission_classes = [IsAuthenticated, IsMemberOfCurrentTenant]
+    log_label = 'Lote'
+    lookup_kind = 'lot'
+    conditional_models = (Lot, Product)
+    values_fields = {
+        'id': 'id', 'name': 'name', 'product': 'product', 'product_name': 'product__name', 'create_date': 'create_date',
+    }
 
     def perform_create(self, serializer):
         instance = serializer.save()
-        log_action(self.request.user, 'CREATE', instance, f"Lote '{instance.name}' creado para producto '{instance.product.name}'.")
+        self.log_action('CREATE', instance, f"Lote '{instance.name}' creado para producto '{instance.product.name}'.")
 
     def perform_update(self, serializer):
         instance = serializer.save()
-        log_action(self.request.user, 'UPDATE', instance, f"Lote '{instance.name}' actualizado.")
+        self.log_action('UPDATE', instance, f"Lote '{instance.name}' actualizado.")
 
-    def perform_destroy(self, instance):
-        description = f"Lote '{instance.name}' (ID: {instance.pk}) eliminado."
-        content_type_instance = ContentType.objects.get_for_model(instance)
-        object_id_instance = instance.pk
-        instance.delete()
-        ActionLog.objects.create(
-            user=self.request.user, action_type='DELETE',
-            content_type=content_type_instance, object_id=object_id_instance,
-            description=description
-        )
 
-class WarehouseViewSet(viewsets.ModelViewSet):
+class WarehouseViewSet(ConditionalGetMixin, SparseFieldsetMixin, ValuesListMixin, ActionLogMixin, viewsets.ModelViewSet):
     queryset = Warehouse.objects.all().order_by('-create_date')
     serializer_class = WarehouseSerializer
     permission_classes = [IsAuthenticated, IsMemberOfCurrentTenant]
+    log_label = 'Almacén'
+    conditional_models = (Warehouse,)
+    values_fields = {'id': 'id', 'name': 'name', 'address': 'address', 'create_date': 'create_date'}
+    pallets_by_lot_models = (Warehouse, Lot, Product, Pallet, PalletLot)
 
     def perform_create(self, serializer):
         instance = serializer.save()
-        log_action(self.request.user, 'CREATE', instance, f"Almacén '{instance.name}' creado.")
+        self.log_action('CREATE', instance, f"Almacén '{instance.name}' creado.")
 
     def perform_update(self, serializer):
         instance = serializer.save()
-        log_action(self.request.user, 'UPDATE', instance, f"Almacén '{instance.name}' actualizado.")
+        self.log_action('UPDATE', instance, f"Almacén '{instance.name}' actualizado.")
 
-    def perform_destroy(self, instance):
-        description = f"Almacén '{instance.name}' (ID: {instance.pk}) eliminado."
-        content_type_instance = ContentType.objects.get_for_model(instance)
-        object_id_instance = instance.pk
-        instance.delete()
-        ActionLog.objects.create(
-            user=self.request.user, action_type='DELETE',
-            content_type=content_type_instance, object_id=object_id_instance,
-            description=description
-        )
     @action(detail=True, methods=['get'], url_path='pallets-by-lot')
     def pallets_grouped_by_lot(self, request, pk=None):
+        return conditional_get(request, self.pallets_by_lot_models, self.render_pallets_grouped_by_lot, pk=pk)
+
+    def render_pallets_grouped_by_lot(self, request, pk=None):
         warehouse = self.get_object()
 
+        # Pallets activos (no han salido) del almacén; los conteos por lote se
+        # resuelven con agregados condicionales y la lista con un único prefetch,
+        # de modo que el número de consultas no depende del número de lotes.
+        in_warehouse = Q(pallets__warehouse=warehouse, pallets__is_out=False)
         relevant_pallets_qs = Pallet.objects.filter(
             warehouse=warehouse,
             is_out=False,
             defective=False
-        )
+        ).order_by('create_date')
 
-        lots_in_warehouse_qs = Lot.objects.filter(
-            pallets__warehouse=warehouse,
-            pallets__is_out=False,
-            pallets__defective=False 
-        ).distinct().prefetch_related(
+        lots_in_warehouse_qs = Lot.objects.select_related('product').annotate(
+            count_pallets_ok=Count('pallets', filter=in_warehouse & Q(pallets__defective=False), distinct=True),
+            count_pallets_defective=Count('pallets', filter=in_warehouse & Q(pallets__defective=True), distinct=True),
+        ).filter(
+            count_pallets_ok__gt=0
+        ).prefetch_related(
             Prefetch('pallets', queryset=relevant_pallets_qs, to_attr='cached_pallets_for_view')
         ).order_by('name')
-        # pagination
-        paginator = self.pagination_class() if self.pagination_class else None
-
-        if paginator:
-            page = paginator.paginate_queryset(lots_in_warehouse_qs, request, view=self)
-            if page is not None: 
-                serializer = LotWithPalletsInWarehouseSerializer(
-                    page,
-                    many=True,
-                    context={'request': request, 'warehouse': warehouse}
-                )
-                return paginator.get_paginated_response(serializer.data)
-            serializer_data = LotWithPalletsInWarehouseSerializer(
-                [], 
-                many=True,
-                context={'request': request, 'warehouse': warehouse}
-            ).data
-            return paginator.get_paginated_response(serializer_data)
-        
-        serializer = LotWithPalletsInWarehouseSerializer(
-            lots_in_warehouse_qs,
-            many=True,
-            context={'request': request, 'warehouse': warehouse}
-        )
-        return Response(serializer.data)
 
-class PalletViewSet(viewsets.ModelViewSet):
-    queryset = Pallet.objects.all().order_by('-create_date')
+        context = {'request': request, 'warehouse': warehouse}
+        page = self.paginate_queryset(lots_in_warehouse_qs)
+        if page is not None:
+            serializer = LotWithPalletsInWarehouseSerializer(page, many=True, context=context)
+            with timing_serialization():
+                data = serializer.data
+            return self.get_paginated_response(data)
+
+        serializer = LotWithPalletsInWarehouseSerializer(lots_in_warehouse_qs, many=True, context=context)
+        with timing_serialization():
+            data = serializer.data
+        return Response(data)
+
+    @action(detail=True, methods=['get'], url_path='stock')
+    def stock(self, request, pk=None):
+        """
+        Stock por lote del almacén, leído de WarehouseLotStock: coste O(lotes),
+        no O(pallets). Con ``?as_of=<fecha>``, las existencias (ok y
+        defectuosos) que había en esa fecha (ver stock.stock_as_of).
+        """
+        warehouse = self.get_object()
+        if 'as_of' in request.query_params:
+            params = StockAsOfSerializer(data=request.query_params)
+            params.is_valid(raise_exception=True)
+            rows = stock_as_of(params.validated_data['as_of'], warehouse=warehouse)
+            page = self.paginate_queryset(rows)
+            if page is not None:
+                return self.get_paginated_response(page)
+            return Response(rows)
+
+        stock_qs = WarehouseLotStock.objects.filter(warehouse=warehouse).exclude(
+            ok_count=0, defective_count=0, out_count=0
+        ).select_related('lot__product').order_by('lot__name')
+
+        page = self.paginate_queryset(stock_qs)
+        if page is not None:
+            with timing_serialization():
+                data = WarehouseLotStockSerializer(page, many=True).data
+            return self.get_paginated_response(data)
+        return Response(WarehouseLotStockSerializer(stock_qs, many=True).data)
+
+class PalletViewSet(SparseFieldsetMixin, ValuesListMixin, NameLookupMixin, ActionLogMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = Pallet.objects.all().order_by('-create_date', '-id')
     serializer_class = PalletSerializer
     permission_classes = [IsAuthenticated, IsMemberOfCurrentTenant]
+    pagination_class = PalletPagination
+    export_fields = PALLET_EXPORT_FIELDS
+    export_basename = 'pallets'
+    filter_backends = [PalletFilterBackend]
+    log_label = 'Pallet'
+    lookup_kind = 'pallet'
+    bulk_max_items = 5000
+    values_fields = {
+        'id': 'id', 'name': 'name', 'warehouse': 'warehouse', 'warehouse_name': 'warehouse__name',
+        'create_date': 'create_date', 'in_date': 'in_date', 'out_date': 'out_date',
+        'is_out': 'is_out', 'defective': 'defective',
+    }
+
+    def get_queryset(self):
+        """
+        Precarga exactamente lo que va a serializarse según ?fields= y
+        ?expand=: el almacén y los PalletLot con su lote y producto. Así el
+        número de consultas por página es fijo. El camino values() y la
+        exportación no usan estas precargas.
+        """
+        queryset = super().get_queryset()
+        fields = self.get_rendered_fields()
+        if 'warehouse_name' in fields or 'warehouse' in self.get_serializer_context().get('expand', ()):
+            queryset = queryset.select_related('warehouse')
+        if 'pallet_lots_details' in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch('palletlot_set', queryset=PalletLot.objects.select_related('lot__product').order_by('id'))
+            )
+        return queryset
+
+    def get_export_rows(self, queryset):
+        return pallet_export_rows(queryset)
+
+    def get_values_related(self, name, ids):
+        # Sólo pallet_lots_details: una consulta para toda la página.
+        details = defaultdict(list)
+        rows = PalletLot.objects.filter(pallet_id__in=ids).order_by('id').values(
+            'id', 'pallet', 'lot', lot_name=F('lot__name'), product_name=F('lot__product__name')
+        )
+        for row in rows:
+            details[row['pallet']].append(row)
+        return details
 
     def perform_create(self, serializer):
         instance = serializer.save()
-        log_action(self.request.user, 'CREATE', instance, f"Pallet '{instance.name}' creado.")
+        self.log_action('CREATE', instance, f"Pallet '{instance.name}' creado.")
 
     def perform_update(self, serializer):
+        # Estado previo: serializer.save() actualiza serializer.instance en sitio.
+        was_out, was_defective = serializer.instance.is_out, serializer.instance.defective
         instance = serializer.save()
-        log_action(self.request.user, 'UPDATE', instance, f"Pallet '{instance.name}' actualizado.")
-        if 'is_out' in serializer.validated_data and serializer.validated_data['is_out'] and not serializer.instance.is_out:
-             log_action(self.request.user, 'MARK_OUT', instance, f"Pallet '{instance.name}' marcado como salida.")
-        if 'defective' in serializer.validated_data and serializer.validated_data['defective'] and not serializer.instance.defective:
-             log_action(self.request.user, 'MARK_DEFECTIVE', instance, f"Pallet '{instance.name}' marcado como defectuoso.")
+        user = self.request.user
+        entries = [make_action_log(user, 'UPDATE', instance, f"Pallet '{instance.name}' actualizado.")]
+        if serializer.validated_data.get('is_out') and not was_out:
+            entries.append(make_action_log(user, 'MARK_OUT', instance, f"Pallet '{instance.name}' marcado como salida."))
+        if serializer.validated_data.get('defective') and not was_defective:
+            entries.append(make_action_log(user, 'MARK_DEFECTIVE', instance, f"Pallet '{instance.name}' marcado como defectuoso."))
+        record_entries(entries)
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """
+        Alta masiva: recibe una lista de pallets (mismos campos que el alta
+        individual) y los crea todos o ninguno. Si alguno no es válido se
+        responde 400 con los errores de cada elemento por su índice.
+        """
+        if not isinstance(request.data, list) or not request.data:
+            return Response({'detail': "Se esperaba una lista de pallets no vacía."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.bulk_max_items:
+            return Response(
+                {'detail': f"Como máximo {self.bulk_max_items} pallets por petición."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-    def perform_destroy(self, instance):
-        description = f"Pallet '{instance.name}' (ID: {instance.pk}) eliminado."
-        content_type_instance = ContentType.objects.get_for_model(instance)
-        object_id_instance = instance.pk
-        instance.delete()
-        ActionLog.objects.create(
-            user=self.request.user, action_type='DELETE',
-            content_type=content_type_instance, object_id=object_id_instance,
-            description=description
+        serializer = PalletBulkItemSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            errors = [{'index': index, **item_errors} for index, item_errors in enumerate(serializer.errors) if item_errors]
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        items = serializer.validated_data
+        errors = validate_pallet_batch(items)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            pallets = bulk_create_pallets(items, request.user)
+        except IntegrityError:
+            # Otro cliente ha creado alguno de los nombres entre la validación y la escritura.
+            return Response({'detail': "Conflicto al crear los pallets; reintente la petición."}, status=status.HTTP_409_CONFLICT)
+
+        return Response(
+            {'created': len(pallets), 'pallets': [{'id': pallet.pk, 'name': pallet.name} for pallet in pallets]},
+            status=status.HTTP_201_CREATED
         )
 
+    @action(detail=False, methods=['post'], url_path='mark-out')
+    def mark_out(self, request):
+        """Marca como salida, con un único UPDATE, los pallets activos seleccionados."""
+        serializer = PalletMarkOutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        selection = dict(serializer.validated_data)
+        out_date = selection.pop('out_date', None)
+        ids = mark_pallets_out(filter_pallets(**selection), request.user, out_date=out_date)
+        return Response({'updated': len(ids), 'ids': ids})
+
+    @action(detail=False, methods=['post'], url_path='mark-defective')
+    def mark_defective(self, request):
+        """Marca como defectuosos, con un único UPDATE, los pallets activos seleccionados."""
+        serializer = PalletSelectionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = mark_pallets_defective(filter_pallets(**serializer.validated_data), request.user)
+        return Response({'updated': len(ids), 'ids': ids})
 
-class ActionLogViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = ActionLog.objects.all().order_by('-timestamp')
+    @action(detail=False, methods=['post'], url_path='transfer')
+    def transfer(self, request):
+        """
+        Traslada a otro almacén, con un único UPDATE, los pallets activos
+        seleccionados que siguen en el almacén de origen.
+        """
+        serializer = PalletTransferSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        selection = dict(serializer.validated_data)
+        source, destination = selection.pop('source'), selection.pop('destination')
+        ids = transfer_pallets(filter_pallets(**selection), request.user, source, destination)
+        return Response({'updated': len(ids), 'ids': ids})
+
+
+class ActionLogViewSet(SparseFieldsetMixin, ExportMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = ActionLog.objects.select_related('user', 'content_type').order_by('-timestamp', '-id')
     serializer_class = ActionLogSerializer
-    permission_classes = [IsAuthenticated, IsMemberOfCurrentTenant]
\ No newline at end of file
+    permission_classes = [IsAuthenticated, IsMemberOfCurrentTenant]
+    pagination_class = ActionLogPagination
+    filter_backends = [ActionLogFilterBackend]
+    export_fields = ACTION_LOG_EXPORT_FIELDS
+    export_basename = 'action-logs'
+
+    def get_queryset(self):
+        # Un id puede estar ya archivado: el detalle busca en ambas tablas.
+        if self.action == 'retrieve':
+            return ActionLogHistory.objects.select_related('user', 'content_type')
+        return super().get_queryset()
+
+    def get_export_rows(self, queryset):
+        return action_log_export_rows(queryset)
+
+class AnalyticsViewSet(viewsets.ViewSet):
+    permission_classes = [IsAuthenticated, IsMemberOfCurrentTenant]
+
+    @action(detail=False, methods=['get'], url_path='throughput')
+    def throughput(self, request):
+        """
+        Entradas, salidas y tasa de defectos por día o semana (ver
+        analytics.throughput): ``period``, ``group_by``, ``since``, ``until``
+        y filtros ``warehouse``, ``product`` y ``lot``.
+        """
+        params = ThroughputQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(throughput(**params.validated_data))